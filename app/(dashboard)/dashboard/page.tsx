@@ -1,49 +1,40 @@
 import { requireAuth } from "@/lib/utils/auth";
-import { createClient } from "@/lib/supabase/server";
 import { DashboardContent } from "@/components/dashboard/dashboard-content";
-import { getUserAchievements } from "@/lib/utils/achievements";
+import { getUserAchievements, type UserStreaks } from "@/lib/utils/achievements";
+import type { ActivityDay } from "@/components/dashboard/dashboard-content";
 import type { Database } from "@/types/supabase";
 
 type UserProfile = Database["public"]["Tables"]["users"]["Row"];
 
+/**
+ * Результат функции get_dashboard_stats
+ */
+interface DashboardStatsResult {
+  completed_modules: number;
+  successful_attempts: number;
+  total_attempts: number;
+  avg_execution_time: number;
+  avg_solving_time: number;
+  streaks: UserStreaks | null;
+  recent_activity: ActivityDay[];
+}
+
 export default async function DashboardPage() {
   const { user, profile, supabase } = await requireAuth();
   const typedProfile = profile as UserProfile | null;
 
-  // Получаем статистику пользователя
-  const { data: progressData } = await supabase
-    .from("user_progress")
-    .select("*")
-    .eq("user_id", user.id);
-
-  const { data: attemptsData } = await supabase
-    .from("task_attempts")
-    .select("is_successful, execution_time_ms, solving_time_ms, created_at")
-    .eq("user_id", user.id);
+  // Вся статистика — один небольшой ответ get_dashboard_stats (счетчики из user_stats,
+  // серии и активность за последние 14 дней)
+  const [{ data: dashboardStats, error: statsError }, achievements] = await Promise.all([
+    (supabase.rpc as any)("get_dashboard_stats", { p_user_id: user.id }),
+    getUserAchievements(supabase, user.id),
+  ]);
 
-  // Подсчитываем статистику
-  const completedLessons = progressData?.filter((p: any) => p.status === "completed").length ?? 0;
-  const successfulAttempts = attemptsData?.filter((a: any) => a.is_successful).length ?? 0;
-  const totalAttempts = attemptsData?.length ?? 0;
-  const avgExecutionTime =
-    attemptsData && attemptsData.length > 0
-      ? Math.round(
-          attemptsData.reduce((sum, a: any) => sum + (a.execution_time_ms ?? 0), 0) /
-            attemptsData.length
-        )
-      : 0;
-  
-  // Среднее время решения (только попытки с solving_time_ms)
-  const attemptsWithSolvingTime = attemptsData?.filter((a: any) => a.solving_time_ms != null) ?? [];
-  const avgSolvingTime =
-    attemptsWithSolvingTime.length > 0
-      ? Math.round(
-          attemptsWithSolvingTime.reduce((sum, a: any) => sum + (a.solving_time_ms ?? 0), 0) /
-            attemptsWithSolvingTime.length
-        )
-      : 0;
+  if (statsError) {
+    console.error("Error loading dashboard stats:", statsError);
+  }
 
-  const achievements = await getUserAchievements(supabase, user.id);
+  const stats = (dashboardStats as DashboardStatsResult | null) ?? null;
 
   return (
     <DashboardContent
@@ -51,13 +42,15 @@ export default async function DashboardPage() {
       stats={{
         totalXp: typedProfile?.total_xp ?? 0,
         currentLevel: typedProfile?.current_level ?? 1,
-        completedLessons,
-        successfulAttempts,
-        totalAttempts,
-        avgExecutionTime,
-        avgSolvingTime,
+        completedLessons: stats?.completed_modules ?? 0,
+        successfulAttempts: stats?.successful_attempts ?? 0,
+        totalAttempts: stats?.total_attempts ?? 0,
+        avgExecutionTime: stats?.avg_execution_time ?? 0,
+        avgSolvingTime: stats?.avg_solving_time ?? 0,
       }}
       achievements={achievements}
+      streaks={stats?.streaks ?? null}
+      recentActivity={stats?.recent_activity ?? []}
     />
   );
 }
@@ -1,10 +1,16 @@
 import { createClient } from "@/lib/supabase/server";
 import { requireAuth } from "@/lib/utils/auth";
+import { cached } from "@/lib/utils/server-cache";
 import { LeaderboardContent } from "@/components/leaderboard/leaderboard-content";
 import type { Database } from "@/types/supabase";
 
 type LeaderboardPeriod = "all_time" | "month" | "week";
 
+/**
+ * Сколько достижений показывать рядом с каждым пользователем рейтинга
+ */
+const LEADERBOARD_ACHIEVEMENTS_PREVIEW = 5;
+
 type User = Database["public"]["Tables"]["users"]["Row"];
 
 interface LeaderboardUser extends Pick<
@@ -31,58 +37,30 @@ export default async function LeaderboardPage({
   const period: LeaderboardPeriod = params.period || "all_time";
   const supabase = await createClient();
 
-  // Для периодов "месяц" и "неделя" пока используем общий рейтинг
-  // В будущем можно добавить таблицу с историей изменений XP для точной фильтрации
-  
-  // Загружаем пользователей с сортировкой по XP (студенты и админы)
-  const query = supabase
-    .from("users")
-    .select("id, display_name, email, avatar_url, total_xp, current_level, role, last_active_at")
-    .in("role", ["student", "admin"]) // Студенты и админы в таблице лидеров
-    .order("total_xp", { ascending: false })
-    .limit(100); // Лимит для начала
-
-  const { data: users, error } = await query;
-
-  if (error) {
+  // Рейтинг одинаков для всех учеников, поэтому берется из общего кеша;
+  // его сбрасывает начисление XP (/api/tasks/award-xp)
+  const periodStart = period === "all_time" ? null : getPeriodStart(period);
+  let usersWithRank: RankedUser[] = [];
+  try {
+    usersWithRank = await cached("leaderboard", `${period}:${periodStart ?? ""}`, () =>
+      loadRankedUsers(supabase, period, periodStart)
+    );
+  } catch (error) {
     console.error("Error loading leaderboard:", error);
   }
 
-  // Вычисляем ранги (учитывая одинаковый XP - пользователи с одинаковым XP имеют одинаковый ранг)
-  const usersWithRank: Array<LeaderboardUser & { last_active_at?: string | null }> = [];
-  let currentRank = 1;
-  let previousXP: number | null = null;
-  
-  users?.forEach((u: any) => {
-    const currentXP = u.total_xp || 0;
-    
-    // Если XP отличается от предыдущего, увеличиваем ранг
-    if (previousXP !== null && currentXP !== previousXP) {
-      currentRank = usersWithRank.length + 1;
-    }
-    
-    usersWithRank.push({
-      ...u,
-      rank: currentRank,
-    });
-    
-    previousXP = currentXP;
-  });
-
   // Загружаем достижения для пользователей в таблице лидеров
   const achievementsByUser: Record<string, LeaderboardAchievement[]> = {};
   if (usersWithRank.length > 0) {
     const userIds = usersWithRank.map((u) => u.id);
-    const { data: rawUserAchievements, error: achievementsError } = await supabase
-      .from("user_achievements")
-      .select(
-        `
-        user_id,
-        earned_at,
-        achievement:achievements(id, title, description, icon_name)
-      `,
-      )
-      .in("user_id", userIds);
+    // Не больше LEADERBOARD_ACHIEVEMENTS_PREVIEW последних достижений на пользователя
+    const { data: rawUserAchievements, error: achievementsError } = await (supabase.rpc as any)(
+      "get_leaderboard_achievements",
+      {
+        p_user_ids: userIds,
+        p_limit: LEADERBOARD_ACHIEVEMENTS_PREVIEW,
+      }
+    );
 
     if (achievementsError) {
       console.error("Error loading leaderboard achievements:", achievementsError);
@@ -90,23 +68,19 @@ export default async function LeaderboardPage({
 
     const typed = (rawUserAchievements || []) as Array<{
       user_id: string;
-      earned_at: string | null;
-      achievement: {
-        id: string;
-        title: string;
-        description: string;
-        icon_name: string | null;
-      } | null;
+      id: string;
+      title: string;
+      description: string;
+      icon_name: string | null;
     }>;
 
     for (const row of typed) {
-      if (!row.achievement) continue;
       const list = achievementsByUser[row.user_id] || (achievementsByUser[row.user_id] = []);
       list.push({
-        id: row.achievement.id,
-        title: row.achievement.title,
-        description: row.achievement.description,
-        icon_name: row.achievement.icon_name || "🏆",
+        id: row.id,
+        title: row.title,
+        description: row.description,
+        icon_name: row.icon_name || "🏆",
       });
     }
   }
@@ -126,27 +100,47 @@ export default async function LeaderboardPage({
 
     if (currentUser) {
       const typedCurrentUser = currentUser as User;
-      // Подсчитываем ранг текущего пользователя (студенты и админы)
-      const { count } = await supabase
-        .from("users")
-        .select("*", { count: "exact", head: true })
-        .in("role", ["student", "admin"])
-        .gt("total_xp", typedCurrentUser.total_xp || 0);
-
-      // Подсчитываем точный ранг (учитывая пользователей с таким же XP)
-      const { data: usersWithSameXp } = await supabase
-        .from("users")
-        .select("id")
-        .in("role", ["student", "admin"])
-        .eq("total_xp", typedCurrentUser.total_xp || 0);
-
-      const usersWithMoreXp = count || 0;
-      const rank = usersWithMoreXp + 1;
-
-      currentUserData = {
-        ...typedCurrentUser,
-        rank,
-      };
+      let userXp = typedCurrentUser.total_xp || 0;
+      let rank: number | null = null;
+
+      if (periodStart === null) {
+        // Место хранится в снимке рейтинга: одно чтение по первичному ключу.
+        // Снимок перестраивается вне запроса (pg_cron и после начисления XP),
+        // пользователь без строки в снимке появится в нем при следующей перестройке
+        const { data: snapshot } = await (supabase.from("leaderboard_snapshot") as any)
+          .select("total_xp, rank")
+          .eq("user_id", user.id)
+          .maybeSingle();
+        const typedSnapshot = snapshot as { total_xp: number; rank: number } | null;
+        if (typedSnapshot) {
+          userXp = typedSnapshot.total_xp;
+          rank = typedSnapshot.rank;
+        }
+      } else {
+        const { data: periodTotal } = await (supabase.from("xp_period_totals") as any)
+          .select("xp")
+          .eq("period", period)
+          .eq("period_start", periodStart)
+          .eq("user_id", user.id)
+          .maybeSingle();
+        userXp = (periodTotal as { xp: number } | null)?.xp ?? 0;
+
+        const { count } = await (supabase.from("xp_period_totals") as any)
+          .select("user_id, user:users!inner(role)", { count: "exact", head: true })
+          .eq("period", period)
+          .eq("period_start", periodStart)
+          .in("user.role", ["student", "admin"])
+          .gt("xp", userXp);
+        rank = (count || 0) + 1;
+      }
+
+      if (rank !== null) {
+        currentUserData = {
+          ...typedCurrentUser,
+          total_xp: userXp,
+          rank,
+        };
+      }
     }
   }
 
@@ -162,3 +156,85 @@ export default async function LeaderboardPage({
   );
 }
 
+type RankedUser = LeaderboardUser & { last_active_at?: string | null };
+
+/**
+ * Топ-100 рейтинга с местами. Рейтинг за все время — по users.total_xp,
+ * за неделю и месяц — по итогам периода из xp_period_totals
+ * (поддерживаются триггером на журнале xp_events)
+ */
+async function loadRankedUsers(
+  supabase: Awaited<ReturnType<typeof createClient>>,
+  period: LeaderboardPeriod,
+  periodStart: string | null
+): Promise<RankedUser[]> {
+  let users: Array<Record<string, any>> | null = null;
+
+  if (periodStart === null) {
+    // Загружаем пользователей с сортировкой по XP (студенты и админы)
+    const { data, error } = await supabase
+      .from("users")
+      .select("id, display_name, email, avatar_url, total_xp, current_level, role, last_active_at")
+      .in("role", ["student", "admin"]) // Студенты и админы в таблице лидеров
+      .order("total_xp", { ascending: false })
+      .limit(100); // Лимит для начала
+    if (error) throw error;
+    users = data;
+  } else {
+    const { data, error } = await (supabase.from("xp_period_totals") as any)
+      .select(
+        "xp, user:users!inner(id, display_name, email, avatar_url, total_xp, current_level, role, last_active_at)"
+      )
+      .eq("period", period)
+      .eq("period_start", periodStart)
+      .in("user.role", ["student", "admin"])
+      .order("xp", { ascending: false })
+      .limit(100);
+    if (error) throw error;
+    // В таблице показывается XP за период
+    users = ((data || []) as Array<{ xp: number; user: Record<string, any> }>).map((row) => ({
+      ...row.user,
+      total_xp: row.xp,
+    }));
+  }
+
+  // Вычисляем ранги (учитывая одинаковый XP - пользователи с одинаковым XP имеют одинаковый ранг)
+  const usersWithRank: RankedUser[] = [];
+  let currentRank = 1;
+  let previousXP: number | null = null;
+
+  users?.forEach((u: any) => {
+    const currentXP = u.total_xp || 0;
+
+    // Если XP отличается от предыдущего, увеличиваем ранг
+    if (previousXP !== null && currentXP !== previousXP) {
+      currentRank = usersWithRank.length + 1;
+    }
+
+    usersWithRank.push({
+      ...u,
+      rank: currentRank,
+    });
+
+    previousXP = currentXP;
+  });
+
+  return usersWithRank;
+}
+
+/**
+ * Начало текущего периода рейтинга по UTC (как в xp_period_start в БД):
+ * неделя начинается с понедельника, месяц — с первого числа
+ */
+function getPeriodStart(period: "week" | "month"): string {
+  const now = new Date();
+  const year = now.getUTCFullYear();
+  const month = now.getUTCMonth();
+  if (period === "month") {
+    return new Date(Date.UTC(year, month, 1)).toISOString().slice(0, 10);
+  }
+  const daysSinceMonday = (now.getUTCDay() + 6) % 7;
+  return new Date(Date.UTC(year, month, now.getUTCDate() - daysSinceMonday))
+    .toISOString()
+    .slice(0, 10);
+}
@@ -0,0 +1,36 @@
+export const dynamic = "force-dynamic";
+import { NextResponse } from "next/server";
+import { createClient } from "@/lib/supabase/server";
+import { getAiFlightStats } from "@/lib/utils/ai-flight";
+import { getAiCacheStats } from "@/lib/utils/ai-response-cache";
+import { getLlmClientStats } from "@/lib/utils/llm-client";
+import { getCacheStats } from "@/lib/utils/server-cache";
+
+/**
+ * Счетчики серверного кеша (попадания, промахи, сбросы) и кеша ответов AI
+ * (попадания по уровням, доля попаданий, сэкономленные токены), загрузка очереди запросов
+ * к модели, число объединенных запросов, состояние предохранителя и задержки вызовов модели
+ * по маршрутам — для текущего процесса
+ */
+export async function GET() {
+  const supabase = await createClient();
+  const {
+    data: { user },
+  } = await supabase.auth.getUser();
+  if (!user) return NextResponse.json({ error: "Unauthorized" }, { status: 401 });
+
+  const { data: userRole, error: roleError } = await (supabase.rpc as any)("get_user_role", {
+    user_id: user.id,
+  });
+  const role = typeof userRole === "string" ? userRole : String(userRole ?? "");
+  if (roleError || (role !== "admin" && role !== "teacher")) {
+    return NextResponse.json({ error: "Forbidden" }, { status: 403 });
+  }
+
+  return NextResponse.json({
+    ...getCacheStats(),
+    ai: getAiCacheStats(),
+    aiUpstream: getAiFlightStats(),
+    llm: getLlmClientStats(),
+  });
+}
@@ -1,6 +1,7 @@
 import { NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
 import { requireAdmin } from "@/lib/utils/auth";
+import { invalidateCacheTag } from "@/lib/utils/server-cache";
 
 export async function POST(
   _request: Request,
@@ -30,6 +31,7 @@ export async function POST(
       return NextResponse.json({ error: moduleDeleteError.message }, { status: 400 });
     }
 
+    invalidateCacheTag("modules");
     return NextResponse.json({ ok: true });
   } catch (e: any) {
     return NextResponse.json({ error: e?.message ?? "Unknown error" }, { status: 500 });
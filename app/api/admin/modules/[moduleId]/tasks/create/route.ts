@@ -4,6 +4,7 @@ import { NextRequest, NextResponse } from "next/server";
 import { createClient as createServerClient } from "@/lib/supabase/server";
 import { createClient as createServiceClient } from "@supabase/supabase-js";
 import type { Database } from "@/types/supabase";
+import { invalidateCacheTag } from "@/lib/utils/server-cache";
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ moduleId: string }> }) {
   try {
@@ -35,6 +36,9 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ mod
       difficulty,
       xp_reward,
       order_index,
+      time_limit_ms,
+      suite_time_limit_ms,
+      checks_performance,
     } = body || {};
 
     if (!title || !description || !starter_code || !Array.isArray(test_cases)) {
@@ -69,6 +73,10 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ mod
         difficulty,
         xp_reward: finalXpReward,
         order_index: typeof order_index === "number" ? order_index : 0,
+        time_limit_ms: typeof time_limit_ms === "number" && time_limit_ms > 0 ? time_limit_ms : null,
+        suite_time_limit_ms:
+          typeof suite_time_limit_ms === "number" && suite_time_limit_ms > 0 ? suite_time_limit_ms : null,
+        checks_performance: checks_performance === true,
         module_id: moduleId,
       } as any)
       .select("id")
@@ -80,6 +88,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ mod
       return NextResponse.json({ error: error.message, details, moduleId }, { status: 400 });
     }
 
+    invalidateCacheTag("modules");
     return NextResponse.json({ id: (data as any)?.id }, { status: 200 });
   } catch (e) {
     const message = e instanceof Error ? e.message : "Unknown error";
@@ -1,6 +1,7 @@
 import { NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
 import { requireAdmin } from "@/lib/utils/auth";
+import { invalidateCacheTag } from "@/lib/utils/server-cache";
 
 type Body = {
   title: string;
@@ -58,6 +59,7 @@ export async function POST(
       return NextResponse.json({ error: error.message, code: (error as any)?.code }, { status: 400 });
     }
 
+    invalidateCacheTag("modules");
     return NextResponse.json({ ok: true });
   } catch (e: any) {
     console.error("API:updateModule: unexpected", e);
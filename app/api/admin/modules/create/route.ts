@@ -1,6 +1,7 @@
 import { NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
 import { requireAdmin } from "@/lib/utils/auth";
+import { invalidateCacheTag } from "@/lib/utils/server-cache";
 
 type Body = {
   title: string;
@@ -59,6 +60,7 @@ export async function POST(request: Request) {
     }
 
     const typedData = data as { id: string; title: string } | null;
+    invalidateCacheTag("modules");
     return NextResponse.json({ ok: true, id: typedData?.id, title: typedData?.title });
   } catch (e: any) {
     console.error("API:createModule: unexpected", e);
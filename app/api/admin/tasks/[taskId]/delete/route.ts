@@ -0,0 +1,26 @@
+import { NextResponse } from "next/server";
+import { createClient } from "@/lib/supabase/server";
+import { requireAdmin } from "@/lib/utils/auth";
+import { invalidateCacheTag } from "@/lib/utils/server-cache";
+
+export async function POST(
+  _request: Request,
+  { params }: { params: Promise<{ taskId: string }> }
+) {
+  try {
+    await requireAdmin();
+    const { taskId } = await params;
+    const supabase = await createClient();
+
+    const { error } = await supabase.from("tasks").delete().eq("id", taskId);
+    if (error) {
+      return NextResponse.json({ error: error.message }, { status: 400 });
+    }
+
+    // Каталог модулей показывает число заданий (modules.tasks_count)
+    invalidateCacheTag("modules");
+    return NextResponse.json({ ok: true });
+  } catch (e: any) {
+    return NextResponse.json({ error: e?.message ?? "Unknown error" }, { status: 500 });
+  }
+}
@@ -0,0 +1,63 @@
+import { NextResponse } from "next/server";
+import { createClient } from "@/lib/supabase/server";
+import { requireAdmin } from "@/lib/utils/auth";
+import { invalidateCacheTag } from "@/lib/utils/server-cache";
+
+type Body = {
+  title: string;
+  description: string;
+  starter_code: string;
+  solution_code: string | null;
+  test_cases: unknown[];
+  difficulty: string;
+  xp_reward: number;
+  order_index: number;
+  time_limit_ms: number | null;
+  suite_time_limit_ms: number | null;
+  checks_performance: boolean;
+};
+
+export async function POST(
+  request: Request,
+  { params }: { params: Promise<{ taskId: string }> }
+) {
+  try {
+    await requireAdmin();
+    const { taskId } = await params;
+    const supabase = await createClient();
+
+    const body = (await request.json()) as Body;
+    const valid =
+      body?.title && body.description && body.starter_code && Array.isArray(body.test_cases);
+    if (!valid) {
+      return NextResponse.json({ error: "Invalid payload" }, { status: 400 });
+    }
+
+    // Модуль задания при редактировании не меняется
+    const { error } = await (supabase.from("tasks") as any)
+      .update({
+        title: body.title,
+        description: body.description,
+        starter_code: body.starter_code,
+        solution_code: body.solution_code ?? null,
+        test_cases: body.test_cases,
+        difficulty: body.difficulty,
+        xp_reward: body.xp_reward,
+        order_index: body.order_index,
+        time_limit_ms: body.time_limit_ms,
+        suite_time_limit_ms: body.suite_time_limit_ms,
+        checks_performance: body.checks_performance === true,
+      })
+      .eq("id", taskId);
+
+    if (error) {
+      return NextResponse.json({ error: error.message }, { status: 400 });
+    }
+
+    // Каталог модулей показывает число заданий и их данные
+    invalidateCacheTag("modules");
+    return NextResponse.json({ ok: true });
+  } catch (e: any) {
+    return NextResponse.json({ error: e?.message ?? "Unknown error" }, { status: 500 });
+  }
+}
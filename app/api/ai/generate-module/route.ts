@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
+import { LlmError, llmErrorHeaders, requestChatCompletion } from "@/lib/utils/llm-client";
 
 const HF_API_KEY = process.env.HUGGINGFACE_API_KEY;
 
@@ -27,16 +28,6 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: "Forbidden" }, { status: 403 });
     }
 
-    // Проверка rate limit
-    const { checkRateLimit, logGeneration } = await import("@/lib/utils/rate-limit");
-    const rateLimitCheck = await checkRateLimit(user.id, "module");
-    if (!rateLimitCheck.canGenerate) {
-      return NextResponse.json(
-        { error: rateLimitCheck.error || "Rate limit exceeded", remaining: rateLimitCheck.remaining },
-        { status: 429 }
-      );
-    }
-
     // Проверка наличия API ключа
     if (!HF_API_KEY) {
       return NextResponse.json(
@@ -52,6 +43,18 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: "Topic and level are required" }, { status: 400 });
     }
 
+    // Проверка rate limit: токен списывается после проверок запроса, которые его не тратят
+    const { consumeRateLimit, logGeneration, refundRateLimit, retryAfterHeaders } = await import(
+      "@/lib/utils/rate-limit"
+    );
+    const rateLimitCheck = await consumeRateLimit(supabase, user.id, "generate-module");
+    if (!rateLimitCheck.allowed) {
+      return NextResponse.json(
+        { error: rateLimitCheck.error || "Rate limit exceeded", remaining: rateLimitCheck.remaining },
+        { status: 429, headers: retryAfterHeaders(rateLimitCheck) }
+      );
+    }
+
     // Формируем промпт для генерации модуля
     const levelNames: Record<string, string> = {
       "1": "начальный (для начинающих)",
@@ -109,31 +112,24 @@ ${description ? `- Дополнительные требования: ${descript
 - Примеры должны быть понятными для школьников 7-9 классов
 - Возвращай ТОЛЬКО валидный JSON, без markdown разметки`;
 
-    // Единый вызов только к openai/gpt-oss-20b через общий chat completions endpoint
-    const response = await fetch("https://router.huggingface.co/v1/chat/completions", {
-            method: "POST",
-            headers: {
-              Authorization: `Bearer ${HF_API_KEY}`,
-              "Content-Type": "application/json",
-            },
-      body: JSON.stringify({
-        model: "openai/gpt-oss-20b",
-        messages: [
-          { role: "user", content: prompt },
-        ],
+    // Вызов модели через общий клиент (дедлайн, повторы, предохранитель)
+    let response: Response;
+    try {
+      response = await requestChatCompletion("generate-module", {
+        messages: [{ role: "user", content: prompt }],
         max_tokens: 4000,
         temperature: 0.7,
-      }),
-          });
-
-    if (!response.ok) {
-            const errorText = await response.text();
+      });
+    } catch (e) {
+      if (!(e instanceof LlmError)) throw e;
+      // Генерации не было — токен лимита возвращается
+      await refundRateLimit(user.id, "generate-module");
       return NextResponse.json(
         {
-          error: `Hugging Face API error: ${response.status} ${response.statusText}`,
-          details: errorText.substring(0, 1000),
+          error: `Hugging Face API error: ${e.status}`,
+          details: e.details,
         },
-        { status: response.status }
+        { status: e.status, headers: llmErrorHeaders(e) }
       );
     }
 
@@ -364,7 +360,7 @@ ${description ? `- Дополнительные требования: ${descript
     return NextResponse.json({
       success: true,
       data: moduleData,
-      remaining: rateLimitCheck.remaining - 1,
+      remaining: rateLimitCheck.remaining,
     });
   } catch (error) {
     console.error("Error generating module:", error);
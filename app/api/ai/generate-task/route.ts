@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
+import { LlmError, llmErrorHeaders, requestChatCompletion } from "@/lib/utils/llm-client";
 
 const HF_API_KEY = process.env.HUGGINGFACE_API_KEY;
 
@@ -26,16 +27,6 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: "Forbidden" }, { status: 403 });
     }
 
-    // Проверка rate limit
-    const { checkRateLimit, logGeneration } = await import("@/lib/utils/rate-limit");
-    const rateLimitCheck = await checkRateLimit(user.id, "task");
-    if (!rateLimitCheck.canGenerate) {
-      return NextResponse.json(
-        { error: rateLimitCheck.error || "Rate limit exceeded", remaining: rateLimitCheck.remaining },
-        { status: 429 }
-      );
-    }
-
     // Проверка наличия API ключа
     if (!HF_API_KEY) {
       return NextResponse.json(
@@ -51,6 +42,18 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: "Topic and difficulty are required" }, { status: 400 });
     }
 
+    // Проверка rate limit: токен списывается после проверок запроса, которые его не тратят
+    const { consumeRateLimit, logGeneration, refundRateLimit, retryAfterHeaders } = await import(
+      "@/lib/utils/rate-limit"
+    );
+    const rateLimitCheck = await consumeRateLimit(supabase, user.id, "generate-task");
+    if (!rateLimitCheck.allowed) {
+      return NextResponse.json(
+        { error: rateLimitCheck.error || "Rate limit exceeded", remaining: rateLimitCheck.remaining },
+        { status: 429, headers: retryAfterHeaders(rateLimitCheck) }
+      );
+    }
+
     const difficultyNames: Record<string, string> = {
       easy: "легкое (для начинающих)",
       medium: "среднее (для продолжающих)",
@@ -129,15 +132,10 @@ ${lessonTheory ? `- Теория урока (для контекста):\n${less
 
 **Важно:** Возвращай ТОЛЬКО валидный JSON, без markdown разметки`;
 
-    // Единый вызов только к openai/gpt-oss-20b через общий chat completions endpoint
-    const response = await fetch("https://router.huggingface.co/v1/chat/completions", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${HF_API_KEY}`,
-      },
-      body: JSON.stringify({
-        model: "openai/gpt-oss-20b",
+    // Вызов модели через общий клиент (дедлайн, повторы, предохранитель)
+    let response: Response;
+    try {
+      response = await requestChatCompletion("generate-task", {
         messages: [
           {
             role: "user",
@@ -146,17 +144,17 @@ ${lessonTheory ? `- Теория урока (для контекста):\n${less
         ],
         temperature: 0.7,
         max_tokens: 4000,
-      }),
-    });
-
-    if (!response.ok) {
-      const errorText = await response.text();
+      });
+    } catch (e) {
+      if (!(e instanceof LlmError)) throw e;
+      // Генерации не было — токен лимита возвращается
+      await refundRateLimit(user.id, "generate-task");
       return NextResponse.json(
         {
-          error: `Hugging Face API error: ${response.status} ${response.statusText}`,
-          details: errorText.substring(0, 1000),
+          error: `Hugging Face API error: ${e.status}`,
+          details: e.details,
         },
-        { status: response.status }
+        { status: e.status, headers: llmErrorHeaders(e) }
       );
     }
 
@@ -194,7 +192,7 @@ ${lessonTheory ? `- Теория урока (для контекста):\n${less
     return NextResponse.json({
       success: true,
       data: taskData,
-      remaining: rateLimitCheck.remaining - 1,
+      remaining: rateLimitCheck.remaining,
     });
   } catch (error) {
     console.error("Generate task error:", error);
@@ -2,8 +2,24 @@ export const runtime = "nodejs";
 export const dynamic = "force-dynamic";
 import { NextRequest, NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
+import { joinAiFlight } from "@/lib/utils/ai-flight";
+import {
+  buildAiCacheKey,
+  lookupAiResponse,
+  serializeAiCacheKey,
+  storeAiResponse,
+} from "@/lib/utils/ai-response-cache";
+import {
+  aiEventStreamResponse,
+  type ChatCompletionResult,
+  wantsEventStream,
+} from "@/lib/utils/ai-stream";
+import { LlmError, llmErrorHeaders, requestChatCompletion } from "@/lib/utils/llm-client";
+import { consumeRateLimit, retryAfterHeaders } from "@/lib/utils/rate-limit";
 
 const HF_API_KEY = process.env.HUGGINGFACE_API_KEY;
+// Увеличить при изменении промпта: закешированные подсказки старого промпта перестанут выдаваться
+const PROMPT_VERSION = 1;
 
 export async function POST(req: NextRequest) {
   try {
@@ -17,9 +33,6 @@ export async function POST(req: NextRequest) {
     const { taskId, code } = body || {};
     if (!taskId) return NextResponse.json({ error: "taskId is required" }, { status: 400 });
 
-    // Rate limit (простая заглушка — можно расширить позднее)
-    // Здесь можно подключить lib/utils/rate-limit
-
     const { data: task } = await supabase
       .from("tasks")
       .select("title, description")
@@ -27,6 +40,28 @@ export async function POST(req: NextRequest) {
       .maybeSingle();
 
     const typedTask = task as { title: string; description: string } | null;
+    const cacheKey = typedTask
+      ? await buildAiCacheKey(
+          "hint",
+          taskId,
+          PROMPT_VERSION,
+          typeof code === "string" ? code : "",
+          `${typedTask.title}\n${typedTask.description}`
+        )
+      : null;
+    if (cacheKey) {
+      const cachedHint = await lookupAiResponse(cacheKey);
+      if (cachedHint) return NextResponse.json({ success: true, hint: cachedHint, cached: true });
+    }
+
+    const rateLimit = await consumeRateLimit(supabase, user.id, "hint");
+    if (!rateLimit.allowed) {
+      return NextResponse.json(
+        { error: rateLimit.error, remaining: rateLimit.remaining },
+        { status: 429, headers: retryAfterHeaders(rateLimit) }
+      );
+    }
+
     const prompt = `Ты наставник по Python. Дай поэтапную подсказку (не решение) к задаче. Структура JSON: {\"type\": \"concept\"|\"edge_case\"|\"debug\", \"hint\": string, \"steps\": string[]}.
 Задача: ${typedTask?.title ?? "Без названия"}
 Описание: ${(typedTask?.description ?? "").slice(0, 1000)}
@@ -34,28 +69,52 @@ export async function POST(req: NextRequest) {
 
     if (!HF_API_KEY) return NextResponse.json({ error: "Hugging Face API key is not configured" }, { status: 500 });
 
-    const response = await fetch("https://router.huggingface.co/v1/chat/completions", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${HF_API_KEY}`,
-      },
-      body: JSON.stringify({ model: "openai/gpt-oss-20b", messages: [{ role: "user", content: prompt }], temperature: 0.4, max_tokens: 600 }),
-    });
-    if (!response.ok) {
-      const err = await response.text();
-      return NextResponse.json({ error: `HF error ${response.status}`, details: err.slice(0, 1000) }, { status: 502 });
-    }
-    const data = await response.json();
-    let content = data.choices?.[0]?.message?.content?.trim() || "";
-    if (content.startsWith("```")) content = content.replace(/^```[a-zA-Z]*\n?/, "").replace(/```$/, "");
-    let parsed: any = null;
+    // Одинаковые одновременные запросы (класс открыл одно задание) делят один вызов модели.
+    // req.signal не передается: ответ нужен и другим подписчикам, и кешу
+    const flightKey = cacheKey ? serializeAiCacheKey(cacheKey) : null;
+    const flight = joinAiFlight("hint", flightKey, (queuedAt) =>
+      requestChatCompletion(
+        "hint",
+        {
+          messages: [{ role: "user", content: prompt }],
+          temperature: 0.4,
+          max_tokens: 600,
+          stream: true,
+          stream_options: { include_usage: true },
+        },
+        queuedAt
+      )
+    );
     try {
-      parsed = JSON.parse(content);
-    } catch {
-      parsed = { type: "concept", hint: content.slice(0, 400), steps: [] };
+      await flight.ready;
+    } catch (e) {
+      if (e instanceof LlmError) {
+        return NextResponse.json(
+          { error: e.message, details: e.details },
+          { status: e.status, headers: llmErrorHeaders(e) }
+        );
+      }
+      throw e;
+    }
+
+    const finish = async ({ content: raw, totalTokens }: ChatCompletionResult) => {
+      let content = raw.trim();
+      if (content.startsWith("```")) content = content.replace(/^```[a-zA-Z]*\n?/, "").replace(/```$/, "");
+      let parsed: any = null;
+      try {
+        parsed = JSON.parse(content);
+        // Кешируем только разобранный ответ, запасной вариант лучше перезапросить
+        if (cacheKey && flight.leader) await storeAiResponse(cacheKey, parsed, totalTokens);
+      } catch {
+        parsed = { type: "concept", hint: content.slice(0, 400), steps: [] };
+      }
+      return { success: true, hint: parsed };
+    };
+
+    if (wantsEventStream(req)) {
+      return aiEventStreamResponse((onDelta) => flight.subscribe(onDelta), finish);
     }
-    return NextResponse.json({ success: true, hint: parsed });
+    return NextResponse.json(await finish(await flight.subscribe()));
   } catch (e) {
     return NextResponse.json({ error: e instanceof Error ? e.message : "Unknown error" }, { status: 500 });
   }
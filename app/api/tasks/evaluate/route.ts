@@ -2,8 +2,26 @@ export const runtime = "nodejs";
 export const dynamic = "force-dynamic";
 import { NextRequest, NextResponse } from "next/server";
 import { createClient } from "@/lib/supabase/server";
+import { joinAiFlight } from "@/lib/utils/ai-flight";
+import {
+  buildAiCacheKey,
+  lookupAiResponse,
+  serializeAiCacheKey,
+  storeAiResponse,
+} from "@/lib/utils/ai-response-cache";
+import {
+  aiEventStreamResponse,
+  type ChatCompletionResult,
+  wantsEventStream,
+} from "@/lib/utils/ai-stream";
+import { LlmError, llmErrorHeaders, requestChatCompletion } from "@/lib/utils/llm-client";
+import { consumeRateLimit, retryAfterHeaders } from "@/lib/utils/rate-limit";
 
 const HF_API_KEY = process.env.HUGGINGFACE_API_KEY;
+// Увеличить при изменении промпта: закешированные оценки старого промпта перестанут выдаваться
+const PROMPT_VERSION = 1;
+
+type Evaluation = { score: number; feedback: string };
 
 export async function POST(req: NextRequest) {
   try {
@@ -19,10 +37,6 @@ export async function POST(req: NextRequest) {
       return NextResponse.json({ error: "taskId and code are required" }, { status: 400 });
     }
 
-    if (!HF_API_KEY) {
-      return NextResponse.json({ error: "Hugging Face API key is not configured" }, { status: 500 });
-    }
-
     // Получим описание задачи (минимальный контекст)
     const { data: task } = await supabase
       .from("tasks")
@@ -31,6 +45,36 @@ export async function POST(req: NextRequest) {
       .maybeSingle();
 
     const typedTask = task as { title: string; description: string } | null;
+    const cacheKey = typedTask
+      ? await buildAiCacheKey(
+          "evaluate",
+          taskId,
+          PROMPT_VERSION,
+          code,
+          JSON.stringify([typedTask.title, typedTask.description, runtimeOutput, testSummary])
+        )
+      : null;
+    if (cacheKey) {
+      const cachedEvaluation = await lookupAiResponse<Evaluation>(cacheKey);
+      if (cachedEvaluation) {
+        const { score, feedback } = cachedEvaluation;
+        const passed = score >= 0.7;
+        return NextResponse.json({ success: true, score, feedback, passed, cached: true });
+      }
+    }
+
+    if (!HF_API_KEY) {
+      return NextResponse.json({ error: "Hugging Face API key is not configured" }, { status: 500 });
+    }
+
+    const rateLimit = await consumeRateLimit(supabase, user.id, "evaluate");
+    if (!rateLimit.allowed) {
+      return NextResponse.json(
+        { error: rateLimit.error, remaining: rateLimit.remaining },
+        { status: 429, headers: retryAfterHeaders(rateLimit) }
+      );
+    }
+
     const prompt = `Ты — наставник по Python для школьника. Оцени решение задачи по критериям: корректность, покрытие крайних случаев, читаемость. Верни ТОЛЬКО JSON {\"score\": number 0..1, \"feedback\": string}.
 
 Задача: ${typedTask?.title ?? "Без названия"}
@@ -41,41 +85,62 @@ export async function POST(req: NextRequest) {
 Вывод выполнения:${runtimeOutput ? `\n${String(runtimeOutput).slice(0, 2000)}` : "\n(нет)"}
 Результаты тестов (сводка):${testSummary ? `\n${String(testSummary).slice(0, 1000)}` : "\n(нет)"}`;
 
-    const response = await fetch("https://router.huggingface.co/v1/chat/completions", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${HF_API_KEY}`,
-      },
-      body: JSON.stringify({
-        model: "openai/gpt-oss-20b",
-        messages: [{ role: "user", content: prompt }],
-        temperature: 0.2,
-        max_tokens: 800,
-      }),
-    });
-
-    if (!response.ok) {
-      const err = await response.text();
-      return NextResponse.json({ error: `HF error ${response.status}`, details: err.slice(0, 1000) }, { status: 502 });
-    }
-
-    const data = await response.json();
-    let content = data.choices?.[0]?.message?.content?.trim() || "";
-    if (content.startsWith("```")) {
-      content = content.replace(/^```[a-zA-Z]*\n?/, "").replace(/```$/, "");
-    }
-    let parsed: { score: number; feedback: string } | null = null;
+    // Одинаковые одновременные запросы (класс открыл одно задание) делят один вызов модели.
+    // req.signal не передается: ответ нужен и другим подписчикам, и кешу
+    const flightKey = cacheKey ? serializeAiCacheKey(cacheKey) : null;
+    const flight = joinAiFlight("evaluate", flightKey, (queuedAt) =>
+      requestChatCompletion(
+        "evaluate",
+        {
+          messages: [{ role: "user", content: prompt }],
+          temperature: 0.2,
+          max_tokens: 800,
+          stream: true,
+          stream_options: { include_usage: true },
+        },
+        queuedAt
+      )
+    );
     try {
-      parsed = JSON.parse(content);
-    } catch {
-      parsed = { score: 0, feedback: "Оценка недоступна. Попробуйте ещё раз." };
+      await flight.ready;
+    } catch (e) {
+      if (e instanceof LlmError) {
+        return NextResponse.json(
+          { error: e.message, details: e.details },
+          { status: e.status, headers: llmErrorHeaders(e) }
+        );
+      }
+      throw e;
     }
 
-    const score = typeof parsed?.score === "number" ? parsed.score : 0;
-    const feedback = typeof parsed?.feedback === "string" ? parsed.feedback : "";
-    const passed = score >= 0.7;
-    return NextResponse.json({ success: true, score, feedback, passed });
+    const finish = async ({ content: raw, totalTokens }: ChatCompletionResult) => {
+      let content = raw.trim();
+      if (content.startsWith("```")) {
+        content = content.replace(/^```[a-zA-Z]*\n?/, "").replace(/```$/, "");
+      }
+      let parsed: Evaluation | null = null;
+      let parsedFromModel = false;
+      try {
+        parsed = JSON.parse(content);
+        parsedFromModel = true;
+      } catch {
+        parsed = { score: 0, feedback: "Оценка недоступна. Попробуйте ещё раз." };
+      }
+
+      const score = typeof parsed?.score === "number" ? parsed.score : 0;
+      const feedback = typeof parsed?.feedback === "string" ? parsed.feedback : "";
+      // Кешируем только разобранную оценку, запасной ответ лучше перезапросить
+      if (cacheKey && flight.leader && parsedFromModel && typeof parsed?.score === "number") {
+        await storeAiResponse(cacheKey, { score, feedback }, totalTokens);
+      }
+      const passed = score >= 0.7;
+      return { success: true, score, feedback, passed };
+    };
+
+    if (wantsEventStream(req)) {
+      return aiEventStreamResponse((onDelta) => flight.subscribe(onDelta), finish);
+    }
+    return NextResponse.json(await finish(await flight.subscribe()));
   } catch (e) {
     return NextResponse.json({ error: e instanceof Error ? e.message : "Unknown error" }, { status: 500 });
   }
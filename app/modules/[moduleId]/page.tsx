@@ -38,22 +38,18 @@ export default async function ModulePage({
 
   const typedTasks = (tasks || []) as Task[];
 
-  // Прогресс по задачам: количество задач с успешными попытками пользователя
+  // Прогресс по задачам: решенные задания считаются в БД (get_module_progress)
   let completedTaskIds: string[] = [];
   if (typedTasks.length) {
-    const { data: attempts } = await supabase
-      .from("task_attempts")
-      .select("task_id,is_successful")
-      .eq("user_id", user.id)
-      .in("task_id", typedTasks.map((t) => t.id));
-    if (attempts) {
-      const typedAttempts = attempts as Array<{ task_id: string; is_successful: boolean }>;
-      const set = new Set<string>();
-      for (const a of typedAttempts) {
-        if (a.is_successful) set.add(a.task_id);
-      }
-      completedTaskIds = Array.from(set);
+    const { data: progressRows, error: progressError } = await (supabase.rpc as any)(
+      "get_module_progress",
+      { p_module_ids: [moduleId] }
+    );
+    if (progressError) {
+      console.error("Error loading module progress:", progressError);
     }
+    const typedProgress = (progressRows || []) as Array<{ completed_task_ids: string[] }>;
+    completedTaskIds = typedProgress[0]?.completed_task_ids ?? [];
   }
   const totalTasks = typedTasks.length;
   const completedTasks = completedTaskIds.length;
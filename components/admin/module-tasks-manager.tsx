@@ -112,9 +112,13 @@ export function ModuleTasksManager({ moduleId, newTaskId, refreshTrigger }: Modu
     if (!confirm(`Вы уверены, что хотите удалить задание "${taskTitle}"?`)) return;
 
     try {
-      const { error } = await supabase.from("tasks").delete().eq("id", taskId);
+      // Через API: маршрут сбрасывает серверный кеш каталога модулей
+      const res = await fetch(`/api/admin/tasks/${taskId}/delete`, { method: "POST" });
 
-      if (error) throw error;
+      if (!res.ok) {
+        const body = await res.json().catch(() => ({}));
+        throw new Error((body as any)?.error || `${res.status} ${res.statusText}`);
+      }
 
       toast({
         title: "Задание удалено",
@@ -12,6 +12,7 @@ import {
   SelectTrigger,
   SelectValue,
 } from "@/components/ui/select";
+import { Switch } from "@/components/ui/switch";
 import { Textarea } from "@/components/ui/textarea";
 import { Accordion, AccordionContent, AccordionItem, AccordionTrigger } from "@/components/ui/accordion";
 import { useToast } from "@/hooks/use-toast";
@@ -50,6 +51,13 @@ type TestCase = {
   is_visible: boolean;
 };
 
+async function readApiError(res: Response): Promise<string> {
+  const body = await res.json().catch(() => ({}));
+  const details = (body as any)?.details;
+  const message = (body as any)?.error || `${res.status} ${res.statusText}`;
+  return details ? `${message} — ${details}` : message;
+}
+
 export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProps) {
   const [title, setTitle] = useState("");
   const [description, setDescription] = useState("");
@@ -67,6 +75,10 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
     }
   }, [difficulty, taskId]);
   const [orderIndex, setOrderIndex] = useState("0");
+  // Бюджеты времени проверки; пустое поле — значение по умолчанию
+  const [timeLimitMs, setTimeLimitMs] = useState("");
+  const [suiteTimeLimitMs, setSuiteTimeLimitMs] = useState("");
+  const [checksPerformance, setChecksPerformance] = useState(false);
   const [currentModuleId, setCurrentModuleId] = useState(moduleId || "");
   const [loading, setLoading] = useState(false);
   const [generating, setGenerating] = useState(false);
@@ -123,6 +135,9 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
         order_index: number;
         module_id: string;
         test_cases: any;
+        time_limit_ms: number | null;
+        suite_time_limit_ms: number | null;
+        checks_performance: boolean | null;
       };
       setTitle(typedData.title);
       setDescription(typedData.description);
@@ -134,6 +149,9 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
       setXpReward(typedData.xp_reward?.toString() || defaultXP.toString());
       setOrderIndex(typedData.order_index.toString());
       setCurrentModuleId(typedData.module_id);
+      setTimeLimitMs(typedData.time_limit_ms?.toString() ?? "");
+      setSuiteTimeLimitMs(typedData.suite_time_limit_ms?.toString() ?? "");
+      setChecksPerformance(typedData.checks_performance ?? false);
 
       // Парсим тестовые случаи
       try {
@@ -250,6 +268,11 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
     const parsedXP = Number.parseInt(xpReward, 10);
     const finalXP = parsedXP > 0 ? parsedXP : defaultXP;
 
+    const parseLimit = (value: string): number | null => {
+      const parsed = Number.parseInt(value, 10);
+      return parsed > 0 ? parsed : null;
+    };
+
     const taskData = {
       title,
       description,
@@ -259,16 +282,22 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
       difficulty,
       xp_reward: finalXP,
       order_index: Number.parseInt(orderIndex),
+      time_limit_ms: parseLimit(timeLimitMs),
+      suite_time_limit_ms: parseLimit(suiteTimeLimitMs),
+      checks_performance: checksPerformance,
       module_id: currentModuleId,
     } as Database["public"]["Tables"]["tasks"]["Insert"];
 
     try {
       if (taskId) {
-        const updateData = { ...taskData } as any;
-        delete updateData.module_id; // модуль не меняем при редактировании
-        const { error } = await (supabase.from("tasks") as any).update(updateData).eq("id", taskId);
-
-        if (error) throw error;
+        // Через API: маршрут сбрасывает серверный кеш каталога модулей
+        const res = await fetch(`/api/admin/tasks/${taskId}/update`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          credentials: "include",
+          body: JSON.stringify(taskData),
+        });
+        if (!res.ok) throw new Error(await readApiError(res));
 
         toast({
           title: "Задание обновлено",
@@ -280,9 +309,13 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
           throw new Error("Не указан модуль");
         }
 
-        const { data, error } = await (supabase.from("tasks") as any).insert(taskData).select("id").single();
-
-        if (error) throw error;
+        const res = await fetch(`/api/admin/modules/${currentModuleId}/tasks/create`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          credentials: "include",
+          body: JSON.stringify(taskData),
+        });
+        if (!res.ok) throw new Error(await readApiError(res));
 
         toast({
           title: "Задание создано",
@@ -499,6 +532,43 @@ export function TaskForm({ moduleId, taskId, onSuccess, onCancel }: TaskFormProp
               />
             </div>
           </div>
+          <div className="grid grid-cols-3 gap-4">
+            <div className="space-y-2">
+              <Label htmlFor="timeLimitMs">Лимит на тест, мс</Label>
+              <Input
+                id="timeLimitMs"
+                type="number"
+                value={timeLimitMs}
+                onChange={(e) => setTimeLimitMs(e.target.value)}
+                min="1"
+                placeholder="5000"
+                disabled={loading}
+              />
+            </div>
+            <div className="space-y-2">
+              <Label htmlFor="suiteTimeLimitMs">Лимит на все тесты, мс</Label>
+              <Input
+                id="suiteTimeLimitMs"
+                type="number"
+                value={suiteTimeLimitMs}
+                onChange={(e) => setSuiteTimeLimitMs(e.target.value)}
+                min="1"
+                placeholder="30000"
+                disabled={loading}
+              />
+            </div>
+            <div className="flex items-center space-x-2 pt-8">
+              <Switch
+                id="checksPerformance"
+                checked={checksPerformance}
+                onCheckedChange={setChecksPerformance}
+                disabled={loading}
+              />
+              <Label htmlFor="checksPerformance" className="cursor-pointer">
+                Проверять скорость решения
+              </Label>
+            </div>
+          </div>
         </CardContent>
         <CardFooter className="flex justify-between">
           <Button 
@@ -44,10 +44,12 @@ export function TasksList({ lessonId }: TasksListProps) {
   async function handleDelete(id: string) {
     if (!confirm("Вы уверены, что хотите удалить это задание?")) return;
 
-    const { error } = await supabase.from("tasks").delete().eq("id", id);
+    // Через API: маршрут сбрасывает серверный кеш каталога модулей
+    const res = await fetch(`/api/admin/tasks/${id}/delete`, { method: "POST" });
 
-    if (error) {
-      alert(`Ошибка: ${error.message}`);
+    if (!res.ok) {
+      const body = await res.json().catch(() => ({}));
+      alert(`Ошибка: ${(body as any)?.error || `${res.status} ${res.statusText}`}`);
       return;
     }
 
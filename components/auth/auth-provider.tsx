@@ -1,6 +1,7 @@
 "use client";
 
 import { createClient } from "@/lib/supabase/client";
+import { registerAssetCacheWorker } from "@/lib/utils/service-worker";
 import type { Database } from "@/types/supabase";
 import type { User } from "@supabase/supabase-js";
 import { createContext, useContext, useEffect, useState, useRef } from "react";
@@ -93,6 +94,13 @@ export function AuthProvider({ children }: { children: React.ReactNode }) {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
+  // После входа кешируем Pyodide и Monaco, чтобы задания открывались без ожидания сети
+  useEffect(() => {
+    if (user) {
+      registerAssetCacheWorker();
+    }
+  }, [user]);
+
   async function loadProfile(userId: string): Promise<UserProfile | null> {
     if (loadingProfileRef.current === userId) {
       return null;
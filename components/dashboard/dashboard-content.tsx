@@ -6,6 +6,7 @@ import { Badge } from "@/components/ui/badge";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Progress } from "@/components/ui/progress";
 import { AchievementsList } from "@/components/achievements/achievements-list";
+import type { UserStreaks } from "@/lib/utils/achievements";
 
 type UserProfile = Database["public"]["Tables"]["users"]["Row"];
 type UserAchievementView = {
@@ -31,14 +32,32 @@ interface DashboardStats {
   avgSolvingTime: number;
 }
 
+/**
+ * Попытки за один день (UTC) из get_dashboard_stats
+ */
+export interface ActivityDay {
+  date: string;
+  attempts: number;
+  successful: number;
+}
+
 interface DashboardContentProps {
   profile: UserProfile | null;
   stats: DashboardStats;
   achievements?: UserAchievementView[];
+  streaks?: UserStreaks | null;
+  recentActivity?: ActivityDay[];
 }
 
-export function DashboardContent({ profile, stats, achievements }: DashboardContentProps) {
+export function DashboardContent({
+  profile,
+  stats,
+  achievements,
+  streaks,
+  recentActivity = [],
+}: DashboardContentProps) {
   const levelProgress = calculateLevelProgress(stats.totalXp);
+  const maxDailyAttempts = Math.max(1, ...recentActivity.map((day) => day.attempts));
 
   return (
     <div className="container mx-auto px-4 py-8">
@@ -121,6 +140,35 @@ export function DashboardContent({ profile, stats, achievements }: DashboardCont
         </CardContent>
       </Card>
 
+      {/* Активность за последние дни */}
+      {recentActivity.length > 0 && (
+        <Card className="mb-8">
+          <CardHeader>
+            <CardTitle>Активность за {recentActivity.length} дней</CardTitle>
+            <CardDescription>Попытки по дням, зеленым — успешные</CardDescription>
+          </CardHeader>
+          <CardContent>
+            <div className="flex h-24 items-end gap-1">
+              {recentActivity.map((day) => (
+                <div
+                  key={day.date}
+                  className="flex flex-1 flex-col justify-end rounded-sm bg-muted"
+                  style={{ height: `${(day.attempts / maxDailyAttempts) * 100}%` }}
+                  title={`${day.date}: ${day.successful} из ${day.attempts}`}
+                >
+                  <div
+                    className="rounded-sm bg-green-500"
+                    style={{
+                      height: `${day.attempts > 0 ? (day.successful / day.attempts) * 100 : 0}%`,
+                    }}
+                  />
+                </div>
+              ))}
+            </div>
+          </CardContent>
+        </Card>
+      )}
+
       {/* Дополнительная статистика и достижения */}
       <div className="grid gap-6 md:grid-cols-[2fr,3fr]">
         <Card>
@@ -162,6 +210,28 @@ export function DashboardContent({ profile, stats, achievements }: DashboardCont
                 </span>
               </div>
             )}
+            {streaks && (
+              <>
+                <div className="flex justify-between">
+                  <span className="text-sm text-muted-foreground">Дней подряд:</span>
+                  <span className="font-medium">
+                    {streaks.days.current} (рекорд {streaks.days.longest})
+                  </span>
+                </div>
+                <div className="flex justify-between">
+                  <span className="text-sm text-muted-foreground">Решений подряд без ошибок:</span>
+                  <span className="font-medium">
+                    {streaks.tasks.current} (рекорд {streaks.tasks.longest})
+                  </span>
+                </div>
+                <div className="flex justify-between">
+                  <span className="text-sm text-muted-foreground">С первой попытки подряд:</span>
+                  <span className="font-medium">
+                    {streaks.first_try.current} (рекорд {streaks.first_try.longest})
+                  </span>
+                </div>
+              </>
+            )}
           </CardContent>
         </Card>
         {profile && (
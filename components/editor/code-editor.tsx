@@ -14,11 +14,14 @@ interface CodeEditorProps {
   className?: string;
 }
 
-// Настраиваем loader для Monaco Editor с правильными путями
+// Настраиваем loader для Monaco Editor с правильными путями:
+// собственная копия из public/vendor/ (подставляется при сборке), иначе CDN
 if (typeof window !== "undefined") {
   loader.config({
     paths: {
-      vs: "https://cdn.jsdelivr.net/npm/monaco-editor@0.55.1/min/vs",
+      vs:
+        process.env.NEXT_PUBLIC_MONACO_VS_URL ||
+        "https://cdn.jsdelivr.net/npm/monaco-editor@0.55.1/min/vs",
     },
   });
 
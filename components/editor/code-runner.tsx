@@ -3,6 +3,8 @@
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Progress } from "@/components/ui/progress";
+import { OutputPanel } from "@/components/editor/output-panel";
+import { useOutputBuffers } from "@/hooks/use-output-buffer";
 import { usePyodide } from "@/hooks/use-pyodide";
 import { useState } from "react";
 import { Play, Loader2, AlertCircle, CheckCircle2, RefreshCw } from "lucide-react";
@@ -18,6 +20,7 @@ interface CodeRunnerProps {
 
 export function CodeRunner({ code, onExecutionComplete }: CodeRunnerProps) {
   const { pyodide, loading, error: pyodideError, executeCode } = usePyodide();
+  const output = useOutputBuffers();
   const [executing, setExecuting] = useState(false);
   const [result, setResult] = useState<{
     output: string;
@@ -37,9 +40,10 @@ export function CodeRunner({ code, onExecutionComplete }: CodeRunnerProps) {
 
     setExecuting(true);
     setResult(null);
+    output.reset("runner");
 
     try {
-      const executionResult = await executeCode(code, 10000);
+      const executionResult = await executeCode(code, 10000, (chunk) => output.append("runner", chunk));
       setResult(executionResult);
       if (onExecutionComplete) {
         onExecutionComplete(executionResult);
@@ -128,6 +132,10 @@ export function CodeRunner({ code, onExecutionComplete }: CodeRunnerProps) {
         )}
       </Button>
 
+      {executing && (
+        <OutputPanel buffer={output.getBuffer("runner")} version={output.version} />
+      )}
+
       {result && (
         <Card>
           <CardHeader>
@@ -160,11 +168,7 @@ export function CodeRunner({ code, onExecutionComplete }: CodeRunnerProps) {
             ) : (
               <div className="space-y-2">
                 <h4 className="text-sm font-medium">Вывод:</h4>
-                <div className="rounded-md bg-muted p-4">
-                  <pre className="text-sm whitespace-pre-wrap font-mono">
-                    {result.output || "(нет вывода)"}
-                  </pre>
-                </div>
+                <OutputPanel buffer={output.getBuffer("runner")} version={output.version} />
               </div>
             )}
           </CardContent>
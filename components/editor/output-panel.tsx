@@ -0,0 +1,97 @@
+"use client";
+
+import type { OutputBuffer } from "@/lib/utils/output-buffer";
+import { type ReactNode, useEffect, useRef, useState } from "react";
+
+/**
+ * Высота строки в пикселях (text-sm leading-5): по ней считается видимое окно
+ */
+const LINE_HEIGHT = 20;
+const VIEWPORT_HEIGHT = 320;
+/**
+ * Сколько строк рисовать за пределами видимой области, чтобы прокрутка не мигала
+ */
+const OVERSCAN = 20;
+
+interface OutputPanelProps {
+  buffer: OutputBuffer;
+  /**
+   * Версия буфера из useOutputBuffers: панель перерисовывается при ее изменении
+   */
+  version: number;
+  emptyText?: string;
+}
+
+/**
+ * Вывод программы с виртуализацией: в DOM находятся только видимые строки,
+ * поэтому даже сотни тысяч строк не блокируют отрисовку. Пока пользователь
+ * не прокрутил вывод вверх, панель следует за новыми строками.
+ */
+export function OutputPanel({ buffer, version, emptyText = "(нет вывода)" }: OutputPanelProps) {
+  const containerRef = useRef<HTMLDivElement>(null);
+  const stickToBottom = useRef(true);
+  const [scrollTop, setScrollTop] = useState(0);
+
+  // version — единственный признак того, что в буфере появились новые строки
+  useEffect(() => {
+    const container = containerRef.current;
+    if (container && stickToBottom.current) {
+      container.scrollTop = container.scrollHeight;
+    }
+  }, [version]);
+
+  const total = buffer.length;
+  if (total === 0) {
+    return (
+      <div className="rounded-md bg-muted p-4">
+        <pre className="text-sm whitespace-pre-wrap font-mono">{emptyText}</pre>
+      </div>
+    );
+  }
+
+  const first = Math.max(0, Math.floor(scrollTop / LINE_HEIGHT) - OVERSCAN);
+  const last = Math.min(total, Math.ceil((scrollTop + VIEWPORT_HEIGHT) / LINE_HEIGHT) + OVERSCAN);
+  const rows: ReactNode[] = [];
+  for (let i = first; i < last; i++) {
+    const line = buffer.line(i);
+    rows.push(
+      <div
+        key={i}
+        className={line.stream === "stderr" ? "text-destructive" : undefined}
+        style={{ height: LINE_HEIGHT }}
+      >
+        {line.text || " "}
+      </div>
+    );
+  }
+
+  return (
+    <div className="rounded-md bg-muted">
+      {buffer.dropped > 0 && (
+        <p className="px-4 pt-2 text-xs text-muted-foreground">
+          Показаны последние {total} строк, более ранние ({buffer.dropped}) скрыты
+        </p>
+      )}
+      <div
+        ref={containerRef}
+        className="overflow-auto p-4 text-sm leading-5 font-mono"
+        style={{ maxHeight: VIEWPORT_HEIGHT + 32 }}
+        onScroll={(event) => {
+          const element = event.currentTarget;
+          setScrollTop(element.scrollTop);
+          stickToBottom.current =
+            element.scrollTop + element.clientHeight >= element.scrollHeight - LINE_HEIGHT;
+        }}
+      >
+        <div className="relative" style={{ height: total * LINE_HEIGHT }}>
+          <div
+            className="absolute left-0 min-w-full w-max whitespace-pre"
+            style={{ top: first * LINE_HEIGHT }}
+          >
+            {rows}
+          </div>
+        </div>
+      </div>
+    </div>
+  );
+}
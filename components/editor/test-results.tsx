@@ -3,7 +3,7 @@
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import type { TestSuiteResult, TestResult } from "@/types/test-case";
-import { CheckCircle2, XCircle, Eye, EyeOff } from "lucide-react";
+import { CheckCircle2, Clock, XCircle, Eye, EyeOff } from "lucide-react";
 
 interface TestResultsProps {
   testResults: TestSuiteResult;
@@ -44,6 +44,11 @@ export function TestResults({ testResults, testCases }: TestResultsProps) {
               <CheckCircle2 className="mr-1 h-3 w-3" />
               Все тесты пройдены!
             </Badge>
+          ) : testResults.tooSlow ? (
+            <Badge variant="destructive">
+              <Clock className="mr-1 h-3 w-3" />
+              Решение слишком медленное
+            </Badge>
           ) : (
             <Badge variant="destructive">
               <XCircle className="mr-1 h-3 w-3" />
@@ -53,6 +58,11 @@ export function TestResults({ testResults, testCases }: TestResultsProps) {
         </div>
       </CardHeader>
       <CardContent className="space-y-3">
+        {testResults.tooSlow && (
+          <p className="text-sm text-muted-foreground">
+            Решение не укладывается в отведенное время. Попробуйте более эффективный алгоритм.
+          </p>
+        )}
         {visibleResults.length === 0 ? (
           <p className="text-sm text-muted-foreground text-center py-4">
             Нет видимых тестов для отображения
@@ -74,6 +84,8 @@ export function TestResults({ testResults, testCases }: TestResultsProps) {
                     <div className="flex items-center gap-2">
                       {result.passed ? (
                         <CheckCircle2 className="h-5 w-5 text-primary" />
+                      ) : result.status === "timeout" ? (
+                        <Clock className="h-5 w-5 text-destructive" />
                       ) : (
                         <XCircle className="h-5 w-5 text-destructive" />
                       )}
@@ -81,7 +93,7 @@ export function TestResults({ testResults, testCases }: TestResultsProps) {
                         {testCase?.description || `Тест ${result.testCaseId}`}
                       </span>
                     </div>
-                    {result.executionTime && (
+                    {!!result.executionTime && (
                       <Badge variant="outline" className="text-xs">
                         {result.executionTime} мс
                       </Badge>
@@ -133,6 +145,7 @@ export function TestResults({ testResults, testCases }: TestResultsProps) {
           <div className="pt-3 border-t">
             <p className="text-xs text-muted-foreground">
               Общее время выполнения: {testResults.executionTime} мс
+              {testResults.fromCache && " (код не менялся — результат прошлой проверки)"}
             </p>
           </div>
         )}
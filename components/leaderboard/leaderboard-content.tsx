@@ -156,8 +156,8 @@ export function LeaderboardContent({
             {period === "all_time"
               ? "За все время"
               : period === "month"
-                ? "За последний месяц"
-                : "За последнюю неделю"}
+                ? "За текущий месяц"
+                : "За текущую неделю"}
           </CardDescription>
         </CardHeader>
         <CardContent>
@@ -9,10 +9,14 @@ import { Progress } from "@/components/ui/progress";
 import { Accordion, AccordionContent, AccordionItem, AccordionTrigger } from "@/components/ui/accordion";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { CodeEditor } from "@/components/editor/code-editor";
+import { OutputPanel } from "@/components/editor/output-panel";
 import { TestResults } from "@/components/editor/test-results";
 import { useAuth } from "@/components/auth/auth-provider";
 import { createClient } from "@/lib/supabase/client";
 import { runTestSuite } from "@/lib/utils/test-runner";
+import { type AiHint, formatHintMarkdown, requestAiStream } from "@/lib/utils/ai-stream-client";
+import { applyJsonFieldEvent } from "@/lib/utils/json-field-stream";
+import { useOutputBuffers } from "@/hooks/use-output-buffer";
 import { usePyodide } from "@/hooks/use-pyodide";
 import type { TestCase, TestSuiteResult } from "@/types/test-case";
 import { 
@@ -95,6 +99,8 @@ export function ModuleUnifiedPage({
   }, [openItems]);
   const { toast } = useToast();
   const { pyodide, loading: pyodideLoading, error: pyodideError, executeCode } = usePyodide();
+  // Вывод каждого задания хранится в своем кольцевом буфере
+  const output = useOutputBuffers();
   
   // Состояния фильтров и сортировки
   const [filterStatus, setFilterStatus] = useState<FilterStatus>("all");
@@ -254,9 +260,10 @@ export function ModuleUnifiedPage({
       ...prev,
       [taskId]: { ...prev[taskId], running: true, executionResult: null },
     }));
+    output.reset(taskId);
 
     try {
-      const result = await executeCode(state.code, 10000);
+      const result = await executeCode(state.code, 10000, (chunk) => output.append(taskId, chunk));
       setTaskStates(prev => ({
         ...prev,
         [taskId]: { ...prev[taskId], running: false, executionResult: result },
@@ -348,7 +355,11 @@ export function ModuleUnifiedPage({
     }));
 
     try {
-      const results = await runTestSuite(state.code, testCases, pyodide);
+      const results = await runTestSuite(state.code, testCases, pyodide, {
+        caseTimeLimitMs: task.time_limit_ms,
+        suiteTimeLimitMs: task.suite_time_limit_ms,
+        checksPerformance: task.checks_performance,
+      });
       
       setTaskStates(prev => ({
         ...prev,
@@ -363,10 +374,11 @@ export function ModuleUnifiedPage({
       if (results.allPassed) {
         // AI-оценка решения
         try {
-          const evalRes = await fetch("/api/tasks/evaluate", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
+          // Отзыв показывается по мере генерации, оценка — когда ответ готов
+          let streamedFeedback = "";
+          const evalJson = await requestAiStream<{ success?: boolean; score: number; feedback: string }>(
+            "evaluate",
+            {
               taskId,
               code: state.code,
               runtimeOutput: state.executionResult?.output,
@@ -375,17 +387,16 @@ export function ModuleUnifiedPage({
                 passedCount: results.passedCount, 
                 total: results.totalCount 
               },
-            }),
-          });
-          if (!evalRes.ok) {
-            throw new Error(`HTTP error! status: ${evalRes.status}`);
-          }
-          const contentType = evalRes.headers.get("content-type");
-          if (!contentType || !contentType.includes("application/json")) {
-            throw new Error("Response is not JSON");
-          }
-          const evalJson = await evalRes.json();
-          if (evalRes.ok && evalJson.success) {
+            },
+            (event) => {
+              if (event.field !== "feedback") return;
+              streamedFeedback += event.delta;
+              setFeedbackTitle("AI-оценка…");
+              setFeedbackMarkdown(streamedFeedback);
+              setFeedbackOpen(true);
+            }
+          );
+          if (evalJson.success) {
             setFeedbackTitle(`AI-оценка: ${(evalJson.score * 100).toFixed(0)}%`);
             setFeedbackMarkdown(evalJson.feedback);
             setFeedbackOpen(true);
@@ -571,30 +582,20 @@ export function ModuleUnifiedPage({
     setCurrentTaskId(taskId);
     
     try {
-      const res = await fetch("/api/ai/hint", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ taskId, code: state.code }),
-      });
-      if (!res.ok) {
-        throw new Error(`HTTP error! status: ${res.status}`);
-      }
-      const contentType = res.headers.get("content-type");
-      if (!contentType || !contentType.includes("application/json")) {
-        throw new Error("Response is not JSON");
-      }
-      const data = await res.json();
-      const hint = data?.hint;
-
-      let md = ``;
-      if (Array.isArray(hint?.steps) && hint.steps.length) {
-        md += `### Шаги к решению\n\n${hint.steps.map((step: string, i: number) => `${i + 1}. ${step}`).join("\n")}`;
-      } else {
-        md += hint?.hint || "Попробуйте ещё раз";
-      }
-
+      const partial: AiHint = {};
       setHintTitle(`AI-помощник`);
-      setHintMarkdown(md);
+      const data = await requestAiStream<{ hint?: AiHint }>(
+        "hint",
+        { taskId, code: state.code },
+        (event) => {
+          if (event.field !== "hint" && event.field !== "steps") return;
+          applyJsonFieldEvent(partial, event);
+          setHintMarkdown(formatHintMarkdown(partial));
+          setHintOpen(true);
+        }
+      );
+
+      setHintMarkdown(formatHintMarkdown(data?.hint));
       setHintOpen(true);
     } catch (e) {
       const msg = e instanceof Error ? e.message : "Неизвестная ошибка";
@@ -1069,6 +1070,21 @@ export function ModuleUnifiedPage({
                                 </div>
                               )}
 
+                              {/* Вывод программы по ходу выполнения */}
+                              {state?.running && !state.executionResult && (
+                                <Card className="mt-4">
+                                  <CardHeader>
+                                    <CardTitle className="flex items-center gap-2">
+                                      <Loader2 className="h-5 w-5 animate-spin" />
+                                      Выполнение...
+                                    </CardTitle>
+                                  </CardHeader>
+                                  <CardContent>
+                                    <OutputPanel buffer={output.getBuffer(task.id)} version={output.version} />
+                                  </CardContent>
+                                </Card>
+                              )}
+
                               {/* Выполнение кода */}
                               {state?.executionResult && (
                                 <Card className="mt-4">
@@ -1092,11 +1108,7 @@ export function ModuleUnifiedPage({
                                     ) : (
                                       <div className="space-y-2">
                                         <h4 className="text-sm font-medium">Вывод:</h4>
-                                        <div className="rounded-md bg-muted p-4">
-                                          <pre className="text-sm whitespace-pre-wrap font-mono">
-                                            {state.executionResult.output || "(нет вывода)"}
-                                          </pre>
-                                        </div>
+                                        <OutputPanel buffer={output.getBuffer(task.id)} version={output.version} />
                                       </div>
                                     )}
                                   </CardContent>
@@ -12,12 +12,14 @@ import {
 import { useMemo, useState } from "react";
 
 type Module = Database["public"]["Tables"]["modules"]["Row"];
-type UserProgress = Database["public"]["Tables"]["user_progress"]["Row"];
+type UserProgress = Pick<
+  Database["public"]["Tables"]["user_progress"]["Row"],
+  "module_id" | "status"
+>;
 
 interface ModulesListProps {
   modules: Module[];
   userProgress: UserProgress[];
-  tasksCountMap?: Record<string, number>;
 }
 
 type ModuleStatus = "not_started" | "in_progress" | "completed";
@@ -42,7 +44,7 @@ function getModuleStatus(
   return progressEntry.status;
 }
 
-export function ModulesList({ modules, userProgress, tasksCountMap = {} }: ModulesListProps) {
+export function ModulesList({ modules, userProgress }: ModulesListProps) {
   const [filter, setFilter] = useState<{
     status?: ModuleStatus;
     level?: number;
@@ -175,9 +177,13 @@ export function ModulesList({ modules, userProgress, tasksCountMap = {} }: Modul
       <div className="grid gap-6 md:grid-cols-2 lg:grid-cols-3">
         {sortedModules.map((module) => {
           const status = getModuleStatus(module.id, userProgress);
-          const tasksCount = tasksCountMap[module.id] || 0;
           return (
-            <ModuleCard key={module.id} module={module} status={status} tasksCount={tasksCount} />
+            <ModuleCard
+              key={module.id}
+              module={module}
+              status={status}
+              tasksCount={module.tasks_count}
+            />
           );
         })}
       </div>
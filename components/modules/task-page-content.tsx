@@ -7,11 +7,15 @@ import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { CodeEditor } from "@/components/editor/code-editor";
+import { OutputPanel } from "@/components/editor/output-panel";
 import { TestResults } from "@/components/editor/test-results";
 import { ErrorDisplay } from "@/components/editor/error-display";
 import { useAuth } from "@/components/auth/auth-provider";
 import { createClient } from "@/lib/supabase/client";
 import { runTestSuite } from "@/lib/utils/test-runner";
+import { type AiHint, formatHintMarkdown, requestAiStream } from "@/lib/utils/ai-stream-client";
+import { applyJsonFieldEvent } from "@/lib/utils/json-field-stream";
+import { useOutputBuffers } from "@/hooks/use-output-buffer";
 import { usePyodide } from "@/hooks/use-pyodide";
 import type { TestCase, TestSuiteResult } from "@/types/test-case";
 import { ArrowLeft, ArrowRight, BookOpen, RotateCcw, Sparkles, Loader2, CheckCircle2, AlertCircle } from "lucide-react";
@@ -44,6 +48,7 @@ export function TaskPageContent({ module, task, prevTask, nextTask, lastAttempt
   const { user } = useAuth();
   const { toast } = useToast();
   const { pyodide, loading: pyodideLoading, error: pyodideError, executeCode } = usePyodide();
+  const output = useOutputBuffers();
   const [mounted, setMounted] = useState(false);
 
   useEffect(() => {
@@ -130,9 +135,10 @@ export function TaskPageContent({ module, task, prevTask, nextTask, lastAttempt
     setRunning(true);
     setTestResults(null);
     setExecutionResult(null);
+    output.reset(task.id);
 
     try {
-      const result = await executeCode(code, 10000);
+      const result = await executeCode(code, 10000, (chunk) => output.append(task.id, chunk));
       setExecutionResult(result);
     } catch (error) {
       const errorMessage = error instanceof Error ? error.message : String(error);
@@ -219,31 +225,35 @@ export function TaskPageContent({ module, task, prevTask, nextTask, lastAttempt
     setTestResults(null);
 
     try {
-      const results = await runTestSuite(code, testCases, pyodide);
+      const results = await runTestSuite(code, testCases, pyodide, {
+        caseTimeLimitMs: task.time_limit_ms,
+        suiteTimeLimitMs: task.suite_time_limit_ms,
+        checksPerformance: task.checks_performance,
+      });
       setTestResults(results);
 
       if (results.allPassed) {
         // AI-оценка решения (сервер)
         try {
-          const evalRes = await fetch("/api/tasks/evaluate", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
+          // Отзыв показывается по мере генерации, оценка — когда ответ готов
+          let streamedFeedback = "";
+          const evalJson = await requestAiStream<{ success?: boolean; score: number; feedback: string }>(
+            "evaluate",
+            {
               taskId: task.id,
               code,
               runtimeOutput: executionResult?.output,
               testSummary: { allPassed: results.allPassed, passedCount: results.passedCount, total: results.totalCount },
-            }),
-          });
-          if (!evalRes.ok) {
-            throw new Error(`HTTP error! status: ${evalRes.status}`);
-          }
-          const contentType = evalRes.headers.get("content-type");
-          if (!contentType || !contentType.includes("application/json")) {
-            throw new Error("Response is not JSON");
-          }
-          const evalJson = await evalRes.json();
-          if (evalRes.ok && evalJson.success) {
+            },
+            (event) => {
+              if (event.field !== "feedback") return;
+              streamedFeedback += event.delta;
+              setFeedbackTitle("AI-оценка…");
+              setFeedbackMarkdown(streamedFeedback);
+              setFeedbackOpen(true);
+            }
+          );
+          if (evalJson.success) {
             setFeedbackTitle(`AI-оценка: ${(evalJson.score * 100).toFixed(0)}%`);
             setFeedbackMarkdown(evalJson.feedback);
             setFeedbackOpen(true);
@@ -427,30 +437,20 @@ export function TaskPageContent({ module, task, prevTask, nextTask, lastAttempt
 
   async function handleAiHint() {
     try {
-      const res = await fetch("/api/ai/hint", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ taskId: task.id, code }),
-      });
-      if (!res.ok) {
-        throw new Error(`HTTP error! status: ${res.status}`);
-      }
-      const contentType = res.headers.get("content-type");
-      if (!contentType || !contentType.includes("application/json")) {
-        throw new Error("Response is not JSON");
-      }
-      const data = await res.json();
-      const hint = data?.hint;
-
-      let md = ``;
-      if (Array.isArray(hint?.steps) && hint.steps.length) {
-        md += `### Шаги к решению\n\n${hint.steps.map((step: string, i: number) => `${i + 1}. ${step}`).join("\n")}`;
-      } else {
-        md += hint?.hint || "Попробуйте ещё раз";
-      }
-
+      const partial: AiHint = {};
       setHintTitle(`AI-помощник`);
-      setHintMarkdown(md);
+      const data = await requestAiStream<{ hint?: AiHint }>(
+        "hint",
+        { taskId: task.id, code },
+        (event) => {
+          if (event.field !== "hint" && event.field !== "steps") return;
+          applyJsonFieldEvent(partial, event);
+          setHintMarkdown(formatHintMarkdown(partial));
+          setHintOpen(true);
+        }
+      );
+
+      setHintMarkdown(formatHintMarkdown(data?.hint));
       setHintOpen(true);
     } catch (e) {
       const msg = e instanceof Error ? e.message : "Неизвестная ошибка";
@@ -715,6 +715,21 @@ export function TaskPageContent({ module, task, prevTask, nextTask, lastAttempt
             </CardContent>
           </Card>
 
+              {/* Вывод программы по ходу выполнения */}
+          {running && !executionResult && (
+            <Card>
+              <CardHeader>
+                <CardTitle className="flex items-center gap-2">
+                  <Loader2 className="h-5 w-5 animate-spin" />
+                  Выполнение...
+                </CardTitle>
+              </CardHeader>
+              <CardContent>
+                <OutputPanel buffer={output.getBuffer(task.id)} version={output.version} />
+              </CardContent>
+            </Card>
+          )}
+
               {/* Выполнение кода */}
           {executionResult && (
             <>
@@ -736,11 +751,7 @@ export function TaskPageContent({ module, task, prevTask, nextTask, lastAttempt
                   <CardContent>
                     <div className="space-y-2">
                       <h4 className="text-sm font-medium">Вывод:</h4>
-                      <div className="rounded-md bg-muted p-4">
-                        <pre className="text-sm whitespace-pre-wrap font-mono">
-                          {executionResult.output || "(нет вывода)"}
-                        </pre>
-                      </div>
+                      <OutputPanel buffer={output.getBuffer(task.id)} version={output.version} />
                     </div>
                   </CardContent>
                 </Card>
@@ -0,0 +1,54 @@
+"use client";
+
+import { useCallback, useRef, useState } from "react";
+import type { OutputChunk } from "@/lib/pyodide/protocol";
+import { OutputBuffer } from "@/lib/utils/output-buffer";
+
+interface UseOutputBuffersReturn {
+  /**
+   * Буфер вывода по ключу (например, id задания); создается при первом обращении
+   */
+  getBuffer: (key: string) => OutputBuffer;
+  append: (key: string, chunk: OutputChunk) => void;
+  reset: (key: string) => void;
+  /**
+   * Меняется при каждом изменении любого буфера — для перерисовки OutputPanel
+   */
+  version: number;
+}
+
+/**
+ * Буферы потокового вывода программ. Сами строки живут в кольцевых буферах
+ * вне состояния React, в состоянии хранится только счетчик версий.
+ */
+export function useOutputBuffers(): UseOutputBuffersReturn {
+  const buffers = useRef(new Map<string, OutputBuffer>());
+  const [version, setVersion] = useState(0);
+
+  const getBuffer = useCallback((key: string) => {
+    let buffer = buffers.current.get(key);
+    if (!buffer) {
+      buffer = new OutputBuffer();
+      buffers.current.set(key, buffer);
+    }
+    return buffer;
+  }, []);
+
+  const append = useCallback(
+    (key: string, chunk: OutputChunk) => {
+      getBuffer(key).append(chunk.text, chunk.stream);
+      setVersion((value) => value + 1);
+    },
+    [getBuffer]
+  );
+
+  const reset = useCallback(
+    (key: string) => {
+      getBuffer(key).clear();
+      setVersion((value) => value + 1);
+    },
+    [getBuffer]
+  );
+
+  return { getBuffer, append, reset, version };
+}
@@ -0,0 +1,338 @@
+/**
+ * Общий код инициализации интерпретатора.
+ * Файл на чистом JS: его использует и воркер, и скрипт сборки снимка памяти
+ * (scripts/build-pyodide-snapshot.mjs), который запускается обычным Node.
+ */
+
+/**
+ * Версия Pyodide; должна совпадать с версией npm-пакета pyodide, которым собирается снимок
+ */
+export const PYODIDE_VERSION = "0.29.0";
+/**
+ * Откуда загружается интерпретатор: собственная копия из public/vendor/
+ * (адрес с хешем подставляет next.config.ts после npm run vendor:assets), иначе CDN
+ */
+export const PYODIDE_INDEX_URL =
+  process.env.NEXT_PUBLIC_PYODIDE_INDEX_URL ||
+  `https://cdn.jsdelivr.net/pyodide/v${PYODIDE_VERSION}/full/`;
+
+/**
+ * Где лежит описание снимка памяти, созданного при сборке
+ */
+export const SNAPSHOT_MANIFEST_URL = "/pyodide/snapshot.json";
+
+/**
+ * Python-код, выполняемый один раз после загрузки интерпретатора:
+ * настраивает перехват print() и stderr и загружает вспомогательные функции тестов.
+ * Попадает в снимок памяти, поэтому при восстановлении не выполняется заново.
+ */
+export const PYTHON_BOOTSTRAP = `
+import sys
+import json
+
+import time as _time
+from collections import deque
+
+# Как часто отправлять накопленный вывод в основной поток, секунд
+_OUTPUT_FLUSH_INTERVAL = 0.016
+# Сколько символов вывода хранить для итогового результата (остальное уже отправлено пачками)
+_OUTPUT_TAIL_LIMIT = 1_000_000
+
+def _emit_output(stream, text):
+    """Отправка пачки вывода; воркер подменяет ее JS-функцией после загрузки"""
+
+class PyodideStdout:
+    """
+    Перехват потока вывода. Пока программа работает, текст копится и уходит
+    в основной поток пачками не чаще раза в _OUTPUT_FLUSH_INTERVAL; для итогового
+    результата хранится только хвост длиной _OUTPUT_TAIL_LIMIT символов.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.reset()
+
+    def write(self, s):
+        if not s:
+            return 0
+        self.pending.append(s)
+        self.tail.append(s)
+        self.tail_size += len(s)
+        while self.tail_size > _OUTPUT_TAIL_LIMIT and len(self.tail) > 1:
+            self.tail_size -= len(self.tail.popleft())
+            self.truncated = True
+        if _time.perf_counter() - self.last_flush >= _OUTPUT_FLUSH_INTERVAL:
+            self.flush_chunks()
+        return len(s)
+
+    def flush(self):
+        pass
+
+    def flush_chunks(self):
+        """Отправляет накопленный, но еще не отправленный вывод"""
+        if self.pending:
+            text = "".join(self.pending)
+            self.pending = []
+            _emit_output(self.stream, text)
+        self.last_flush = _time.perf_counter()
+
+    def getvalue(self):
+        value = "".join(self.tail)
+        if self.truncated or len(value) > _OUTPUT_TAIL_LIMIT:
+            return "...\\n" + value[-_OUTPUT_TAIL_LIMIT:]
+        return value
+
+    def reset(self):
+        self.pending = []
+        self.tail = deque()
+        self.tail_size = 0
+        self.truncated = False
+        self.last_flush = _time.perf_counter()
+
+_stdout_capture = PyodideStdout("stdout")
+_stderr_capture = PyodideStdout("stderr")
+sys.stdout = _stdout_capture
+sys.stderr = _stderr_capture
+
+import builtins as _builtins_module
+# Модули, нужные самому раннеру; загружаем заранее, чтобы они попали в исходное состояние sys.modules
+import ast
+import traceback
+
+# Шаблон пространства имен запуска. Каждый запуск получает поверхностную копию,
+# поэтому переменные, импорты и функции ученика не переживают запуск
+_NAMESPACE_TEMPLATE = {"__name__": "__main__", "__builtins__": _builtins_module}
+_BUILTINS_TEMPLATE = dict(_builtins_module.__dict__)
+
+# Модули интерпретатора и Pyodide: их не выгружаем и не откатываем
+_PROTECTED_MODULES = ("sys", "builtins", "__main__", "pyodide", "_pyodide", "js", "asyncio", "encodings")
+# Исходное состояние модулей: снимается перед первым запуском, после восстановления из снимка памяти
+_MODULES_BASELINE = None
+
+def _restore_dict(current, template, len=len, all=all):
+    """
+    Возвращает словарь к шаблону: удаляет новые ключи и восстанавливает прежние значения.
+    len и all связаны при определении: ученик мог подменить их в builtins
+    """
+    if len(current) == len(template) and all(current.get(k) is v for k, v in template.items()):
+        return
+    for key in [k for k in current if k not in template]:
+        del current[key]
+    current.update(template)
+
+def _is_protected_module(name, any=any):
+    return any(name == p or name.startswith(p + ".") for p in _PROTECTED_MODULES)
+
+def _restore_builtins():
+    """Откатывает изменения модуля builtins (например, builtins.print = ...) от прошлого запуска"""
+    _restore_dict(_builtins_module.__dict__, _BUILTINS_TEMPLATE)
+
+def _restore_modules():
+    """
+    Откатывает изменения модулей от прошлого запуска:
+    - модули, импортированные учеником, выгружаются из sys.modules и при следующем import
+      загружаются заново (в том числе random с новым состоянием генератора);
+    - атрибуты модулей, загруженных до первого запуска, возвращаются к исходным (math.pi = 3);
+    - sys.stdout и sys.stderr снова указывают на перехватчики вывода.
+    Изменения внутри объектов модулей (append в список, состояние экземпляров) не откатываются.
+    """
+    global _MODULES_BASELINE
+    sys.stdout = _stdout_capture
+    sys.stderr = _stderr_capture
+    if _MODULES_BASELINE is None:
+        _MODULES_BASELINE = {
+            name: (module, dict(vars(module)))
+            for name, module in sys.modules.items()
+            if module is not None and not _is_protected_module(name)
+        }
+        return
+    for name in [n for n in sys.modules if n not in _MODULES_BASELINE]:
+        if not _is_protected_module(name):
+            del sys.modules[name]
+    for name, (module, attrs) in _MODULES_BASELINE.items():
+        sys.modules[name] = module
+        _restore_dict(module.__dict__, attrs)
+
+def _fresh_namespace():
+    """Чистое пространство имен для очередного запуска"""
+    _restore_builtins()
+    _restore_modules()
+    return dict(_NAMESPACE_TEMPLATE)
+
+def _test_equal(actual, expected):
+    """Глубокое сравнение без сериализации: float с допуском, bool не равен int"""
+    if isinstance(actual, bool) or isinstance(expected, bool):
+        return isinstance(actual, bool) and isinstance(expected, bool) and actual == expected
+
+    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+        if isinstance(actual, float) or isinstance(expected, float):
+            return abs(actual - expected) < 0.0001
+        return actual == expected
+
+    # Кортеж и список считаем одинаковыми последовательностями (как в JSON)
+    if isinstance(actual, (list, tuple)) and isinstance(expected, (list, tuple)):
+        return len(actual) == len(expected) and all(
+            _test_equal(a, e) for a, e in zip(actual, expected)
+        )
+
+    # Ключи ожидаемых значений из JSON всегда строки, поэтому сравниваем str(key)
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        if len(actual) != len(expected):
+            return False
+        expected_items = {str(key): value for key, value in expected.items()}
+        for key, value in actual.items():
+            key = str(key)
+            if key not in expected_items or not _test_equal(value, expected_items[key]):
+                return False
+        return True
+
+    return actual == expected
+
+def _test_compare(actual, expected):
+    """Сравнивает два значения с учетом разных типов"""
+    try:
+        # Для чисел используем приблизительное сравнение для float
+        if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+            if isinstance(actual, float) or isinstance(expected, float):
+                return abs(actual - expected) < 0.0001
+            return actual == expected
+
+        # Для строк сравниваем с учетом пробелов
+        if isinstance(actual, str) and isinstance(expected, str):
+            return actual.strip() == expected.strip()
+
+        # Списки, словари и остальное сравниваем рекурсивно
+        return _test_equal(actual, expected)
+    except Exception:
+        return False
+
+def _test_plain(value):
+    """Приводит результат к типам, которые можно передать в JS"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_test_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _test_plain(item) for key, item in value.items()}
+    return repr(value)
+
+class _CaseTimeout(BaseException):
+    """Тест превысил бюджет времени (резервный механизм через sys.settrace)"""
+
+def _deadline_tracer(deadline):
+    """
+    Трассировщик, прерывающий выполнение после дедлайна. Используется, только если
+    недоступен буфер прерывания (страница не cross-origin isolated): он заметно замедляет код
+    """
+    import time
+    clock = time.perf_counter
+    events = 0
+
+    def tracer(frame, event, arg):
+        nonlocal events
+        # События по опкодам: однострочный "while True: pass" не порождает событий line
+        frame.f_trace_opcodes = True
+        events += 1
+        if events % 1000 == 0 and clock() > deadline:
+            raise _CaseTimeout()
+        return tracer
+
+    return tracer
+
+def _check_syntax(user_code):
+    """Компилирует код без выполнения: возвращает описание синтаксической ошибки или None"""
+    import ast
+    try:
+        compile(user_code, "<main>", "exec", flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT, dont_inherit=True)
+    except SyntaxError as e:
+        location = f" (строка {e.lineno})" if e.lineno else ""
+        return f"{type(e).__name__}: {e.msg}{location}"
+    except ValueError as e:
+        return f"SyntaxError: {e}"
+    return None
+
+def _run_test_suite(user_code, function_name, cases, case_budget_ms, suite_budget_ms, use_trace):
+    """
+    Выполняет все тесты за один вызов: код ученика компилируется и выполняется
+    один раз, затем функция вызывается для каждого тестового случая.
+    cases — список словарей, уже сконвертированный из JS через pyodide.toPy.
+    Бюджеты времени соблюдаются через KeyboardInterrupt от главного потока
+    (_case_started сообщает ему о начале случая) или через sys.settrace при use_trace.
+    """
+    namespace = _fresh_namespace()
+    try:
+        return _run_cases(namespace, user_code, function_name, cases, case_budget_ms, suite_budget_ms, use_trace)
+    finally:
+        # Разрываем циклы функция -> globals, чтобы память освобождалась сразу
+        namespace.clear()
+
+def _run_cases(namespace, user_code, function_name, cases, case_budget_ms, suite_budget_ms, use_trace):
+    import time
+    import traceback
+
+    clock = time.perf_counter
+    suite_deadline = clock() + suite_budget_ms / 1000
+
+    try:
+        if use_trace:
+            sys.settrace(_deadline_tracer(suite_deadline))
+        exec(compile(user_code, "<main>", "exec"), namespace)
+    except (KeyboardInterrupt, _CaseTimeout):
+        return {"setup_error": None, "setup_timeout": True, "results": []}
+    except Exception as e:
+        return {"setup_error": traceback.format_exception_only(type(e), e)[-1].strip(), "setup_timeout": False, "results": []}
+    finally:
+        sys.settrace(None)
+
+    function = namespace.get(function_name)
+    if not callable(function):
+        return {"setup_error": f"NameError: name '{function_name}' is not defined", "setup_timeout": False, "results": []}
+
+    results = []
+    for index, case in enumerate(cases):
+        # Общий бюджет исчерпан: оставшиеся случаи не запускаем
+        if clock() >= suite_deadline:
+            results.append({"id": case["id"], "status": "timeout", "passed": False, "actual": None, "error": None, "time_ms": 0.0})
+            continue
+
+        started = clock()
+        deadline = min(started + case_budget_ms / 1000, suite_deadline)
+        actual = None
+        error = None
+        try:
+            _case_started(index)
+            if use_trace:
+                sys.settrace(_deadline_tracer(deadline))
+            try:
+                actual = function(**(case.get("input") or {}))
+            finally:
+                sys.settrace(None)
+            status = "passed" if _test_compare(actual, case.get("expected_output")) else "failed"
+        except (KeyboardInterrupt, _CaseTimeout):
+            actual = None
+            status = "timeout"
+        except Exception as e:
+            actual = None
+            status = "error"
+            error = str(e)
+        results.append({
+            "id": case["id"],
+            "status": status,
+            "passed": status == "passed",
+            "actual": _test_plain(actual),
+            "error": error,
+            "time_ms": (clock() - started) * 1000,
+        })
+
+    return {"setup_error": None, "setup_timeout": False, "results": results}
+`;
+
+/**
+ * Выполняется после восстановления из снимка: Pyodide заново настраивает
+ * стандартные потоки при запуске, поэтому перехват вывода подключаем повторно
+ */
+export const PYTHON_AFTER_RESTORE = `
+import sys
+sys.stdout = _stdout_capture
+sys.stderr = _stderr_capture
+`;
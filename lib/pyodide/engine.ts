@@ -0,0 +1,483 @@
+import { sha256Hex } from "@/lib/utils/hash";
+import { LruCache } from "@/lib/utils/lru-cache";
+import { PYODIDE_INDEX_URL } from "./bootstrap.mjs";
+import {
+  CASE_INDEX_OFFSET,
+  type ExecResult,
+  INTERRUPT_BUFFER_BYTES,
+  INTERRUPT_SIGINT,
+  type OutputChunk,
+  type WorkerRequest,
+  type WorkerResponse,
+} from "./protocol";
+
+type ResultMessage = Extract<WorkerResponse, { type: "result" }>;
+type JobRequest = Extract<WorkerRequest, { type: "exec" | "check" | "test" }>;
+type DistributiveOmit<T, K extends keyof T> = T extends unknown ? Omit<T, K> : never;
+
+/**
+ * Сколько ждать реакции на KeyboardInterrupt, прежде чем убить воркер
+ */
+const INTERRUPT_GRACE_MS = 1000;
+
+/**
+ * Ограничение на компиляцию кода при проверке синтаксиса
+ */
+const CHECK_TIMEOUT_MS = 5000;
+
+/**
+ * Сколько результатов проверки синтаксиса помнить (по хешу кода)
+ */
+const SYNTAX_CACHE_SIZE = 100;
+
+/**
+ * Сколько последних замеров времени загрузки хранить для метрик
+ */
+const BOOT_SAMPLES_LIMIT = 20;
+
+/**
+ * Ключ localStorage с временем последней загрузки без снимка — база для оценки экономии
+ */
+const COLD_BOOT_STORAGE_KEY = "pyodide_cold_boot_ms";
+
+export interface TestTimeLimits {
+  /**
+   * Бюджет на один тестовый случай, мс
+   */
+  caseTimeLimit: number;
+  /**
+   * Бюджет на весь набор, включая выполнение кода ученика на уровне модуля, мс
+   */
+  suiteTimeLimit: number;
+}
+
+export interface PyodideEngineOptions {
+  indexURL?: string;
+  /**
+   * Сколько запасных «горячих» интерпретаторов держать наготове
+   */
+  spareWorkers?: number;
+}
+
+export interface PyodideEngineMetrics {
+  /**
+   * Размер пула: активный воркер + запасные
+   */
+  poolSize: number;
+  spareWorkers: number;
+  readySpares: number;
+  /**
+   * Время загрузки Pyodide внутри воркера (последние замеры), мс
+   */
+  bootTimes: number[];
+  averageBootTime: number | null;
+  restarts: number;
+  /**
+   * Сколько заняла последняя замена интерпретатора (до готовности нового), мс
+   */
+  lastSwapTime: number | null;
+  /**
+   * Сколько загрузок прошло через восстановление снимка памяти
+   */
+  snapshotBoots: number;
+  /**
+   * Сколько времени сэкономила последняя загрузка из снимка по сравнению
+   * с последней известной холодной загрузкой на этом устройстве, мс
+   */
+  snapshotSavedTime: number | null;
+  /**
+   * Размер памяти WebAssembly активного интерпретатора после последнего запуска, байт.
+   * Должен оставаться постоянным при повторных проверках одного и того же решения.
+   */
+  heapBytes: number | null;
+}
+
+/**
+ * Один воркер с интерпретатором и его состояние
+ */
+class WorkerHandle {
+  readonly worker: Worker;
+  readonly interruptFlag: Uint8Array | null = null;
+  readonly caseIndex: Int32Array | null = null;
+  readonly ready: Promise<void>;
+  readonly pending = new Map<number, (message: ResultMessage | null) => void>();
+  readonly caseListeners = new Map<number, (index: number) => void>();
+  readonly outputListeners = new Map<number, (chunk: OutputChunk) => void>();
+  isReady = false;
+
+  constructor(indexURL: string, onBoot: (bootTime: number, fromSnapshot: boolean) => void) {
+    this.worker = new Worker(new URL("./worker.ts", import.meta.url));
+
+    // SharedArrayBuffer доступен только на cross-origin isolated страницах (COOP/COEP)
+    let interruptBuffer: SharedArrayBuffer | null = null;
+    if (typeof SharedArrayBuffer !== "undefined" && window.crossOriginIsolated) {
+      interruptBuffer = new SharedArrayBuffer(INTERRUPT_BUFFER_BYTES);
+      this.interruptFlag = new Uint8Array(interruptBuffer, 0, 1);
+      this.caseIndex = new Int32Array(interruptBuffer, CASE_INDEX_OFFSET, 1);
+    }
+
+    this.ready = new Promise<void>((resolve, reject) => {
+      this.worker.onmessage = (event: MessageEvent<WorkerResponse>) => {
+        const message = event.data;
+        switch (message.type) {
+          case "ready":
+            this.isReady = true;
+            onBoot(message.bootTime, message.fromSnapshot);
+            resolve();
+            break;
+          case "boot-error":
+            reject(new Error(`Failed to load Pyodide: ${message.error}`));
+            break;
+          case "output":
+            this.outputListeners.get(message.id)?.({ stream: message.stream, text: message.text });
+            break;
+          case "case-start":
+            this.caseListeners.get(message.id)?.(message.index);
+            break;
+          case "result":
+            this.pending.get(message.id)?.(message);
+            break;
+        }
+      };
+      this.worker.onerror = (event) => {
+        reject(new Error(`Failed to load Pyodide: ${event.message}`));
+      };
+    });
+    // Ошибку загрузки получит тот, кто ждет ready()
+    this.ready.catch(() => undefined);
+
+    const init: WorkerRequest = { type: "init", indexURL, interruptBuffer };
+    this.worker.postMessage(init);
+  }
+
+  terminate(): void {
+    this.worker.terminate();
+    for (const settle of this.pending.values()) {
+      settle(null);
+    }
+    this.pending.clear();
+    this.caseListeners.clear();
+    this.outputListeners.clear();
+  }
+}
+
+/**
+ * Число запасных воркеров по классу устройства: каждый интерпретатор
+ * занимает десятки мегабайт, поэтому на слабых устройствах запас не держим
+ */
+function defaultSpareWorkers(): number {
+  const fromEnv = process.env.NEXT_PUBLIC_PYODIDE_SPARE_WORKERS;
+  if (fromEnv !== undefined && fromEnv !== "") {
+    const parsed = Number.parseInt(fromEnv, 10);
+    if (Number.isFinite(parsed) && parsed >= 0) {
+      return parsed;
+    }
+  }
+
+  if (typeof navigator === "undefined") {
+    return 0;
+  }
+  const deviceMemory = (navigator as Navigator & { deviceMemory?: number }).deviceMemory;
+  if (deviceMemory !== undefined && deviceMemory <= 2) {
+    return 0;
+  }
+  if (navigator.hardwareConcurrency !== undefined && navigator.hardwareConcurrency <= 2) {
+    return 0;
+  }
+  return 1;
+}
+
+/**
+ * Движок выполнения Python-кода: держит Pyodide в отдельном Web Worker,
+ * останавливает зависший код через буфер прерывания (SharedArrayBuffer),
+ * а если интерпретатор не реагирует — заменяет воркер заранее загруженным запасным.
+ */
+export class PyodideEngine {
+  private active: WorkerHandle | null = null;
+  private spares: WorkerHandle[] = [];
+  private queue: Promise<unknown> = Promise.resolve();
+  private nextId = 1;
+
+  private readonly indexURL: string;
+  private readonly spareWorkers: number;
+  private bootTimes: number[] = [];
+  private restarts = 0;
+  private lastSwapTime: number | null = null;
+  private snapshotBoots = 0;
+  private snapshotSavedTime: number | null = null;
+  private heapBytes: number | null = null;
+  private readonly syntaxCache = new LruCache<string, string | null>(SYNTAX_CACHE_SIZE);
+
+  constructor(options: PyodideEngineOptions = {}) {
+    this.indexURL = options.indexURL ?? PYODIDE_INDEX_URL;
+    this.spareWorkers = options.spareWorkers ?? defaultSpareWorkers();
+  }
+
+  /**
+   * Ожидает готовности интерпретатора (запускает воркер при первом вызове)
+   */
+  ready(): Promise<void> {
+    if (!this.active) {
+      if (typeof window === "undefined") {
+        return Promise.reject(new Error("Pyodide может быть загружен только на клиенте"));
+      }
+      this.active = this.spawn();
+      // Запасные воркеры грузим после основного, чтобы не конкурировать с ним за сеть и CPU
+      this.active.ready.then(() => this.fillSpares(), () => undefined);
+    }
+    return this.active.ready;
+  }
+
+  /**
+   * Доступна ли настоящая (вытесняющая) остановка кода через буфер прерывания
+   */
+  get supportsInterrupt(): boolean {
+    return this.active?.interruptFlag != null;
+  }
+
+  /**
+   * Метрики пула для подбора числа запасных воркеров под класс устройства
+   */
+  getMetrics(): PyodideEngineMetrics {
+    const averageBootTime =
+      this.bootTimes.length > 0
+        ? Math.round(this.bootTimes.reduce((sum, time) => sum + time, 0) / this.bootTimes.length)
+        : null;
+
+    return {
+      poolSize: (this.active ? 1 : 0) + this.spares.length,
+      spareWorkers: this.spareWorkers,
+      readySpares: this.spares.filter((spare) => spare.isReady).length,
+      bootTimes: [...this.bootTimes],
+      averageBootTime,
+      restarts: this.restarts,
+      lastSwapTime: this.lastSwapTime,
+      snapshotBoots: this.snapshotBoots,
+      snapshotSavedTime: this.snapshotSavedTime,
+      heapBytes: this.heapBytes,
+    };
+  }
+
+  /**
+   * Выполняет код в воркере. Запуски выстраиваются в очередь, таймаут отсчитывается
+   * с момента фактического начала выполнения. onOutput получает вывод пачками
+   * (stdout и stderr) по ходу выполнения.
+   */
+  run(code: string, timeout = 10000, onOutput?: (chunk: OutputChunk) => void): Promise<ExecResult> {
+    return this.enqueue({ type: "exec", code, stream: onOutput !== undefined }, timeout, onOutput);
+  }
+
+  /**
+   * Компилирует код без выполнения. Возвращает описание синтаксической ошибки
+   * («SyntaxError: ... (строка N)») или null. Результат запоминается по хешу кода.
+   */
+  async check(code: string): Promise<string | null> {
+    const key = await sha256Hex(code);
+    const cached = key ? this.syntaxCache.get(key) : undefined;
+    if (cached !== undefined) {
+      return cached;
+    }
+
+    const result = await this.enqueue({ type: "check", code }, CHECK_TIMEOUT_MS);
+    if (result.error !== null) {
+      // Проверка не удалась — ошибку покажет сам запуск
+      return null;
+    }
+    const syntaxError = typeof result.value === "string" ? result.value : null;
+    if (key) {
+      this.syntaxCache.set(key, syntaxError);
+    }
+    return syntaxError;
+  }
+
+  /**
+   * Прогоняет все тестовые случаи за один вызов резидентного тестового модуля
+   * (_run_test_suite из PYTHON_BOOTSTRAP). В value — HarnessSuiteResult.
+   * Случай, превысивший caseTimeLimit, прерывается и получает статус timeout,
+   * остальные продолжают выполняться в пределах suiteTimeLimit.
+   */
+  runTests(
+    code: string,
+    functionName: string,
+    cases: unknown[],
+    limits: TestTimeLimits
+  ): Promise<ExecResult> {
+    return this.enqueue(
+      { type: "test", code, functionName, cases, ...limits },
+      limits.suiteTimeLimit
+    );
+  }
+
+  /**
+   * Заменяет текущий интерпретатор «чистым»: берет готовый запасной воркер
+   * (если есть) и в фоне загружает новый запасной. Перезагрузка страницы не нужна.
+   */
+  restart(): void {
+    const swapStart = performance.now();
+    this.restarts++;
+    this.active?.terminate();
+
+    // Предпочитаем уже загруженный запасной воркер, затем загружающийся
+    const readyIndex = this.spares.findIndex((spare) => spare.isReady);
+    const index = readyIndex >= 0 ? readyIndex : this.spares.length > 0 ? 0 : -1;
+
+    if (index >= 0) {
+      this.active = this.spares.splice(index, 1)[0];
+    } else {
+      this.active = this.spawn();
+    }
+
+    this.active.ready.then(
+      () => {
+        this.lastSwapTime = Math.round(performance.now() - swapStart);
+      },
+      () => undefined
+    );
+    this.fillSpares();
+  }
+
+  private spawn(): WorkerHandle {
+    return new WorkerHandle(this.indexURL, (bootTime, fromSnapshot) => this.recordBoot(bootTime, fromSnapshot));
+  }
+
+  private recordBoot(bootTime: number, fromSnapshot: boolean): void {
+    this.bootTimes.push(bootTime);
+    if (this.bootTimes.length > BOOT_SAMPLES_LIMIT) {
+      this.bootTimes.shift();
+    }
+
+    try {
+      if (!fromSnapshot) {
+        localStorage.setItem(COLD_BOOT_STORAGE_KEY, String(bootTime));
+        return;
+      }
+
+      this.snapshotBoots++;
+      const coldBootTime = Number.parseInt(localStorage.getItem(COLD_BOOT_STORAGE_KEY) ?? "", 10);
+      if (Number.isFinite(coldBootTime)) {
+        this.snapshotSavedTime = Math.max(0, coldBootTime - bootTime);
+        console.info(
+          `Pyodide restored from snapshot in ${bootTime} ms (saved ~${this.snapshotSavedTime} ms)`
+        );
+      } else {
+        console.info(`Pyodide restored from snapshot in ${bootTime} ms`);
+      }
+    } catch {
+      // localStorage может быть недоступен (приватный режим) — метрики не критичны
+    }
+  }
+
+  private fillSpares(): void {
+    while (this.spares.length < this.spareWorkers) {
+      const spare = this.spawn();
+      this.spares.push(spare);
+      // Сломанный запасной воркер убираем из пула, чтобы не подставить его при замене
+      spare.ready.catch(() => {
+        spare.terminate();
+        this.spares = this.spares.filter((item) => item !== spare);
+      });
+    }
+  }
+
+  private enqueue(
+    job: DistributiveOmit<JobRequest, "id">,
+    timeout: number,
+    onOutput?: (chunk: OutputChunk) => void
+  ): Promise<ExecResult> {
+    const result = this.queue.then(() => this.execute(job, timeout, onOutput));
+    this.queue = result.catch(() => undefined);
+    return result;
+  }
+
+  private async execute(
+    job: DistributiveOmit<JobRequest, "id">,
+    timeout: number,
+    onOutput?: (chunk: OutputChunk) => void
+  ): Promise<ExecResult> {
+    await this.ready();
+
+    const handle = this.active as WorkerHandle;
+    const id = this.nextId++;
+    const startTime = Date.now();
+
+    return new Promise<ExecResult>((resolve) => {
+      let timedOut = false;
+      let killTimer: ReturnType<typeof setTimeout> | undefined;
+      let caseTimer: ReturnType<typeof setTimeout> | undefined;
+
+      if (onOutput) {
+        handle.outputListeners.set(id, onOutput);
+      }
+
+      // Бюджет отдельного тестового случая: прерываем только тот случай, для которого
+      // взведен таймер. Без буфера прерывания бюджет соблюдает трассировка в воркере.
+      const { interruptFlag, caseIndex } = handle;
+      if (job.type === "test" && interruptFlag && caseIndex) {
+        const suiteDeadline = startTime + timeout;
+        handle.caseListeners.set(id, (index) => {
+          clearTimeout(caseTimer);
+          const budget = Math.min(job.caseTimeLimit, suiteDeadline - Date.now());
+          caseTimer = setTimeout(() => {
+            if (Atomics.load(caseIndex, 0) === index) {
+              Atomics.store(interruptFlag, 0, INTERRUPT_SIGINT);
+            }
+          }, Math.max(0, budget));
+        });
+      }
+
+      const interruptTimer = setTimeout(() => {
+        timedOut = true;
+        if (handle.interruptFlag) {
+          Atomics.store(handle.interruptFlag, 0, INTERRUPT_SIGINT);
+          killTimer = setTimeout(() => this.restart(), INTERRUPT_GRACE_MS);
+        } else if (job.type === "test") {
+          // Трассировка в воркере сама остановит тесты по бюджету; перезапускаем, только если не сработала
+          killTimer = setTimeout(() => this.restart(), INTERRUPT_GRACE_MS);
+        } else {
+          this.restart();
+        }
+      }, timeout);
+
+      handle.pending.set(id, (message) => {
+        clearTimeout(interruptTimer);
+        clearTimeout(killTimer);
+        clearTimeout(caseTimer);
+        handle.pending.delete(id);
+        handle.caseListeners.delete(id);
+        handle.outputListeners.delete(id);
+
+        const executionTime = Date.now() - startTime;
+        this.heapBytes = message?.heapBytes ?? this.heapBytes;
+        if (!message) {
+          // Воркер был перезапущен, пока код выполнялся
+          resolve({ output: "", value: undefined, error: "Интерпретатор был перезапущен", timedOut, executionTime });
+        } else if (message.ok) {
+          resolve({ output: message.output, value: message.value, error: null, timedOut: false, executionTime });
+        } else {
+          resolve({
+            output: message.output,
+            value: undefined,
+            error: message.error,
+            timedOut: timedOut || message.interrupted,
+            executionTime,
+          });
+        }
+      });
+
+      const request = { ...job, id } as JobRequest;
+      handle.worker.postMessage(request);
+    });
+  }
+}
+
+let engine: PyodideEngine | null = null;
+
+/**
+ * Общий для всей вкладки экземпляр движка
+ */
+export function getPyodideEngine(): PyodideEngine {
+  if (!engine) {
+    engine = new PyodideEngine();
+  }
+  return engine;
+}
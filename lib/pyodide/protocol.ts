@@ -0,0 +1,146 @@
+/**
+ * Протокол обмена сообщениями между основным потоком и Pyodide-воркером
+ */
+
+/**
+ * Значение в буфере прерывания, которое Pyodide превращает в KeyboardInterrupt (SIGINT)
+ */
+export const INTERRUPT_SIGINT = 2;
+
+/**
+ * Разметка общего буфера, который основной поток передает воркеру:
+ * байт 0 — флаг прерывания Pyodide, Int32 по смещению 4 — индекс выполняемого тестового случая
+ */
+export const INTERRUPT_BUFFER_BYTES = 8;
+export const CASE_INDEX_OFFSET = 4;
+
+export type OutputStream = "stdout" | "stderr";
+
+/**
+ * Пачка вывода, отправленная воркером, пока программа еще выполняется
+ */
+export interface OutputChunk {
+  stream: OutputStream;
+  text: string;
+}
+
+export type WorkerRequest =
+  | {
+      type: "init";
+      indexURL: string;
+      interruptBuffer: SharedArrayBuffer | null;
+    }
+  | {
+      type: "exec";
+      id: number;
+      code: string;
+      /**
+       * Присылать вывод пачками по ходу выполнения (сообщения output)
+       */
+      stream: boolean;
+    }
+  | {
+      /**
+       * Только компиляция кода: синтаксические ошибки без выполнения программы
+       */
+      type: "check";
+      id: number;
+      code: string;
+    }
+  | {
+      type: "test";
+      id: number;
+      code: string;
+      functionName: string;
+      /**
+       * Тестовые случаи передаются структурным клонированием и превращаются
+       * в объекты Python через pyodide.toPy, без генерации исходного кода и JSON
+       */
+      cases: unknown[];
+      /**
+       * Бюджет времени на один тестовый случай и на весь набор, мс
+       */
+      caseTimeLimit: number;
+      suiteTimeLimit: number;
+    };
+
+export type WorkerResponse =
+  | {
+      type: "ready";
+      bootTime: number;
+      /**
+       * Интерпретатор восстановлен из снимка памяти, созданного при сборке
+       */
+      fromSnapshot: boolean;
+    }
+  | {
+      type: "boot-error";
+      error: string;
+    }
+  | ({
+      type: "output";
+      id: number;
+    } & OutputChunk)
+  | {
+      /**
+       * Начат тестовый случай: основной поток взводит для него таймер прерывания
+       */
+      type: "case-start";
+      id: number;
+      index: number;
+    }
+  | {
+      type: "result";
+      id: number;
+      ok: true;
+      output: string;
+      value: unknown;
+      heapBytes: number;
+    }
+  | {
+      type: "result";
+      id: number;
+      ok: false;
+      output: string;
+      error: string;
+      interrupted: boolean;
+      heapBytes: number;
+    };
+
+export interface ExecResult {
+  output: string;
+  value: unknown;
+  error: string | null;
+  /**
+   * Выполнение было остановлено по таймауту (прерыванием или перезапуском воркера)
+   */
+  timedOut: boolean;
+  executionTime: number;
+}
+
+/**
+ * Результат одного тестового случая, как его возвращает _run_test_suite
+ */
+export interface HarnessCaseResult {
+  id: string;
+  /**
+   * timeout — случай прерван по бюджету времени (или не запускался, если исчерпан бюджет набора)
+   */
+  status: "passed" | "failed" | "error" | "timeout";
+  passed: boolean;
+  actual: unknown;
+  error: string | null;
+  time_ms: number;
+}
+
+export interface HarnessSuiteResult {
+  /**
+   * Ошибка при выполнении кода ученика до запуска тестов (синтаксис, исключение на уровне модуля)
+   */
+  setup_error: string | null;
+  /**
+   * Код ученика не успел выполниться до запуска тестов
+   */
+  setup_timeout: boolean;
+  results: HarnessCaseResult[];
+}
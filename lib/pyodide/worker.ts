@@ -0,0 +1,276 @@
+/**
+ * Web Worker, в котором живет интерпретатор Pyodide.
+ * Код ученика выполняется здесь, поэтому бесконечный цикл не блокирует вкладку и редактор.
+ */
+
+import {
+  PYODIDE_VERSION,
+  PYTHON_AFTER_RESTORE,
+  PYTHON_BOOTSTRAP,
+  SNAPSHOT_MANIFEST_URL,
+} from "./bootstrap.mjs";
+import {
+  CASE_INDEX_OFFSET,
+  type OutputStream,
+  type WorkerRequest,
+  type WorkerResponse,
+} from "./protocol";
+
+interface WorkerScope {
+  onmessage: ((event: MessageEvent<WorkerRequest>) => void) | null;
+  postMessage: (message: WorkerResponse) => void;
+  importScripts: (...urls: string[]) => void;
+  loadPyodide: (options: { indexURL: string; _loadSnapshot?: Uint8Array }) => Promise<any>;
+}
+
+interface SnapshotManifest {
+  version: string;
+  bootstrapHash: string;
+  file: string;
+}
+
+const ctx = self as unknown as WorkerScope;
+
+let pyodide: any = null;
+let interruptFlag: Uint8Array | null = null;
+let caseIndex: Int32Array | null = null;
+// Идентификатор выполняемого запроса: к нему привязываются уведомления case-start
+let currentJobId = 0;
+// Нужно ли отправлять вывод текущего запроса пачками по ходу выполнения
+let streamOutput = false;
+// Резидентные функции из PYTHON_BOOTSTRAP (PyProxy живут все время работы воркера)
+let runTestSuite: any = null;
+let freshNamespace: any = null;
+let checkSyntax: any = null;
+
+/**
+ * Переводит результат Python в структурно-клонируемое значение и освобождает PyProxy.
+ * create_pyproxies: false — вложенные объекты копируются, а не оборачиваются в прокси,
+ * поэтому после destroy() в куче не остается ссылок на результат.
+ */
+function toClonable(value: any): unknown {
+  if (value === null || value === undefined) {
+    return undefined;
+  }
+  // Вызываемый PyProxy (функция, класс, метод) имеет typeof "function", поэтому
+  // прокси узнаем по toJs, а не по typeof
+  if (typeof value?.toJs !== "function") {
+    return typeof value === "function" ? String(value) : value;
+  }
+  try {
+    const converted = value.toJs({ dict_converter: Object.fromEntries, create_pyproxies: false });
+    // Для объектов без JS-аналога toJs может вернуть сам прокси
+    return typeof converted === "function" || converted === value ? String(value) : converted;
+  } catch {
+    // Объект не конвертируется в JS (например, экземпляр пользовательского класса)
+    return String(value);
+  } finally {
+    value.destroy();
+  }
+}
+
+async function sha256(text: string): Promise<string> {
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, "0")).join("");
+}
+
+/**
+ * Загружает снимок памяти интерпретатора, если он собран для этой версии Pyodide
+ * и этого кода инициализации. Иначе возвращает null — будет обычная загрузка.
+ */
+async function fetchSnapshot(): Promise<Uint8Array | null> {
+  try {
+    const manifestResponse = await fetch(SNAPSHOT_MANIFEST_URL);
+    if (!manifestResponse.ok) {
+      return null;
+    }
+    const manifest = (await manifestResponse.json()) as SnapshotManifest;
+    if (
+      manifest.version !== PYODIDE_VERSION ||
+      manifest.bootstrapHash !== (await sha256(PYTHON_BOOTSTRAP))
+    ) {
+      return null;
+    }
+
+    const snapshotResponse = await fetch(manifest.file);
+    if (!snapshotResponse.ok) {
+      return null;
+    }
+    return new Uint8Array(await snapshotResponse.arrayBuffer());
+  } catch {
+    return null;
+  }
+}
+
+async function boot(baseURL: string, interruptBuffer: SharedArrayBuffer | null) {
+  const startTime = performance.now();
+  try {
+    // Собственная копия Pyodide задается путем от корня сайта — делаем адрес абсолютным
+    const indexURL = new URL(baseURL, self.location.href).href;
+
+    // Снимок скачивается параллельно с загрузкой pyodide.js
+    const snapshotPromise = fetchSnapshot();
+    ctx.importScripts(`${indexURL}pyodide.js`);
+    const snapshot = await snapshotPromise;
+
+    let fromSnapshot = false;
+    if (snapshot) {
+      try {
+        pyodide = await ctx.loadPyodide({ indexURL, _loadSnapshot: snapshot });
+        pyodide.runPython(PYTHON_AFTER_RESTORE);
+        fromSnapshot = true;
+      } catch (error) {
+        console.warn("Pyodide snapshot restore failed, falling back to a cold start:", error);
+        pyodide = null;
+      }
+    }
+
+    if (!pyodide) {
+      pyodide = await ctx.loadPyodide({ indexURL });
+      pyodide.runPython(PYTHON_BOOTSTRAP);
+    }
+
+    runTestSuite = pyodide.globals.get("_run_test_suite");
+    freshNamespace = pyodide.globals.get("_fresh_namespace");
+    checkSyntax = pyodide.globals.get("_check_syntax");
+
+    if (interruptBuffer) {
+      interruptFlag = new Uint8Array(interruptBuffer, 0, 1);
+      caseIndex = new Int32Array(interruptBuffer, CASE_INDEX_OFFSET, 1);
+      pyodide.setInterruptBuffer(interruptFlag);
+    }
+
+    // JS-функции не попадают в снимок памяти, поэтому регистрируем после загрузки
+    pyodide.globals.set("_case_started", (index: number) => {
+      if (caseIndex && interruptFlag) {
+        Atomics.store(caseIndex, 0, index);
+        // Прерывание, опоздавшее к предыдущему случаю, не должно задеть следующий
+        Atomics.store(interruptFlag, 0, 0);
+      }
+      ctx.postMessage({ type: "case-start", id: currentJobId, index });
+    });
+    pyodide.globals.set("_emit_output", (stream: OutputStream, text: string) => {
+      if (streamOutput) {
+        ctx.postMessage({ type: "output", id: currentJobId, stream, text });
+      }
+    });
+
+    ctx.postMessage({
+      type: "ready",
+      bootTime: Math.round(performance.now() - startTime),
+      fromSnapshot,
+    });
+  } catch (error) {
+    ctx.postMessage({
+      type: "boot-error",
+      error: error instanceof Error ? error.message : String(error),
+    });
+  }
+}
+
+/**
+ * Выполняет запрос в интерпретаторе и отправляет результат вместе с перехваченным выводом
+ */
+async function respond(id: number, run: () => Promise<unknown> | unknown, stream = false) {
+  currentJobId = id;
+  streamOutput = stream;
+  // Сбрасываем флаг прерывания, оставшийся от предыдущего запуска
+  if (interruptFlag && caseIndex) {
+    interruptFlag[0] = 0;
+    Atomics.store(caseIndex, 0, -1);
+  }
+
+  try {
+    pyodide.runPython("_stdout_capture.reset(); _stderr_capture.reset()");
+  } catch {
+    // Игнорируем ошибки при сбросе буфера
+  }
+
+  // Последняя пачка вывода уходит до сообщения с результатом
+  const flushOutput = () => {
+    try {
+      pyodide.runPython("_stdout_capture.flush_chunks(); _stderr_capture.flush_chunks()");
+    } catch {
+      // Вывод не критичен для результата
+    }
+  };
+
+  const readOutput = (): string => {
+    try {
+      return String(pyodide.runPython("_stdout_capture.getvalue()") ?? "");
+    } catch {
+      return "";
+    }
+  };
+
+  // Размер памяти WebAssembly: по нему видно, что повторные запуски не копят PyProxy
+  const heapBytes = (): number => pyodide._module?.HEAP8?.byteLength ?? 0;
+
+  try {
+    const value = await run();
+    flushOutput();
+    ctx.postMessage({
+      type: "result",
+      id,
+      ok: true,
+      output: readOutput(),
+      value: toClonable(value),
+      heapBytes: heapBytes(),
+    });
+  } catch (error) {
+    const message = error instanceof Error ? error.message : String(error);
+    flushOutput();
+    ctx.postMessage({
+      type: "result",
+      id,
+      ok: false,
+      output: readOutput(),
+      error: message,
+      interrupted: message.includes("KeyboardInterrupt"),
+      heapBytes: heapBytes(),
+    });
+  }
+}
+
+ctx.onmessage = (event) => {
+  const request = event.data;
+  switch (request.type) {
+    case "init":
+      void boot(request.indexURL, request.interruptBuffer);
+      break;
+    case "exec":
+      void respond(request.id, async () => {
+        // Код выполняется не в globals интерпретатора, а в отдельном словаре
+        const namespace = freshNamespace();
+        try {
+          return await pyodide.runPythonAsync(request.code, { globals: namespace });
+        } finally {
+          // Разрываем циклы функция -> globals, чтобы память освобождалась сразу
+          namespace.clear();
+          namespace.destroy();
+        }
+      }, request.stream);
+      break;
+    case "check":
+      void respond(request.id, () => checkSyntax(request.code));
+      break;
+    case "test":
+      void respond(request.id, () => {
+        const cases = pyodide.toPy(request.cases);
+        try {
+          // Без буфера прерывания бюджет соблюдается трассировкой внутри интерпретатора
+          return runTestSuite(
+            request.code,
+            request.functionName,
+            cases,
+            request.caseTimeLimit,
+            request.suiteTimeLimit,
+            interruptFlag === null
+          );
+        } finally {
+          cases.destroy();
+        }
+      });
+      break;
+  }
+};
@@ -18,13 +18,43 @@ type UserAchievement = {
   earned_at: string;
 };
 
-interface AchievementCheckResult {
-  achievement: Achievement;
-  unlocked: boolean;
+/**
+ * Счетчики пользователя из таблицы user_stats (обновляются триггерами БД)
+ */
+export type UserStats = Database["public"]["Tables"]["user_stats"]["Row"];
+
+/**
+ * Текущая и лучшая серия одного вида
+ */
+export interface Streak {
+  current: number;
+  longest: number;
 }
 
 /**
- * Проверяет все достижения для пользователя и начисляет новые
+ * Серии пользователя в форме, которую возвращают get_user_streaks и calculate_user_streaks
+ * (на дашборд приходят в составе get_dashboard_stats)
+ */
+export interface UserStreaks {
+  days: Streak;
+  tasks: Streak;
+  first_try: Streak;
+}
+
+/**
+ * Результат функции grant_achievements
+ */
+type GrantAchievementsResult = {
+  granted: string[];
+  xp_awarded: number;
+  new_total_xp: number | null;
+  new_level: number | null;
+};
+
+/**
+ * Проверяет все достижения для пользователя и начисляет новые.
+ * Условия проверяются в памяти по одной строке user_stats, а найденные
+ * достижения выдаются вместе с XP за них одним вызовом grant_achievements.
  */
 export async function checkAndAwardAchievements(
   supabase: SupabaseClient<Database>,
@@ -35,327 +65,135 @@ export async function checkAndAwardAchievements(
     completedAt?: Date;
   }
 ): Promise<Achievement[]> {
-  const newlyUnlocked: Achievement[] = [];
-
-  // Получаем все активные достижения
-  const { data: achievements, error: achievementsError } = await supabase
-    .from("achievements")
-    .select("*")
-    .eq("is_active", true);
-
-  if (achievementsError || !achievements) {
-    console.error("Error fetching achievements:", achievementsError);
-    return newlyUnlocked;
+  const [achievementsResponse, userAchievementsResponse, statsResponse] = await Promise.all([
+    supabase.from("achievements").select("*").eq("is_active", true),
+    supabase.from("user_achievements").select("achievement_id").eq("user_id", userId),
+    supabase.from("user_stats").select("*").eq("user_id", userId).maybeSingle(),
+  ]);
+
+  if (achievementsResponse.error || !achievementsResponse.data) {
+    console.error("Error fetching achievements:", achievementsResponse.error);
+    return [];
   }
 
-  const typedAchievements = (achievements || []) as Achievement[];
-
-  // Получаем уже полученные достижения пользователя
-  const { data: userAchievements, error: userAchievementsError } = await supabase
-    .from("user_achievements")
-    .select("achievement_id")
-    .eq("user_id", userId);
-
-  if (userAchievementsError) {
-    console.error("Error fetching user achievements:", userAchievementsError);
-    return newlyUnlocked;
+  if (userAchievementsResponse.error) {
+    console.error("Error fetching user achievements:", userAchievementsResponse.error);
+    return [];
   }
 
-  const typedUserAchievements = (userAchievements || []) as UserAchievement[];
-  const earnedAchievementIds = new Set(
-    typedUserAchievements.map((ua) => ua.achievement_id)
-  );
-
-  // Проверяем каждое достижение
-  for (const achievement of typedAchievements) {
-    // Пропускаем уже полученные
-    if (earnedAchievementIds.has(achievement.id)) {
-      continue;
-    }
-
-    // Проверяем условие достижения
-    const isUnlocked = await checkAchievementCondition(
-      supabase,
-      userId,
-      achievement,
-      context
-    );
+  if (statsResponse.error) {
+    console.error("Error fetching user stats:", statsResponse.error);
+    return [];
+  }
 
-    if (isUnlocked) {
-      // Начисляем достижение
-      const { error: insertError } = await (supabase
-        .from("user_achievements") as any)
-        .insert({
-          user_id: userId,
-          achievement_id: achievement.id,
-          earned_at: new Date().toISOString(),
-        });
+  // Строки еще нет — у пользователя нет ни одной попытки
+  const stats = statsResponse.data as UserStats | null;
+  if (!stats) {
+    return [];
+  }
 
-      if (insertError) {
-        console.error(
-          `Error awarding achievement ${achievement.id}:`,
-          insertError
-        );
-      } else {
-        // Начисляем XP за достижение
-        if (achievement.xp_reward > 0) {
-          const { data: user } = await supabase
-            .from("users")
-            .select("total_xp, current_level")
-            .eq("id", userId)
-            .single();
+  const typedAchievements = achievementsResponse.data as Achievement[];
+  const typedUserAchievements = (userAchievementsResponse.data || []) as Pick<
+    UserAchievement,
+    "achievement_id"
+  >[];
+  const earnedAchievementIds = new Set(typedUserAchievements.map((ua) => ua.achievement_id));
 
-          if (user) {
-            const typedUser = user as { total_xp: number | null; current_level: number | null };
-            const newTotalXP = (typedUser.total_xp || 0) + achievement.xp_reward;
-            
-            // Рассчитываем новый уровень с помощью RPC функции
-            const { data: calculatedLevel } = await (supabase.rpc as any)(
-              "calculate_user_level",
-              {
-                total_xp: newTotalXP,
-              }
-            );
+  const candidates = typedAchievements.filter(
+    (achievement) =>
+      !earnedAchievementIds.has(achievement.id) && isAchievementUnlocked(achievement, stats)
+  );
 
-            const newLevelValue =
-              typeof calculatedLevel === "number" ? calculatedLevel : null;
+  if (candidates.length === 0) {
+    return [];
+  }
 
-            await (supabase
-              .from("users") as any)
-              .update({
-                total_xp: newTotalXP,
-                current_level: newLevelValue || typedUser.current_level || 1,
-              })
-              .eq("id", userId);
-          }
-        }
+  const { data: grant, error: grantError } = await (supabase.rpc as any)("grant_achievements", {
+    p_achievement_ids: candidates.map((achievement) => achievement.id),
+  });
 
-        newlyUnlocked.push(achievement);
-      }
-    }
+  if (grantError || !grant) {
+    console.error("Error awarding achievements:", grantError);
+    return [];
   }
 
-  return newlyUnlocked;
+  // Параллельный запрос мог выдать часть достижений раньше — возвращаем только выданные сейчас
+  const grantedIds = new Set((grant as GrantAchievementsResult).granted);
+  return candidates.filter((achievement) => grantedIds.has(achievement.id));
 }
 
 /**
- * Проверяет условие конкретного достижения
+ * Проверяет условие конкретного достижения по счетчикам пользователя
  */
-async function checkAchievementCondition(
-  supabase: SupabaseClient<Database>,
-  userId: string,
-  achievement: Achievement,
-  context?: {
-    taskId?: string;
-    lessonId?: string;
-    completedAt?: Date;
-  }
-): Promise<boolean> {
-  const conditionType = achievement.condition_type;
+function isAchievementUnlocked(achievement: Achievement, stats: UserStats): boolean {
   const conditionValue = achievement.condition_value as any;
+  const requiredCount = conditionValue?.count || 0;
 
-  switch (conditionType) {
-    case "task_count": {
-      // Проверяем общее количество успешно выполненных задач
-      const requiredCount = conditionValue?.count || 0;
-      const { count } = await supabase
-        .from("task_attempts")
-        .select("*", { count: "exact", head: true })
-        .eq("user_id", userId)
-        .eq("is_successful", true);
-      return (count || 0) >= requiredCount;
-    }
+  switch (achievement.condition_type) {
+    case "task_count":
+      // Общее количество успешно выполненных задач
+      return stats.successful_count >= requiredCount;
 
     case "time_based_tasks": {
-      // Проверяем задачи по времени суток
-      const requiredCount = conditionValue?.count || 0;
+      // Задачи по времени суток
       const timeRange = conditionValue?.time_range;
       if (!timeRange) return false;
-
-      const startHour = timeRange.start || 0;
-      const endHour = timeRange.end || 24;
-
-      // Получаем все успешные попытки
-      const { data: attempts } = await supabase
-        .from("task_attempts")
-        .select("created_at")
-        .eq("user_id", userId)
-        .eq("is_successful", true);
-
-      if (!attempts) return false;
-
-      const typedAttempts = attempts as Array<{ created_at: string }>;
-      let matchingCount = 0;
-      for (const attempt of typedAttempts) {
-        if (!attempt.created_at) continue;
-        const attemptDate = new Date(attempt.created_at);
-        const hour = attemptDate.getHours();
-
-        // Проверяем диапазон времени
-        if (startHour < endHour) {
-          // Обычный диапазон (например, 9-22)
-          if (hour >= startHour && hour < endHour) {
-            matchingCount++;
-          }
-        } else {
-          // Диапазон через полночь (например, 22-9, что означает 22:00-08:59)
-          if (hour >= startHour || hour < endHour) {
-            matchingCount++;
-          }
-        }
-      }
-
-      return matchingCount >= requiredCount;
-    }
-
-    case "streak_tasks": {
-      // Проверяем серию подряд выполненных задач
-      const requiredStreak = conditionValue?.count || 0;
-      const { data: attempts } = await supabase
-        .from("task_attempts")
-        .select("created_at")
-        .eq("user_id", userId)
-        .eq("is_successful", true)
-        .order("created_at", { ascending: false });
-
-      if (!attempts || attempts.length < requiredStreak) return false;
-
-      // Сортируем по дате и проверяем последовательность
-      // Упрощенная проверка: считаем последние N успешных попыток подряд
-      // (более точная проверка потребует анализа промежутков между попытками)
-      return attempts.length >= requiredStreak;
-    }
-
-    case "module_count": {
-      // Проверяем количество завершенных модулей
-      const requiredCount = conditionValue?.count || 0;
-      const { count } = await supabase
-        .from("user_progress")
-        .select("*", { count: "exact", head: true })
-        .eq("user_id", userId)
-        .eq("status", "completed");
-      return (count || 0) >= requiredCount;
-    }
-
-    case "streak_days": {
-      // Проверяем серию дней подряд
-      const requiredDays = conditionValue?.count || 0;
-      // Упрощенная проверка - считаем дни с активностью
-      const { data: attempts } = await supabase
-        .from("task_attempts")
-        .select("created_at")
-        .eq("user_id", userId)
-        .eq("is_successful", true)
-        .order("created_at", { ascending: false });
-
-      if (!attempts || attempts.length === 0) return false;
-
-      // Группируем по дням
-      const daysSet = new Set<string>();
-      const typedAttempts2 = (attempts || []) as Array<{ created_at: string }>;
-      for (const attempt of typedAttempts2) {
-        if (!attempt.created_at) continue;
-        const date = new Date(attempt.created_at);
-        const dayKey = date.toISOString().split("T")[0];
-        daysSet.add(dayKey);
-      }
-
-      // Проверяем, есть ли последовательность из N дней подряд
-      // (упрощенная версия - можно улучшить для точной проверки)
-      return daysSet.size >= requiredDays;
+      return countInHourRange(stats, timeRange.start || 0, timeRange.end || 24) >= requiredCount;
     }
 
-    case "first_day_tasks": {
-      // Проверяем задачи в первый день
-      const requiredCount = conditionValue?.count || 0;
+    case "streak_tasks":
+      // Серия успешных попыток без неудачных между ними
+      return stats.longest_task_streak >= requiredCount;
 
-      // Получаем дату регистрации пользователя
-      const { data: user } = await supabase
-        .from("users")
-        .select("created_at")
-        .eq("id", userId)
-        .single();
+    case "module_count":
+      // Количество завершенных модулей
+      return stats.completed_modules >= requiredCount;
 
-      const typedUser2 = user as { created_at: string } | null;
-      if (!typedUser2 || !typedUser2.created_at) return false;
+    case "streak_days":
+      // Серия дней подряд с решенными задачами
+      return stats.longest_day_streak >= requiredCount;
 
-      const registrationDate = new Date(typedUser2.created_at);
-      const nextDay = new Date(registrationDate);
-      nextDay.setDate(nextDay.getDate() + 1);
+    case "first_day_tasks":
+      // Задачи в первые сутки после регистрации
+      return stats.first_day_count >= requiredCount;
 
-      const { count } = await supabase
-        .from("task_attempts")
-        .select("*", { count: "exact", head: true })
-        .eq("user_id", userId)
-        .eq("is_successful", true)
-        .gte("created_at", registrationDate.toISOString())
-        .lt("created_at", nextDay.toISOString());
+    case "perfect_tasks":
+      // Задачи, решенные с первой попытки
+      return stats.perfect_count >= requiredCount;
 
-      return (count || 0) >= requiredCount;
-    }
-
-    case "perfect_tasks": {
-      // Задачи без ошибок (первая попытка успешная)
-      const requiredCount = conditionValue?.count || 0;
-
-      // Получаем все уникальные задачи пользователя
-      const { data: allTasks } = await supabase
-        .from("task_attempts")
-        .select("task_id, created_at, is_successful")
-        .eq("user_id", userId)
-        .order("created_at", { ascending: true });
-
-      if (!allTasks) return false;
-
-      // Группируем по task_id и проверяем, была ли первая попытка успешной
-      const typedAllTasks = (allTasks || []) as Array<{ task_id: string; is_successful: boolean }>;
-      const taskMap = new Map<string, boolean>();
-      for (const attempt of typedAllTasks) {
-        if (!taskMap.has(attempt.task_id)) {
-          taskMap.set(attempt.task_id, attempt.is_successful);
-        }
-      }
-
-      let perfectCount = 0;
-      for (const isPerfect of taskMap.values()) {
-        if (isPerfect) perfectCount++;
-      }
-
-      return perfectCount >= requiredCount;
-    }
-
-    case "no_hints_tasks": {
+    case "no_hints_tasks":
       // Задачи без использования подсказок
-      const requiredCount = conditionValue?.count || 0;
-      const { count } = await supabase
-        .from("task_attempts")
-        .select("*", { count: "exact", head: true })
-        .eq("user_id", userId)
-        .eq("is_successful", true)
-        .eq("used_ai_hint", false);
-      return (count || 0) >= requiredCount;
-    }
+      return stats.no_hints_count >= requiredCount;
 
     case "streak_perfect":
-    case "streak_first_try": {
-      // Упрощенная проверка серий (можно улучшить)
-      const requiredStreak = conditionValue?.count || 0;
-      const { data: attempts } = await supabase
-        .from("task_attempts")
-        .select("created_at, is_successful")
-        .eq("user_id", userId)
-        .eq("is_successful", true)
-        .order("created_at", { ascending: false });
-
-      return attempts ? attempts.length >= requiredStreak : false;
-    }
+    case "streak_first_try":
+      // Задачи подряд, решенные с первой попытки
+      return stats.longest_perfect_streak >= requiredCount;
 
     default:
-      console.warn(`Unknown achievement condition type: ${conditionType}`);
+      console.warn(`Unknown achievement condition type: ${achievement.condition_type}`);
       return false;
   }
 }
 
+/**
+ * Количество успешных попыток в диапазоне часов [startHour, endHour) по UTC.
+ * Диапазон может проходить через полночь (например, 22-9 — это 22:00-08:59).
+ */
+function countInHourRange(stats: UserStats, startHour: number, endHour: number): number {
+  let count = 0;
+  for (let hour = 0; hour < 24; hour++) {
+    const inRange =
+      startHour < endHour
+        ? hour >= startHour && hour < endHour
+        : hour >= startHour || hour < endHour;
+    if (inRange) {
+      count += stats.hourly_success_counts[hour] ?? 0;
+    }
+  }
+  return count;
+}
+
 /**
  * Получает все достижения пользователя
  */
@@ -384,4 +222,3 @@ export async function getUserAchievements(
     earned_at: ua.earned_at,
   }));
 }
-
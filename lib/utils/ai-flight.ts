@@ -0,0 +1,224 @@
+import { type ChatCompletionResult, readChatCompletionStream } from "@/lib/utils/ai-stream";
+import { LlmError } from "@/lib/utils/llm-client";
+
+/**
+ * Объединение одинаковых одновременных запросов к модели (single-flight).
+ *
+ * Когда весь класс одновременно просит подсказку к одному заданию, ключи кеша ответов
+ * совпадают, и вместо десятков запросов к модели уходит один: первый запрос («ведущий»)
+ * выполняет его, остальные подписываются на тот же поток фрагментов — уже полученные
+ * фрагменты им проигрываются сразу, следующие приходят по мере генерации.
+ *
+ * Все запросы к модели проходят через общий семафор (AI_UPSTREAM_CONCURRENCY, по умолчанию 8):
+ * при всплеске лишние ждут в очереди, а не открывают соединения без ограничения. Очередь
+ * ограничена по длине (AI_UPSTREAM_MAX_QUEUE, 32) и по времени ожидания
+ * (AI_UPSTREAM_QUEUE_TIMEOUT_MS, 10 с): сверх них запрос сразу получает LlmError 503.
+ * Ожидание в очереди входит в дедлайн вызова модели (см. requestChatCompletion).
+ */
+
+export type AiFlightRoute = "hint" | "evaluate";
+
+// Retry-After для запросов, отклоненных из-за переполненной очереди
+const QUEUE_RETRY_AFTER_MS = 5_000;
+
+class Semaphore {
+  private readonly limit: number;
+  private readonly maxQueue: number;
+  private readonly waitTimeoutMs: number;
+  private readonly waiters: (() => void)[] = [];
+  active = 0;
+  maxQueued = 0;
+  rejectedQueueFull = 0;
+  rejectedTimeout = 0;
+
+  constructor(limit: number, maxQueue: number, waitTimeoutMs: number) {
+    this.limit = limit;
+    this.maxQueue = maxQueue;
+    this.waitTimeoutMs = waitTimeoutMs;
+  }
+
+  get queued(): number {
+    return this.waiters.length;
+  }
+
+  /**
+   * @throws LlmError 503, если очередь полна или слот не освободился за время ожидания
+   */
+  async acquire(): Promise<() => void> {
+    if (this.active < this.limit) {
+      this.active++;
+    } else {
+      if (this.waiters.length >= this.maxQueue) {
+        this.rejectedQueueFull++;
+        throw new LlmError(503, "AI upstream queue is full", QUEUE_RETRY_AFTER_MS);
+      }
+      // Слот передается ожидающему напрямую в release, active не меняется
+      await new Promise<void>((resolve, reject) => {
+        const waiter = () => {
+          clearTimeout(timer);
+          resolve();
+        };
+        const timer = setTimeout(() => {
+          const index = this.waiters.indexOf(waiter);
+          if (index >= 0) this.waiters.splice(index, 1);
+          this.rejectedTimeout++;
+          reject(
+            new LlmError(503, "Timed out waiting for an AI upstream slot", QUEUE_RETRY_AFTER_MS)
+          );
+        }, this.waitTimeoutMs);
+        this.waiters.push(waiter);
+        this.maxQueued = Math.max(this.maxQueued, this.waiters.length);
+      });
+    }
+
+    let released = false;
+    return () => {
+      if (released) return;
+      released = true;
+      const next = this.waiters.shift();
+      if (next) next();
+      else this.active--;
+    };
+  }
+}
+
+const upstreamSlots = new Semaphore(
+  Number(process.env.AI_UPSTREAM_CONCURRENCY) || 8,
+  Number(process.env.AI_UPSTREAM_MAX_QUEUE) || 32,
+  Number(process.env.AI_UPSTREAM_QUEUE_TIMEOUT_MS) || 10_000
+);
+
+/**
+ * Вызов модели; startedAt — момент постановки в очередь, от него считается дедлайн
+ */
+type UpstreamRequest = (startedAt: number) => Promise<Response>;
+
+class Flight {
+  private readonly deltas: string[] = [];
+  private readonly listeners = new Set<(delta: string) => void>();
+  /**
+   * Модель приняла запрос (или ошибка до начала генерации)
+   */
+  readonly ready: Promise<void>;
+  readonly result: Promise<ChatCompletionResult>;
+
+  constructor(request: UpstreamRequest) {
+    let markReady: () => void = () => {};
+    const accepted = new Promise<void>((resolve) => {
+      markReady = resolve;
+    });
+    this.result = this.run(request, markReady);
+    // Ошибка до начала генерации отклоняет и ready
+    this.ready = Promise.race([accepted, this.result.then(() => undefined)]);
+  }
+
+  private async run(
+    request: UpstreamRequest,
+    markReady: () => void
+  ): Promise<ChatCompletionResult> {
+    const startedAt = Date.now();
+    const release = await upstreamSlots.acquire();
+    try {
+      const response = await request(startedAt);
+      markReady();
+      return await readChatCompletionStream(response, (delta) => {
+        this.deltas.push(delta);
+        for (const listener of this.listeners) {
+          try {
+            listener(delta);
+          } catch {
+            // Ошибка одного подписчика не должна обрывать поток остальным
+          }
+        }
+      });
+    } finally {
+      release();
+    }
+  }
+
+  subscribe(onDelta?: (delta: string) => void): Promise<ChatCompletionResult> {
+    if (!onDelta) return this.result;
+    for (const delta of this.deltas) onDelta(delta);
+    this.listeners.add(onDelta);
+    return this.result.finally(() => this.listeners.delete(onDelta));
+  }
+}
+
+export interface JoinedFlight {
+  /**
+   * Этот запрос выполняет вызов модели (только он сохраняет ответ в кеш)
+   */
+  leader: boolean;
+  ready: Promise<void>;
+  subscribe(onDelta?: (delta: string) => void): Promise<ChatCompletionResult>;
+}
+
+const flights = new Map<string, Flight>();
+
+const counters: Record<AiFlightRoute, { upstreamCalls: number; coalesced: number }> = {
+  hint: { upstreamCalls: 0, coalesced: 0 },
+  evaluate: { upstreamCalls: 0, coalesced: 0 },
+};
+
+/**
+ * Присоединяется к идущему запросу с тем же ключом или начинает новый
+ * @param key Ключ кеша ответа; null — запрос не объединяется
+ * @param request Вызов модели (stream: true) с дедлайном от startedAt; ошибку бросает как LlmError
+ */
+export function joinAiFlight(
+  route: AiFlightRoute,
+  key: string | null,
+  request: UpstreamRequest
+): JoinedFlight {
+  const existing = key ? flights.get(key) : undefined;
+  if (existing) {
+    counters[route].coalesced++;
+    return {
+      leader: false,
+      ready: existing.ready,
+      subscribe: (onDelta) => existing.subscribe(onDelta),
+    };
+  }
+
+  counters[route].upstreamCalls++;
+  const flight = new Flight(request);
+  if (key) {
+    flights.set(key, flight);
+    flight.result
+      .finally(() => {
+        if (flights.get(key) === flight) flights.delete(key);
+      })
+      .catch(() => {
+        // Ошибку получат подписчики
+      });
+  }
+  return { leader: true, ready: flight.ready, subscribe: (onDelta) => flight.subscribe(onDelta) };
+}
+
+export interface AiFlightStats {
+  active: number;
+  queued: number;
+  maxQueued: number;
+  rejectedQueueFull: number;
+  rejectedTimeout: number;
+  inFlight: number;
+  routes: Record<AiFlightRoute, { upstreamCalls: number; coalesced: number }>;
+}
+
+/**
+ * Загрузка семафора и число объединенных запросов (для текущего процесса)
+ */
+export function getAiFlightStats(): AiFlightStats {
+  return {
+    active: upstreamSlots.active,
+    queued: upstreamSlots.queued,
+    maxQueued: upstreamSlots.maxQueued,
+    rejectedQueueFull: upstreamSlots.rejectedQueueFull,
+    rejectedTimeout: upstreamSlots.rejectedTimeout,
+    inFlight: flights.size,
+    routes: {
+      hint: { ...counters.hint },
+      evaluate: { ...counters.evaluate },
+    },
+  };
+}
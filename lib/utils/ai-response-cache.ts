@@ -0,0 +1,224 @@
+import { createClient, type SupabaseClient } from "@supabase/supabase-js";
+import { sha256Hex } from "@/lib/utils/hash";
+import { LruCache } from "@/lib/utils/lru-cache";
+import type { Database } from "@/types/supabase";
+
+/**
+ * Кеш ответов модели для подсказок и оценки решений.
+ *
+ * Два уровня: LRU в памяти процесса (ответ за микросекунды) и таблица ai_response_cache,
+ * общая для всех экземпляров сервера. Ключ — (маршрут, задание, версия промпта, хеш кода).
+ * Код перед хешированием нормализуется: комментарии, пустые строки и хвостовые пробелы
+ * не влияют на ответ модели по существу и не должны давать промах.
+ *
+ * Таблица доступна только service role (SUPABASE_SERVICE_KEY). Без ключа работает
+ * только уровень в памяти.
+ */
+
+export type AiCacheRoute = "hint" | "evaluate";
+
+const ROUTE_TTL_MS: Record<AiCacheRoute, number> = {
+  hint: 7 * 24 * 60 * 60_000,
+  evaluate: 7 * 24 * 60 * 60_000,
+};
+
+// Уровень в памяти живет меньше записи в БД, чтобы сброс таблицы доходил до процессов
+const MEMORY_CAPACITY = 500;
+const MEMORY_TTL_MS = 60 * 60_000;
+
+export interface AiCacheKey {
+  route: AiCacheRoute;
+  taskId: string;
+  promptVersion: number;
+  codeHash: string;
+}
+
+interface CachedResponse {
+  response: unknown;
+  totalTokens: number;
+}
+
+export interface AiCacheStats {
+  memoryHits: number;
+  dbHits: number;
+  misses: number;
+  hitRate: number;
+  savedTokens: number;
+}
+
+const memory = new LruCache<string, CachedResponse>(MEMORY_CAPACITY, MEMORY_TTL_MS);
+
+const stats: Record<AiCacheRoute, Omit<AiCacheStats, "hitRate">> = {
+  hint: { memoryHits: 0, dbHits: 0, misses: 0, savedTokens: 0 },
+  evaluate: { memoryHits: 0, dbHits: 0, misses: 0, savedTokens: 0 },
+};
+
+let serviceClient: SupabaseClient<Database> | null | undefined;
+
+function getServiceClient(): SupabaseClient<Database> | null {
+  if (serviceClient === undefined) {
+    const url = process.env.NEXT_PUBLIC_SUPABASE_URL;
+    const serviceKey = process.env.SUPABASE_SERVICE_KEY;
+    serviceClient =
+      url && serviceKey
+        ? createClient<Database>(url, serviceKey, { auth: { persistSession: false } })
+        : null;
+  }
+  return serviceClient;
+}
+
+/**
+ * Строковое представление ключа (для уровня в памяти и объединения запросов)
+ */
+export function serializeAiCacheKey(key: AiCacheKey): string {
+  return `${key.route}:${key.taskId}:${key.promptVersion}:${key.codeHash}`;
+}
+
+/**
+ * Убирает из кода на Python комментарии, пустые строки и хвостовые пробелы.
+ * Строковые литералы (включая тройные кавычки) и отступы сохраняются.
+ */
+function normalizePythonSource(code: string): string {
+  const source = code.replace(/\r\n?/g, "\n");
+  const lines: string[] = [];
+  let current = "";
+  let quote: string | null = null;
+
+  const pushLine = () => {
+    const line = current.trimEnd();
+    if (line.trim()) lines.push(line);
+    current = "";
+  };
+
+  for (let i = 0; i < source.length; i++) {
+    const ch = source[i];
+    if (quote) {
+      if (ch === "\n" && quote.length === 1) {
+        // Незакрытая строка — дальше разбирать как обычный код
+        quote = null;
+        pushLine();
+      } else if (ch === "\\") {
+        current += ch + (source[i + 1] ?? "");
+        i++;
+      } else if (source.startsWith(quote, i)) {
+        current += quote;
+        i += quote.length - 1;
+        quote = null;
+      } else {
+        current += ch;
+      }
+    } else if (ch === "#") {
+      while (i + 1 < source.length && source[i + 1] !== "\n") i++;
+    } else if (ch === '"' || ch === "'") {
+      quote = source.startsWith(ch.repeat(3), i) ? ch.repeat(3) : ch;
+      current += quote;
+      i += quote.length - 1;
+    } else if (ch === "\n") {
+      pushLine();
+    } else {
+      current += ch;
+    }
+  }
+  pushLine();
+
+  return lines.join("\n");
+}
+
+/**
+ * Строит ключ кеша. Возвращает null, если SHA-256 недоступен
+ * @param context Остальное содержимое промпта, от которого зависит ответ
+ */
+export async function buildAiCacheKey(
+  route: AiCacheRoute,
+  taskId: string,
+  promptVersion: number,
+  code: string,
+  context = ""
+): Promise<AiCacheKey | null> {
+  const codeHash = await sha256Hex(`${normalizePythonSource(code)}\u0000${context}`);
+  return codeHash ? { route, taskId, promptVersion, codeHash } : null;
+}
+
+/**
+ * Ищет готовый ответ сначала в памяти, затем в БД
+ */
+export async function lookupAiResponse<T>(key: AiCacheKey): Promise<T | null> {
+  const counters = stats[key.route];
+  const mKey = serializeAiCacheKey(key);
+
+  const inMemory = memory.get(mKey);
+  if (inMemory) {
+    counters.memoryHits++;
+    counters.savedTokens += inMemory.totalTokens;
+    return inMemory.response as T;
+  }
+
+  const client = getServiceClient();
+  if (client) {
+    const { data, error } = await (client.from("ai_response_cache") as any)
+      .select("response, total_tokens")
+      .eq("route", key.route)
+      .eq("task_id", key.taskId)
+      .eq("prompt_version", key.promptVersion)
+      .eq("code_hash", key.codeHash)
+      .gt("expires_at", new Date().toISOString())
+      .maybeSingle();
+
+    if (error) {
+      console.error("Error reading AI response cache:", error);
+    } else if (data) {
+      const entry = { response: data.response, totalTokens: data.total_tokens ?? 0 };
+      memory.set(mKey, entry);
+      counters.dbHits++;
+      counters.savedTokens += entry.totalTokens;
+      return entry.response as T;
+    }
+  }
+
+  counters.misses++;
+  return null;
+}
+
+/**
+ * Сохраняет ответ модели. Ошибка записи не мешает ответить пользователю
+ * @param totalTokens usage.total_tokens ответа модели
+ */
+export async function storeAiResponse(
+  key: AiCacheKey,
+  response: unknown,
+  totalTokens: number
+): Promise<void> {
+  memory.set(serializeAiCacheKey(key), { response, totalTokens });
+
+  const client = getServiceClient();
+  if (!client) return;
+
+  const { error } = await (client.from("ai_response_cache") as any).upsert({
+    route: key.route,
+    task_id: key.taskId,
+    prompt_version: key.promptVersion,
+    code_hash: key.codeHash,
+    response,
+    total_tokens: totalTokens,
+    created_at: new Date().toISOString(),
+    expires_at: new Date(Date.now() + ROUTE_TTL_MS[key.route]).toISOString(),
+  });
+
+  if (error) {
+    console.error("Error writing AI response cache:", error);
+  }
+}
+
+/**
+ * Попадания, промахи и сэкономленные токены по маршрутам (для текущего процесса)
+ */
+export function getAiCacheStats(): Record<AiCacheRoute, AiCacheStats> {
+  const result = {} as Record<AiCacheRoute, AiCacheStats>;
+  for (const route of Object.keys(stats) as AiCacheRoute[]) {
+    const counters = stats[route];
+    const hits = counters.memoryHits + counters.dbHits;
+    const total = hits + counters.misses;
+    result[route] = { ...counters, hitRate: total > 0 ? hits / total : 0 };
+  }
+  return result;
+}
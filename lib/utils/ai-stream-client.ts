@@ -0,0 +1,164 @@
+import type { JsonFieldEvent } from "@/lib/utils/json-field-stream";
+
+/**
+ * Потоковые ответы AI-маршрутов (браузер).
+ *
+ * Запрос уходит с Accept: text/event-stream; фрагменты полей передаются в onField
+ * по мере генерации, итоговый ответ возвращается из промиса. Ответ из кеша приходит
+ * обычным JSON — он тоже считается итоговым.
+ *
+ * Главная метрика — время до первого токена (TTFT): от отправки запроса до первого
+ * фрагмента текста (или до готового ответа из кеша). Последние замеры доступны через
+ * getAiStreamMetrics и видны в DevTools (Performance, measure «ai-<route>-ttft»).
+ */
+
+export type AiStreamRoute = "hint" | "evaluate";
+
+const ROUTE_URLS: Record<AiStreamRoute, string> = {
+  hint: "/api/ai/hint",
+  evaluate: "/api/tasks/evaluate",
+};
+
+const MAX_SAMPLES = 20;
+
+export interface AiStreamMetrics {
+  /**
+   * Последние замеры TTFT, мс
+   */
+  ttftSamples: number[];
+  averageTtft: number | null;
+}
+
+const ttftSamples: Record<AiStreamRoute, number[]> = { hint: [], evaluate: [] };
+
+function recordTtft(route: AiStreamRoute, startedAt: number): void {
+  const now = performance.now();
+  const samples = ttftSamples[route];
+  samples.push(Math.round(now - startedAt));
+  if (samples.length > MAX_SAMPLES) samples.shift();
+  try {
+    performance.measure(`ai-${route}-ttft`, { start: startedAt, end: now });
+  } catch {
+    // User Timing L3 недоступен — замер остается только в getAiStreamMetrics
+  }
+}
+
+async function readError(res: Response): Promise<Error> {
+  try {
+    const data = await res.json();
+    if (typeof data?.error === "string") return new Error(data.error);
+  } catch {
+    // Тело не JSON
+  }
+  return new Error(`HTTP error! status: ${res.status}`);
+}
+
+/**
+ * Отправляет запрос к AI-маршруту и читает потоковый ответ
+ * @param onField Вызывается для каждого фрагмента строкового поля ответа
+ * @returns Итоговый ответ маршрута
+ */
+export async function requestAiStream<T>(
+  route: AiStreamRoute,
+  body: unknown,
+  onField?: (event: JsonFieldEvent) => void
+): Promise<T> {
+  const startedAt = performance.now();
+  const res = await fetch(ROUTE_URLS[route], {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok) {
+    throw await readError(res);
+  }
+
+  const contentType = res.headers.get("content-type") ?? "";
+  if (contentType.includes("application/json")) {
+    recordTtft(route, startedAt);
+    return (await res.json()) as T;
+  }
+  if (!contentType.includes("text/event-stream") || !res.body) {
+    throw new Error("Response is not an event stream");
+  }
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let firstToken = true;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary >= 0) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      let data = "";
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      const payload = JSON.parse(data);
+
+      if (event === "field") {
+        if (firstToken) {
+          firstToken = false;
+          recordTtft(route, startedAt);
+        }
+        onField?.(payload as JsonFieldEvent);
+      } else if (event === "done") {
+        if (firstToken) recordTtft(route, startedAt);
+        await reader.cancel();
+        return payload as T;
+      } else if (event === "error") {
+        await reader.cancel();
+        throw new Error(typeof payload?.error === "string" ? payload.error : "AI error");
+      }
+    }
+  }
+
+  throw new Error("AI stream ended without a result");
+}
+
+/**
+ * Время до первого токена по маршрутам (для текущей вкладки)
+ */
+export function getAiStreamMetrics(): Record<AiStreamRoute, AiStreamMetrics> {
+  const result = {} as Record<AiStreamRoute, AiStreamMetrics>;
+  for (const route of Object.keys(ttftSamples) as AiStreamRoute[]) {
+    const samples = ttftSamples[route];
+    result[route] = {
+      ttftSamples: [...samples],
+      averageTtft:
+        samples.length > 0
+          ? Math.round(samples.reduce((sum, time) => sum + time, 0) / samples.length)
+          : null,
+    };
+  }
+  return result;
+}
+
+/**
+ * Подсказка /api/ai/hint (итоговая или собранная из фрагментов)
+ */
+export type AiHint = {
+  type?: string;
+  hint?: string;
+  steps?: string[];
+};
+
+/**
+ * Markdown для окна подсказки: шаги, если они есть, иначе текст подсказки
+ */
+export function formatHintMarkdown(hint: AiHint | undefined): string {
+  if (Array.isArray(hint?.steps) && hint.steps.length) {
+    return `### Шаги к решению\n\n${hint.steps.map((step, i) => `${i + 1}. ${step}`).join("\n")}`;
+  }
+  return hint?.hint || "Попробуйте ещё раз";
+}
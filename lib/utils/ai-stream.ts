@@ -0,0 +1,125 @@
+import { JsonFieldStream } from "@/lib/utils/json-field-stream";
+
+/**
+ * Потоковые ответы AI-маршрутов (сервер).
+ *
+ * Модель вызывается с stream: true; ее SSE-поток (chat completions, OpenAI-совместимый)
+ * превращается в собственный SSE-поток маршрута:
+ *   event: field — фрагмент строкового поля ответа ({ field, index?, delta })
+ *   event: done  — итоговый ответ в том же формате, что и обычный JSON-ответ маршрута
+ *   event: error — { error }
+ * Клиент, который не запрашивает text/event-stream, получает обычный JSON.
+ */
+
+export interface ChatCompletionResult {
+  content: string;
+  totalTokens: number;
+}
+
+/**
+ * Клиент запросил потоковый ответ (Accept: text/event-stream)
+ */
+export function wantsEventStream(req: Request): boolean {
+  return req.headers.get("accept")?.includes("text/event-stream") ?? false;
+}
+
+/**
+ * Читает SSE-поток chat completions, передавая каждый фрагмент текста в onDelta.
+ * usage приходит последним фрагментом, если в запросе был stream_options.include_usage.
+ */
+export async function readChatCompletionStream(
+  response: Response,
+  onDelta: (delta: string) => void = () => {}
+): Promise<ChatCompletionResult> {
+  if (!response.body) {
+    return { content: "", totalTokens: 0 };
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let content = "";
+  let totalTokens = 0;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      newline = buffer.indexOf("\n");
+
+      if (!line.startsWith("data:")) continue;
+      const payload = line.slice(5).trim();
+      if (payload === "[DONE]") {
+        await reader.cancel();
+        return { content, totalTokens };
+      }
+
+      let chunk: any;
+      try {
+        chunk = JSON.parse(payload);
+      } catch {
+        continue;
+      }
+      const delta = chunk.choices?.[0]?.delta?.content;
+      if (typeof delta === "string" && delta) {
+        content += delta;
+        onDelta(delta);
+      }
+      if (typeof chunk.usage?.total_tokens === "number") {
+        totalTokens = chunk.usage.total_tokens;
+      }
+    }
+  }
+
+  return { content, totalTokens };
+}
+
+/**
+ * Отвечает SSE-потоком: строковые поля JSON из ответа модели пересылаются по мере генерации,
+ * в конце finish разбирает полный текст и возвращает итоговый ответ маршрута
+ * @param source Передает фрагменты текста модели в onDelta и возвращает полный ответ
+ */
+export function aiEventStreamResponse(
+  source: (onDelta: (delta: string) => void) => Promise<ChatCompletionResult>,
+  finish: (result: ChatCompletionResult) => Promise<unknown>
+): Response {
+  const encoder = new TextEncoder();
+  // Клиент отключился: дальше ничего не отправляем
+  let cancelled = false;
+
+  const stream = new ReadableStream<Uint8Array>({
+    async start(controller) {
+      const send = (event: string, data: unknown) => {
+        if (cancelled) return;
+        controller.enqueue(encoder.encode(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`));
+      };
+      const fields = new JsonFieldStream((event) => send("field", event));
+
+      try {
+        const result = await source((delta) => fields.push(delta));
+        send("done", await finish(result));
+      } catch (e) {
+        send("error", { error: e instanceof Error ? e.message : "Unknown error" });
+      } finally {
+        if (!cancelled) controller.close();
+      }
+    },
+    cancel() {
+      cancelled = true;
+    },
+  });
+
+  return new Response(stream, {
+    headers: {
+      "Content-Type": "text/event-stream; charset=utf-8",
+      "Cache-Control": "no-cache, no-transform",
+      Connection: "keep-alive",
+      // Не буферизовать поток на прокси (nginx)
+      "X-Accel-Buffering": "no",
+    },
+  });
+}
@@ -0,0 +1,11 @@
+/**
+ * SHA-256 строки в hex. Возвращает null, если Web Crypto недоступен
+ * (страница открыта не в защищенном контексте) — тогда кеширование просто не используется.
+ */
+export async function sha256Hex(text: string): Promise<string | null> {
+  if (typeof crypto === "undefined" || !crypto.subtle) {
+    return null;
+  }
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, "0")).join("");
+}
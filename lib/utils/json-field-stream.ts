@@ -0,0 +1,187 @@
+/**
+ * Потоковый разбор JSON-ответа модели: выдает содержимое строковых полей верхнего уровня
+ * (и строковых элементов массивов верхнего уровня) по мере поступления текста, не дожидаясь
+ * конца объекта. Числа, вложенные объекты и все, что до первой «{» (например ```json),
+ * пропускаются — итоговое значение все равно берется из полного JSON.parse.
+ */
+
+export interface JsonFieldEvent {
+  field: string;
+  /**
+   * Индекс элемента, если поле — массив строк
+   */
+  index?: number;
+  delta: string;
+}
+
+const ESCAPES: Record<string, string> = {
+  b: "\b",
+  f: "\f",
+  n: "\n",
+  r: "\r",
+  t: "\t",
+};
+
+export class JsonFieldStream {
+  private readonly onField: (event: JsonFieldEvent) => void;
+  private readonly stack: ("{" | "[")[] = [];
+  private started = false;
+  private finished = false;
+  private inString = false;
+  private stringIsKey = false;
+  private escape = false;
+  private unicode: string | null = null;
+  private expectKey = false;
+  private keyBuffer = "";
+  private currentKey = "";
+  private arrayIndex = 0;
+  private pending: JsonFieldEvent | null = null;
+  private readonly batch: JsonFieldEvent[] = [];
+
+  constructor(onField: (event: JsonFieldEvent) => void) {
+    this.onField = onField;
+  }
+
+  /**
+   * Добавляет очередной фрагмент текста. Соседние символы одного поля
+   * из фрагмента выдаются одним событием.
+   */
+  push(chunk: string): void {
+    for (const ch of chunk) {
+      if (this.finished) break;
+      this.consume(ch);
+    }
+    this.flushPending();
+    for (const event of this.batch.splice(0)) {
+      this.onField(event);
+    }
+  }
+
+  private consume(ch: string): void {
+    if (!this.started) {
+      if (ch === "{") {
+        this.started = true;
+        this.stack.push("{");
+        this.expectKey = true;
+      }
+      return;
+    }
+
+    if (this.inString) {
+      this.consumeStringChar(ch);
+      return;
+    }
+
+    switch (ch) {
+      case '"':
+        this.inString = true;
+        this.stringIsKey = this.top() === "{" && this.expectKey;
+        this.keyBuffer = "";
+        break;
+      case ":":
+        this.expectKey = false;
+        break;
+      case ",":
+        if (this.top() === "{") {
+          this.expectKey = true;
+        } else if (this.stack.length === 2) {
+          this.arrayIndex++;
+        }
+        break;
+      case "{":
+        this.stack.push("{");
+        this.expectKey = true;
+        break;
+      case "[":
+        this.stack.push("[");
+        if (this.stack.length === 2) this.arrayIndex = 0;
+        break;
+      case "}":
+      case "]":
+        this.stack.pop();
+        this.expectKey = false;
+        if (this.stack.length === 0) this.finished = true;
+        break;
+    }
+  }
+
+  private consumeStringChar(ch: string): void {
+    if (this.unicode !== null) {
+      this.unicode += ch;
+      if (this.unicode.length === 4) {
+        this.emit(String.fromCharCode(Number.parseInt(this.unicode, 16)));
+        this.unicode = null;
+      }
+      return;
+    }
+    if (this.escape) {
+      this.escape = false;
+      if (ch === "u") {
+        this.unicode = "";
+      } else {
+        this.emit(ESCAPES[ch] ?? ch);
+      }
+      return;
+    }
+    if (ch === "\\") {
+      this.escape = true;
+    } else if (ch === '"') {
+      this.inString = false;
+      if (this.stringIsKey && this.stack.length === 1) {
+        this.currentKey = this.keyBuffer;
+      }
+    } else {
+      this.emit(ch);
+    }
+  }
+
+  private emit(text: string): void {
+    if (this.stringIsKey) {
+      this.keyBuffer += text;
+      return;
+    }
+
+    let index: number | undefined;
+    if (this.stack.length === 2 && this.top() === "[") {
+      index = this.arrayIndex;
+    } else if (this.stack.length !== 1) {
+      return;
+    }
+
+    if (this.pending && this.pending.field === this.currentKey && this.pending.index === index) {
+      this.pending.delta += text;
+      return;
+    }
+    this.flushPending();
+    this.pending =
+      index === undefined
+        ? { field: this.currentKey, delta: text }
+        : { field: this.currentKey, index, delta: text };
+  }
+
+  private flushPending(): void {
+    if (this.pending) {
+      this.batch.push(this.pending);
+      this.pending = null;
+    }
+  }
+
+  private top(): "{" | "[" | undefined {
+    return this.stack[this.stack.length - 1];
+  }
+}
+
+/**
+ * Применяет событие к частично собранному объекту: строки дописываются,
+ * элементы массивов собираются по индексу
+ */
+export function applyJsonFieldEvent(target: Record<string, unknown>, event: JsonFieldEvent): void {
+  const current = target[event.field];
+  if (event.index === undefined) {
+    target[event.field] = (typeof current === "string" ? current : "") + event.delta;
+    return;
+  }
+  const items: string[] = Array.isArray(current) ? current : [];
+  items[event.index] = (items[event.index] ?? "") + event.delta;
+  target[event.field] = items;
+}
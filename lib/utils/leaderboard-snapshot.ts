@@ -0,0 +1,42 @@
+import { createClient, type SupabaseClient } from "@supabase/supabase-js";
+import type { Database } from "@/types/supabase";
+
+/**
+ * Обновление снимка общего рейтинга (leaderboard_snapshot) вне пути запроса.
+ *
+ * Снимок перестраивает RPC refresh_leaderboard_snapshot: не чаще раза в 60 секунд и без
+ * ожидания блокировки. Ее вызывают задание pg_cron (каждую минуту) и /api/tasks/award-xp
+ * после ответа клиенту. Страница рейтинга снимок только читает.
+ *
+ * RPC доступна только service role (SUPABASE_SERVICE_KEY). Без ключа снимок обновляет
+ * только pg_cron.
+ */
+
+let serviceClient: SupabaseClient<Database> | null | undefined;
+
+function getServiceClient(): SupabaseClient<Database> | null {
+  if (serviceClient === undefined) {
+    const url = process.env.NEXT_PUBLIC_SUPABASE_URL;
+    const serviceKey = process.env.SUPABASE_SERVICE_KEY;
+    serviceClient =
+      url && serviceKey
+        ? createClient<Database>(url, serviceKey, { auth: { persistSession: false } })
+        : null;
+  }
+  return serviceClient;
+}
+
+/**
+ * Перестраивает снимок, если он устарел. Ошибки только логируются:
+ * вызывается после ответа (after() в маршруте), и ждать его некому.
+ */
+export async function refreshLeaderboardSnapshot(): Promise<void> {
+  const client = getServiceClient();
+  if (!client) {
+    return;
+  }
+  const { error } = await (client.rpc as any)("refresh_leaderboard_snapshot");
+  if (error) {
+    console.error("Error refreshing leaderboard snapshot:", error);
+  }
+}
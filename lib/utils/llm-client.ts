@@ -0,0 +1,301 @@
+/**
+ * Общий клиент chat completions для AI-маршрутов (generate-module, generate-task, hint, evaluate).
+ *
+ * - Соединения: глобальный fetch Node.js работает на undici и держит пул keep-alive
+ *   соединений к хосту, поэтому отдельный Agent не создается.
+ * - Срок: у каждого вызова есть общий дедлайн (включая ожидание в очереди ai-flight, повторы
+ *   и чтение тела ответа), после него запрос прерывается, а не висит вместе с обработчиком.
+ * - Повторы: на 429, 5xx и сетевые ошибки — до MAX_RETRIES раз с экспоненциальной задержкой
+ *   со случайным разбросом (full jitter) с учетом Retry-After, пока хватает дедлайна.
+ * - Предохранитель (circuit breaker): после BREAKER_FAILURE_THRESHOLD подряд ошибок 5xx,
+ *   сетевых или по таймауту вызовы сразу отклоняются на BREAKER_COOLDOWN_MS, затем один
+ *   пробный запрос решает, закрыть его или открыть снова.
+ * - Гистограммы времени до заголовков ответа по маршрутам — getLlmClientStats.
+ *
+ * Адрес OpenAI-совместимого API и модель задаются LLM_BASE_URL и LLM_MODEL (по умолчанию
+ * Hugging Face router и openai/gpt-oss-20b). Для нагрузочных тестов без сети LLM_BASE_URL
+ * указывает на scripts/llm-mock-server.mjs.
+ */
+
+export type LlmRoute = "generate-module" | "generate-task" | "hint" | "evaluate";
+
+const LLM_BASE_URL = (process.env.LLM_BASE_URL || "https://router.huggingface.co/v1").replace(
+  /\/+$/,
+  ""
+);
+const LLM_CHAT_COMPLETIONS_URL = `${LLM_BASE_URL}/chat/completions`;
+const LLM_MODEL = process.env.LLM_MODEL || "openai/gpt-oss-20b";
+
+const ROUTE_DEADLINE_MS: Record<LlmRoute, number> = {
+  "generate-module": 120_000,
+  "generate-task": 90_000,
+  hint: 30_000,
+  evaluate: 45_000,
+};
+
+const MAX_RETRIES = 2;
+const RETRY_BASE_DELAY_MS = 500;
+const RETRY_MAX_DELAY_MS = 8_000;
+
+const BREAKER_FAILURE_THRESHOLD = 5;
+const BREAKER_COOLDOWN_MS = 30_000;
+
+// Верхние границы корзин гистограммы, мс; последняя корзина — все, что дольше
+const LATENCY_BUCKETS_MS = [250, 500, 1_000, 2_000, 5_000, 10_000, 30_000, 60_000];
+
+/**
+ * Вызов модели не удался: статус ответа (или 502 — сеть, 503 — предохранитель,
+ * 504 — дедлайн) и начало тела ответа
+ */
+export class LlmError extends Error {
+  readonly status: number;
+  readonly details: string;
+  readonly retryAfterMs: number | null;
+
+  constructor(status: number, details: string, retryAfterMs: number | null = null) {
+    super(`HF error ${status}`);
+    this.status = status;
+    this.details = details;
+    this.retryAfterMs = retryAfterMs;
+  }
+}
+
+/**
+ * Заголовок Retry-After для ответа с ошибкой модели (пустой, если срок неизвестен)
+ */
+export function llmErrorHeaders(error: LlmError): Record<string, string> {
+  if (error.retryAfterMs === null) return {};
+  return { "Retry-After": String(Math.max(1, Math.ceil(error.retryAfterMs / 1000))) };
+}
+
+export interface ChatCompletionBody {
+  messages: { role: "system" | "user" | "assistant"; content: string }[];
+  temperature?: number;
+  max_tokens?: number;
+  stream?: boolean;
+  stream_options?: { include_usage: boolean };
+}
+
+type BreakerState = "closed" | "open" | "half-open";
+
+const breaker = {
+  state: "closed" as BreakerState,
+  consecutiveFailures: 0,
+  openedAt: 0,
+  probeInFlight: false,
+};
+
+interface RouteStats {
+  calls: number;
+  succeeded: number;
+  failed: number;
+  retries: number;
+  timeouts: number;
+  rejectedByBreaker: number;
+  latencyBuckets: number[];
+  latencySum: number;
+}
+
+const routeStats = {} as Record<LlmRoute, RouteStats>;
+for (const route of Object.keys(ROUTE_DEADLINE_MS) as LlmRoute[]) {
+  routeStats[route] = {
+    calls: 0,
+    succeeded: 0,
+    failed: 0,
+    retries: 0,
+    timeouts: 0,
+    rejectedByBreaker: 0,
+    latencyBuckets: new Array(LATENCY_BUCKETS_MS.length + 1).fill(0),
+    latencySum: 0,
+  };
+}
+
+/**
+ * Можно ли отправить запрос. probe — единственный пробный запрос полуоткрытого
+ * состояния: только его исход закрывает или снова открывает предохранитель
+ */
+function breakerAdmit(): { allowed: boolean; probe: boolean } {
+  if (breaker.state === "closed") return { allowed: true, probe: false };
+  if (breaker.state === "open") {
+    if (Date.now() - breaker.openedAt < BREAKER_COOLDOWN_MS) {
+      return { allowed: false, probe: false };
+    }
+    breaker.state = "half-open";
+  }
+  if (breaker.probeInFlight) return { allowed: false, probe: false };
+  breaker.probeInFlight = true;
+  return { allowed: true, probe: true };
+}
+
+/**
+ * success — модель отвечает (в том числе 4xx на наш запрос), failure — 5xx/сеть/таймаут,
+ * neutral — 429: модель жива, но ограничивает нас
+ */
+function recordOutcome(outcome: "success" | "failure" | "neutral", probe: boolean): void {
+  if (probe) {
+    breaker.probeInFlight = false;
+    if (outcome === "success") {
+      breaker.state = "closed";
+      breaker.consecutiveFailures = 0;
+    } else {
+      // Пробный запрос не удался или получил 429 — ждем следующего окна
+      breaker.state = "open";
+      breaker.openedAt = Date.now();
+    }
+    return;
+  }
+  // Запросы, начатые до открытия предохранителя, завершаются позже и на его состояние
+  // не влияют: закрыть его может только пробный запрос
+  if (breaker.state !== "closed") return;
+  if (outcome === "success") {
+    breaker.consecutiveFailures = 0;
+  } else if (outcome === "failure") {
+    breaker.consecutiveFailures++;
+    if (breaker.consecutiveFailures >= BREAKER_FAILURE_THRESHOLD) {
+      breaker.state = "open";
+      breaker.openedAt = Date.now();
+    }
+  }
+}
+
+function observeLatency(stats: RouteStats, ms: number): void {
+  const bucket = LATENCY_BUCKETS_MS.findIndex((limit) => ms <= limit);
+  stats.latencyBuckets[bucket === -1 ? LATENCY_BUCKETS_MS.length : bucket]++;
+  stats.latencySum += ms;
+}
+
+function parseRetryAfter(response: Response): number | null {
+  const header = response.headers.get("retry-after");
+  if (!header) return null;
+  const seconds = Number(header);
+  if (Number.isFinite(seconds)) return Math.max(0, seconds * 1000);
+  const date = Date.parse(header);
+  return Number.isNaN(date) ? null : Math.max(0, date - Date.now());
+}
+
+function retryDelay(attempt: number, retryAfterMs: number | null): number {
+  const ceiling = Math.min(RETRY_MAX_DELAY_MS, RETRY_BASE_DELAY_MS * 2 ** (attempt - 1));
+  const jittered = Math.random() * ceiling;
+  return retryAfterMs === null ? jittered : Math.max(jittered, retryAfterMs);
+}
+
+/**
+ * Отправляет запрос chat completions с дедлайном, повторами и предохранителем
+ * @param route Маршрут (определяет дедлайн и гистограмму)
+ * @param body Тело запроса без model
+ * @param queuedAt Момент, от которого считается дедлайн (постановка в очередь ai-flight);
+ *   время ожидания в очереди расходует тот же дедлайн
+ * @returns Успешный ответ; тело читает вызывающий (дедлайн действует и на чтение)
+ * @throws LlmError, если успешного ответа получить не удалось
+ */
+export async function requestChatCompletion(
+  route: LlmRoute,
+  body: ChatCompletionBody,
+  queuedAt: number = Date.now()
+): Promise<Response> {
+  const stats = routeStats[route];
+  stats.calls++;
+  const startedAt = Date.now();
+  const deadline = queuedAt + ROUTE_DEADLINE_MS[route];
+  if (startedAt >= deadline) {
+    stats.timeouts++;
+    stats.failed++;
+    throw new LlmError(504, `Deadline of ${ROUTE_DEADLINE_MS[route]} ms exceeded in the queue`);
+  }
+  let lastError = new LlmError(504, "Deadline exceeded before the first attempt");
+
+  for (let attempt = 0; attempt <= MAX_RETRIES; attempt++) {
+    if (attempt > 0) {
+      const delay = retryDelay(attempt, lastError.retryAfterMs);
+      if (Date.now() + delay >= deadline) break;
+      stats.retries++;
+      await new Promise((resolve) => setTimeout(resolve, delay));
+    }
+
+    const admission = breakerAdmit();
+    if (!admission.allowed) {
+      stats.rejectedByBreaker++;
+      stats.failed++;
+      throw new LlmError(
+        503,
+        "Circuit breaker is open: upstream is failing",
+        Math.max(0, breaker.openedAt + BREAKER_COOLDOWN_MS - Date.now())
+      );
+    }
+
+    try {
+      const response = await fetch(LLM_CHAT_COMPLETIONS_URL, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${process.env.HUGGINGFACE_API_KEY}`,
+        },
+        body: JSON.stringify({ model: LLM_MODEL, ...body }),
+        signal: AbortSignal.timeout(Math.max(1, deadline - Date.now())),
+      });
+
+      if (response.ok) {
+        recordOutcome("success", admission.probe);
+        observeLatency(stats, Date.now() - startedAt);
+        stats.succeeded++;
+        return response;
+      }
+
+      const details = (await response.text()).slice(0, 1000);
+      lastError = new LlmError(response.status, details, parseRetryAfter(response));
+      if (response.status === 429) {
+        recordOutcome("neutral", admission.probe);
+      } else if (response.status >= 500) {
+        recordOutcome("failure", admission.probe);
+      } else {
+        // Остальные 4xx — ошибка в нашем запросе, повтор не поможет
+        recordOutcome("success", admission.probe);
+        break;
+      }
+    } catch (e) {
+      recordOutcome("failure", admission.probe);
+      if (e instanceof DOMException && e.name === "TimeoutError") {
+        stats.timeouts++;
+        lastError = new LlmError(504, `Deadline of ${ROUTE_DEADLINE_MS[route]} ms exceeded`);
+        break;
+      }
+      lastError = new LlmError(502, e instanceof Error ? e.message : String(e));
+    }
+  }
+
+  stats.failed++;
+  throw lastError;
+}
+
+export interface LlmRouteStats extends Omit<RouteStats, "latencyBuckets" | "latencySum"> {
+  averageLatencyMs: number | null;
+  /**
+   * Время до заголовков ответа: le — верхняя граница корзины, мс (null — больше последней)
+   */
+  latencyHistogram: { le: number | null; count: number }[];
+}
+
+/**
+ * Состояние предохранителя и статистика вызовов по маршрутам (для текущего процесса)
+ */
+export function getLlmClientStats(): {
+  breaker: { state: BreakerState; consecutiveFailures: number };
+  routes: Record<LlmRoute, LlmRouteStats>;
+} {
+  const routes = {} as Record<LlmRoute, LlmRouteStats>;
+  for (const route of Object.keys(routeStats) as LlmRoute[]) {
+    const { latencyBuckets, latencySum, ...counters } = routeStats[route];
+    routes[route] = {
+      ...counters,
+      averageLatencyMs: counters.succeeded > 0 ? Math.round(latencySum / counters.succeeded) : null,
+      latencyHistogram: latencyBuckets.map((count, i) => ({
+        le: LATENCY_BUCKETS_MS[i] ?? null,
+        count,
+      })),
+    };
+  }
+  return {
+    breaker: { state: breaker.state, consecutiveFailures: breaker.consecutiveFailures },
+    routes,
+  };
+}
@@ -0,0 +1,57 @@
+/**
+ * Кеш с вытеснением давно не использованных записей (LRU).
+ * Map хранит ключи в порядке вставки, поэтому при обращении запись переставляется в конец,
+ * а вытесняется первая. Если задан ttlMs, записи старше этого срока считаются отсутствующими.
+ */
+export class LruCache<K, V> {
+  private readonly entries = new Map<K, { value: V; expiresAt: number }>();
+  private readonly capacity: number;
+  private readonly ttlMs: number;
+
+  constructor(capacity: number, ttlMs = Number.POSITIVE_INFINITY) {
+    this.capacity = capacity;
+    this.ttlMs = ttlMs;
+  }
+
+  get(key: K): V | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      return undefined;
+    }
+    this.entries.delete(key);
+    if (entry.expiresAt <= Date.now()) {
+      return undefined;
+    }
+    this.entries.set(key, entry);
+    return entry.value;
+  }
+
+  has(key: K): boolean {
+    const entry = this.entries.get(key);
+    return entry !== undefined && entry.expiresAt > Date.now();
+  }
+
+  set(key: K, value: V): void {
+    this.entries.delete(key);
+    this.entries.set(key, { value, expiresAt: Date.now() + this.ttlMs });
+    if (this.entries.size > this.capacity) {
+      const oldest = this.entries.keys().next().value as K;
+      this.entries.delete(oldest);
+    }
+  }
+
+  delete(key: K): boolean {
+    return this.entries.delete(key);
+  }
+
+  clear(): void {
+    this.entries.clear();
+  }
+
+  /**
+   * Количество записей, включая устаревшие, которые еще не были вытеснены
+   */
+  get size(): number {
+    return this.entries.size;
+  }
+}
@@ -0,0 +1,101 @@
+import type { OutputStream } from "@/lib/pyodide/protocol";
+
+/**
+ * Сколько последних строк вывода хранить. Более старые строки отбрасываются,
+ * поэтому память вкладки не растет, сколько бы ни печатала программа.
+ */
+export const OUTPUT_MAX_LINES = 10000;
+
+/**
+ * Максимальная длина одной строки: print без переводов строки не должен расти бесконечно
+ */
+export const OUTPUT_MAX_LINE_LENGTH = 10000;
+
+export interface OutputLine {
+  text: string;
+  stream: OutputStream;
+}
+
+/**
+ * Кольцевой буфер строк вывода программы
+ */
+export class OutputBuffer {
+  private readonly capacity: number;
+  private readonly lines: OutputLine[] = [];
+  private start = 0;
+  private partial: OutputLine | null = null;
+  private droppedLines = 0;
+
+  constructor(capacity = OUTPUT_MAX_LINES) {
+    this.capacity = capacity;
+  }
+
+  /**
+   * Добавляет пачку вывода; незавершенная строка дописывается следующей пачкой
+   */
+  append(text: string, stream: OutputStream = "stdout"): void {
+    const parts = text.split("\n");
+    for (let i = 0; i < parts.length; i++) {
+      const part = parts[i];
+      if (this.partial) {
+        if (this.partial.text.length < OUTPUT_MAX_LINE_LENGTH) {
+          this.partial.text = (this.partial.text + part).slice(0, OUTPUT_MAX_LINE_LENGTH);
+        }
+      } else if (part || i < parts.length - 1) {
+        this.partial = { text: part.slice(0, OUTPUT_MAX_LINE_LENGTH), stream };
+      }
+
+      // Все части, кроме последней, завершены переводом строки
+      if (i < parts.length - 1) {
+        this.push(this.partial ?? { text: "", stream });
+        this.partial = null;
+      }
+    }
+  }
+
+  /**
+   * Количество строк, включая незавершенную
+   */
+  get length(): number {
+    return this.lines.length + (this.partial ? 1 : 0);
+  }
+
+  /**
+   * Сколько старых строк было отброшено из-за ограничения размера
+   */
+  get dropped(): number {
+    return this.droppedLines;
+  }
+
+  line(index: number): OutputLine {
+    if (index === this.lines.length && this.partial) {
+      return this.partial;
+    }
+    return this.lines[(this.start + index) % this.lines.length];
+  }
+
+  toString(): string {
+    const result: string[] = [];
+    for (let i = 0; i < this.length; i++) {
+      result.push(this.line(i).text);
+    }
+    return result.join("\n");
+  }
+
+  clear(): void {
+    this.lines.length = 0;
+    this.start = 0;
+    this.partial = null;
+    this.droppedLines = 0;
+  }
+
+  private push(line: OutputLine): void {
+    if (this.lines.length < this.capacity) {
+      this.lines.push(line);
+      return;
+    }
+    this.lines[this.start] = line;
+    this.start = (this.start + 1) % this.capacity;
+    this.droppedLines++;
+  }
+}
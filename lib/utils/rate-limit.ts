@@ -1,52 +1,182 @@
+import { createClient as createServiceClient, type SupabaseClient } from "@supabase/supabase-js";
 import { createClient } from "@/lib/supabase/server";
+import { LruCache } from "@/lib/utils/lru-cache";
+import type { Database } from "@/types/supabase";
 
-const MAX_GENERATIONS_PER_DAY = 50;
+/**
+ * Ограничение частоты запросов к AI-маршрутам по алгоритму token bucket.
+ *
+ * Источник истины — корзина в БД (rate_limit_buckets), которую атомарно пополняет
+ * и списывает RPC consume_rate_limit_token. Перед ней стоит копия корзины в памяти
+ * процесса: если локально токенов нет, запрос отклоняется без обращения к БД,
+ * поэтому поток повторов от одного пользователя не нагружает базу.
+ */
+
+export type RateLimitEndpoint = "generate-module" | "generate-task" | "hint" | "evaluate";
+
+interface BucketConfig {
+  capacity: number;
+  refillPerSecond: number;
+}
 
 /**
- * Проверяет, не превышен ли лимит генераций для пользователя
- * @param userId ID пользователя
- * @param generationType Тип генерации ('module' | 'task')
- * @returns {canGenerate: boolean, remaining: number, error?: string}
+ * Параметры корзин. Должны совпадать с rate_limit_rules
+ * (supabase/migrations/20261018000900_rate_limit_buckets.sql)
  */
-export async function checkRateLimit(
-  userId: string,
-  generationType: "module" | "task"
-): Promise<{ canGenerate: boolean; remaining: number; error?: string }> {
-  const supabase = await createClient();
+export const RATE_LIMITS: Record<RateLimitEndpoint, BucketConfig> = {
+  "generate-module": { capacity: 50, refillPerSecond: 50 / 86_400 },
+  "generate-task": { capacity: 50, refillPerSecond: 50 / 86_400 },
+  hint: { capacity: 10, refillPerSecond: 1 / 30 },
+  evaluate: { capacity: 10, refillPerSecond: 1 / 30 },
+};
 
-  // Подсчитываем количество генераций за сегодня
-  const today = new Date();
-  today.setHours(0, 0, 0, 0);
-  const todayStr = today.toISOString().split('T')[0]; // YYYY-MM-DD
+export interface RateLimitResult {
+  allowed: boolean;
+  remaining: number;
+  retryAfterMs: number;
+  error?: string;
+}
 
-  const { count, error } = await supabase
-    .from("ai_generation_logs")
-    .select("*", { count: "exact", head: true })
-    .eq("user_id", userId)
-    .eq("generation_type", generationType)
-    .eq("created_date", todayStr);
+interface LocalBucket {
+  tokens: number;
+  updatedAt: number;
+}
 
-  if (error) {
-    console.error("Error checking rate limit:", error);
-    return {
-      canGenerate: false,
-      remaining: 0,
-      error: "Ошибка при проверке лимита",
-    };
-  }
+// Ключ — `${userId}:${endpoint}`; вытесненная корзина просто заново синхронизируется с БД
+const localBuckets = new LruCache<string, LocalBucket>(10_000);
 
-  const used = count ?? 0;
-  const remaining = Math.max(0, MAX_GENERATIONS_PER_DAY - used);
+function refill(bucket: LocalBucket, config: BucketConfig, now: number): void {
+  const elapsedSeconds = Math.max(0, now - bucket.updatedAt) / 1000;
+  bucket.tokens = Math.min(
+    config.capacity,
+    bucket.tokens + elapsedSeconds * config.refillPerSecond
+  );
+  bucket.updatedAt = now;
+}
 
+function retryAfter(tokens: number, config: BucketConfig): number {
+  return tokens >= 1 ? 0 : Math.ceil(((1 - tokens) / config.refillPerSecond) * 1000);
+}
+
+function rejected(retryAfterMs: number): RateLimitResult {
+  const seconds = Math.max(1, Math.ceil(retryAfterMs / 1000));
   return {
-    canGenerate: remaining > 0,
-    remaining,
-    error: remaining === 0 ? `Достигнут дневной лимит генераций (${MAX_GENERATIONS_PER_DAY}/день)` : undefined,
+    allowed: false,
+    remaining: 0,
+    retryAfterMs,
+    error: `Слишком много запросов. Повторите через ${seconds} с`,
   };
 }
 
 /**
- * Записывает факт генерации в лог
+ * Списывает один токен из корзины пользователя для маршрута
+ * @param supabase Клиент с сессией пользователя (RPC берет user_id из auth.uid())
+ * @param userId ID пользователя (ключ локальной корзины)
+ * @param endpoint Маршрут, для которого действует лимит
+ * @returns {allowed, remaining, retryAfterMs, error?}
+ */
+export async function consumeRateLimit(
+  supabase: SupabaseClient<Database>,
+  userId: string,
+  endpoint: RateLimitEndpoint
+): Promise<RateLimitResult> {
+  const config = RATE_LIMITS[endpoint];
+  const key = `${userId}:${endpoint}`;
+  const now = Date.now();
+
+  const local = localBuckets.get(key);
+  if (local) {
+    refill(local, config, now);
+    if (local.tokens < 1) {
+      return rejected(retryAfter(local.tokens, config));
+    }
+  }
+
+  const { data, error } = await (supabase.rpc as any)("consume_rate_limit_token", {
+    p_endpoint: endpoint,
+  });
+
+  if (error || !data) {
+    console.error("Error consuming rate limit token:", error);
+    // БД недоступна — ограничиваем хотя бы в пределах процесса
+    const bucket = local ?? { tokens: config.capacity, updatedAt: now };
+    localBuckets.set(key, bucket);
+    if (bucket.tokens < 1) {
+      return rejected(retryAfter(bucket.tokens, config));
+    }
+    bucket.tokens -= 1;
+    return { allowed: true, remaining: Math.floor(bucket.tokens), retryAfterMs: 0 };
+  }
+
+  const result = data as { allowed: boolean; remaining: number; retry_after_ms: number };
+  // Другие экземпляры сервера тоже тратят токены, поэтому локальная копия берется из БД.
+  // При отказе остаток восстанавливается из времени до следующего токена
+  const tokens = result.allowed
+    ? result.remaining
+    : 1 - (result.retry_after_ms / 1000) * config.refillPerSecond;
+  localBuckets.set(key, { tokens, updatedAt: now });
+
+  if (!result.allowed) {
+    return rejected(result.retry_after_ms);
+  }
+  return { allowed: true, remaining: result.remaining, retryAfterMs: 0 };
+}
+
+let serviceClient: SupabaseClient<Database> | null | undefined;
+
+function getServiceClient(): SupabaseClient<Database> | null {
+  if (serviceClient === undefined) {
+    const url = process.env.NEXT_PUBLIC_SUPABASE_URL;
+    const serviceKey = process.env.SUPABASE_SERVICE_KEY;
+    serviceClient =
+      url && serviceKey
+        ? createServiceClient<Database>(url, serviceKey, { auth: { persistSession: false } })
+        : null;
+  }
+  return serviceClient;
+}
+
+/**
+ * Возвращает токен, списанный consumeRateLimit, если вызов модели не удался.
+ * RPC refund_rate_limit_token доступна только service role (SUPABASE_SERVICE_KEY);
+ * без ключа токен возвращается только в локальную корзину процесса.
+ * @param userId ID пользователя
+ * @param endpoint Маршрут, для которого был списан токен
+ */
+export async function refundRateLimit(
+  userId: string,
+  endpoint: RateLimitEndpoint
+): Promise<void> {
+  const config = RATE_LIMITS[endpoint];
+  const local = localBuckets.get(`${userId}:${endpoint}`);
+  if (local) {
+    refill(local, config, Date.now());
+    local.tokens = Math.min(config.capacity, local.tokens + 1);
+  }
+
+  const client = getServiceClient();
+  if (!client) {
+    console.warn("SUPABASE_SERVICE_KEY is not set: rate limit token refunded only locally");
+    return;
+  }
+  const { error } = await (client.rpc as any)("refund_rate_limit_token", {
+    p_user_id: userId,
+    p_endpoint: endpoint,
+  });
+  if (error) {
+    console.error("Error refunding rate limit token:", error);
+  }
+}
+
+/**
+ * Заголовок Retry-After (в секундах) для ответа 429
+ */
+export function retryAfterHeaders(result: RateLimitResult): Record<string, string> {
+  return { "Retry-After": String(Math.max(1, Math.ceil(result.retryAfterMs / 1000))) };
+}
+
+/**
+ * Записывает факт генерации в лог (история генераций, на лимит не влияет)
  * @param userId ID пользователя
  * @param generationType Тип генерации ('module' | 'task')
  */
@@ -56,43 +186,14 @@ export async function logGeneration(
 ): Promise<void> {
   const supabase = await createClient();
 
-  // Получаем текущую дату
-  const today = new Date();
-  today.setHours(0, 0, 0, 0);
-  const todayStr = today.toISOString().split('T')[0]; // YYYY-MM-DD
-
-  // Сначала проверяем, существует ли уже запись
-  const { data: existing } = await supabase
-    .from("ai_generation_logs")
-    .select("id")
-    .eq("user_id", userId)
-    .eq("generation_type", generationType)
-    .eq("created_date", todayStr)
-    .maybeSingle();
-
-  // Если запись уже существует, ничего не делаем
-  if (existing) {
-    return;
-  }
-
-  // Вставляем новую запись
-  const { error } = await (supabase
-    .from("ai_generation_logs") as any)
-    .insert({
-      user_id: userId,
-      generation_type: generationType,
-      created_date: todayStr,
-    });
+  // Каждая генерация — отдельная строка
+  const { error } = await (supabase.from("ai_generation_logs") as any).insert({
+    user_id: userId,
+    generation_type: generationType,
+  });
 
   if (error) {
-    // Игнорируем ошибку уникальности (23505) - это нормально, если запись уже существует
-    // (может произойти в случае race condition)
-    if (error.code === "23505") {
-      // Запись уже существует, это нормально - просто игнорируем
-      return;
-    }
     console.error("Error logging generation:", error);
     // Не бросаем ошибку, так как это не критично
   }
 }
-
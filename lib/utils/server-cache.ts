@@ -0,0 +1,106 @@
+import { LruCache } from "@/lib/utils/lru-cache";
+
+/**
+ * Общий кеш чтений для серверных страниц: одинаковые данные (рейтинг, каталог модулей)
+ * загружаются из БД один раз и отдаются всем ученикам, пока их не сбросит изменение.
+ *
+ * Кеш живет в памяти процесса. Сброс по тегу действует только на текущий процесс,
+ * поэтому срок жизни записей ограничивает устаревание при нескольких экземплярах сервера.
+ * В кеш можно класть только данные, которые одинаковы для всех пользователей
+ * (не зависят от RLS-политик, видящих лишь собственные строки).
+ */
+
+export type CacheTag = "leaderboard" | "modules";
+
+interface TagConfig {
+  capacity: number;
+  ttlMs: number;
+}
+
+const TAG_CONFIG: Record<CacheTag, TagConfig> = {
+  // Рейтинг меняется с каждым начислением XP, сбрасывается из /api/tasks/award-xp
+  leaderboard: { capacity: 20, ttlMs: 60_000 },
+  // Каталог (и число заданий) меняется только из админки, сбрасывается ее API-маршрутами
+  modules: { capacity: 20, ttlMs: 5 * 60_000 },
+};
+
+export interface CacheStats {
+  hits: number;
+  misses: number;
+  invalidations: number;
+  size: number;
+}
+
+interface TagState {
+  // Храним промисы: одновременные запросы при пустом кеше ждут одну загрузку
+  entries: LruCache<string, Promise<unknown>>;
+  hits: number;
+  misses: number;
+  invalidations: number;
+}
+
+const tags = new Map<CacheTag, TagState>();
+
+function getTagState(tag: CacheTag): TagState {
+  let state = tags.get(tag);
+  if (!state) {
+    const config = TAG_CONFIG[tag];
+    state = {
+      entries: new LruCache(config.capacity, config.ttlMs),
+      hits: 0,
+      misses: 0,
+      invalidations: 0,
+    };
+    tags.set(tag, state);
+  }
+  return state;
+}
+
+/**
+ * Возвращает значение из кеша или загружает его. Ошибка загрузки не кешируется.
+ */
+export function cached<T>(tag: CacheTag, key: string, load: () => Promise<T>): Promise<T> {
+  const state = getTagState(tag);
+  const existing = state.entries.get(key);
+  if (existing) {
+    state.hits++;
+    return existing as Promise<T>;
+  }
+
+  state.misses++;
+  const pending = load();
+  state.entries.set(key, pending);
+  pending.catch(() => {
+    // Сбрасываем только свою запись: ее могли уже заменить после invalidateCacheTag
+    if (state.entries.get(key) === pending) {
+      state.entries.delete(key);
+    }
+  });
+  return pending;
+}
+
+/**
+ * Сбрасывает все записи тега (после изменения данных)
+ */
+export function invalidateCacheTag(tag: CacheTag): void {
+  const state = getTagState(tag);
+  state.entries.clear();
+  state.invalidations++;
+}
+
+/**
+ * Счетчики попаданий и промахов по каждому тегу
+ */
+export function getCacheStats(): Record<CacheTag, CacheStats> {
+  const result = {} as Record<CacheTag, CacheStats>;
+  for (const tag of Object.keys(TAG_CONFIG) as CacheTag[]) {
+    const state = getTagState(tag);
+    result[tag] = {
+      hits: state.hits,
+      misses: state.misses,
+      invalidations: state.invalidations,
+      size: state.entries.size,
+    };
+  }
+  return result;
+}
@@ -0,0 +1,19 @@
+/**
+ * Регистрирует service worker, который заранее кеширует Pyodide, Monaco и снимок
+ * интерпретатора (public/sw.js). Вызывается после входа пользователя, чтобы гости
+ * на лендинге не скачивали десятки мегабайт.
+ */
+export function registerAssetCacheWorker(): void {
+  if (typeof window === "undefined" || !("serviceWorker" in navigator)) {
+    return;
+  }
+
+  // В dev ассеты не подготовлены (vendor:assets запускается перед next build)
+  if (process.env.NODE_ENV !== "production" || !process.env.NEXT_PUBLIC_PYODIDE_INDEX_URL) {
+    return;
+  }
+
+  navigator.serviceWorker.register("/sw.js", { scope: "/" }).catch((error) => {
+    console.error("[ServiceWorker] Registration failed:", error);
+  });
+}
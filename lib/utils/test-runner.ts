@@ -1,325 +1,183 @@
-import type { TestCase, TestResult, TestSuiteResult } from "@/types/test-case";
+import type { PyodideEngine } from "@/lib/pyodide/engine";
+import type { HarnessSuiteResult } from "@/lib/pyodide/protocol";
+import { sha256Hex } from "@/lib/utils/hash";
+import { LruCache } from "@/lib/utils/lru-cache";
+import type { TaskTimeLimits, TestCase, TestResult, TestSuiteResult } from "@/types/test-case";
 
 /**
- * Преобразует значение в Python код для использования в тестах
+ * Бюджет времени на один тестовый случай, если в задании не задан свой
  */
-function valueToPython(value: unknown): string {
-  if (value === null || value === undefined) {
-    return "None";
-  }
-  if (typeof value === "string") {
-    // Экранируем кавычки и специальные символы
-    const escaped = value
-      .replace(/\\/g, "\\\\")
-      .replace(/"/g, '\\"')
-      .replace(/\n/g, "\\n")
-      .replace(/\r/g, "\\r")
-      .replace(/\t/g, "\\t");
-    return `"${escaped}"`;
-  }
-  if (typeof value === "number") {
-    return String(value);
-  }
-  if (typeof value === "boolean") {
-    return value ? "True" : "False";
-  }
-  if (Array.isArray(value)) {
-    const items = value.map((item) => valueToPython(item)).join(", ");
-    return `[${items}]`;
-  }
-  if (typeof value === "object") {
-    const entries = Object.entries(value)
-      .map(([key, val]) => `"${key}": ${valueToPython(val)}`)
-      .join(", ");
-    return `{${entries}}`;
-  }
-  return String(value);
-}
+export const DEFAULT_CASE_TIME_LIMIT_MS = 5000;
 
 /**
- * Преобразует объект input в Python аргументы функции
+ * Бюджет времени на весь набор тестов, если в задании не задан свой
  */
-function inputToPythonArgs(input: Record<string, unknown>): string {
-  return Object.entries(input)
-    .map(([key, value]) => `${key}=${valueToPython(value)}`)
-    .join(", ");
-}
+export const DEFAULT_SUITE_TIME_LIMIT_MS = 30000;
 
 /**
- * Сравнивает два значения с учетом типов Python
+ * Сколько результатов проверки помнить. Ключ — хеш кода, тестов и бюджетов времени,
+ * поэтому при изменении тестов задания старые записи просто перестают совпадать.
  */
-function compareValues(actual: unknown, expected: unknown): boolean {
-  // Строгое сравнение для примитивов
-  if (
-    typeof actual === "number" &&
-    typeof expected === "number"
-  ) {
-    // Для чисел используем приблизительное сравнение для float
-    if (Number.isInteger(actual) && Number.isInteger(expected)) {
-      return actual === expected;
-    }
-    // Для float допускаем небольшую погрешность
-    return Math.abs((actual as number) - (expected as number)) < 0.0001;
-  }
+const RESULT_CACHE_SIZE = 50;
 
-  if (
-    typeof actual === "boolean" &&
-    typeof expected === "boolean"
-  ) {
-    return actual === expected;
-  }
+const resultCache = new LruCache<string, TestSuiteResult>(RESULT_CACHE_SIZE);
+// Хеш содержимого тестов считается один раз на массив test_cases
+const testCasesVersions = new WeakMap<TestCase[], Promise<string | null>>();
 
-  if (typeof actual === "string" && typeof expected === "string") {
-    return actual.trim() === expected.trim();
+function testCasesVersion(testCases: TestCase[]): Promise<string | null> {
+  let version = testCasesVersions.get(testCases);
+  if (!version) {
+    version = sha256Hex(JSON.stringify(testCases));
+    testCasesVersions.set(testCases, version);
   }
+  return version;
+}
 
-  // Для массивов сравниваем поэлементно
-  if (Array.isArray(actual) && Array.isArray(expected)) {
-    if (actual.length !== expected.length) {
-      return false;
-    }
-    return actual.every((item, index) =>
-      compareValues(item, expected[index])
-    );
+/**
+ * Упрощает сообщение об ошибке Python для ученика
+ */
+function formatTestError(rawMessage: string): string {
+  // Извлекаем более понятное сообщение из traceback Python
+  const lines = rawMessage.trim().split("\n");
+  const errorLine = lines[lines.length - 1] || rawMessage;
+
+  // Упрощаем сообщение для пользователя
+  if (errorLine.includes("UnboundLocalError")) {
+    const match = errorLine.match(/UnboundLocalError: (.+)/);
+    return match ? `Ошибка: ${match[1]}` : errorLine;
   }
-
-  // Для объектов сравниваем ключи и значения
-  if (
-    typeof actual === "object" &&
-    actual !== null &&
-    typeof expected === "object" &&
-    expected !== null &&
-    !Array.isArray(actual) &&
-    !Array.isArray(expected)
-  ) {
-    const actualKeys = Object.keys(actual).sort();
-    const expectedKeys = Object.keys(expected).sort();
-    if (actualKeys.length !== expectedKeys.length) {
-      return false;
-    }
-    return actualKeys.every(
-      (key) =>
-        key in expected &&
-        compareValues(
-          (actual as Record<string, unknown>)[key],
-          (expected as Record<string, unknown>)[key]
-        )
-    );
+  if (errorLine.includes("NameError")) {
+    const match = errorLine.match(/NameError: (.+)/);
+    return match ? `Ошибка: ${match[1]}` : errorLine;
   }
-
-  // Для None/null
-  if (
-    (actual === null || actual === undefined) &&
-    (expected === null || expected === undefined)
-  ) {
-    return true;
-  }
-
-  // Fallback: строгое сравнение
-  return actual === expected;
+  return errorLine.trim();
 }
 
 /**
- * Выполняет один тестовый случай
+ * Форматирует бюджет времени для сообщения ученику
  */
-export async function runTestCase(
-  userCode: string,
-  testCase: TestCase,
-  pyodide: any
-): Promise<TestResult> {
-  const startTime = Date.now();
-
-  try {
-    // Извлекаем имя функции из кода пользователя
-    // Ищем определение функции (например, def function_name(...))
-    const functionMatch = userCode.match(/def\s+(\w+)\s*\(/);
-    if (!functionMatch) {
-      return {
-        testCaseId: testCase.id,
-        passed: false,
-        error: "Не найдено определение функции. Убедитесь, что функция определена как def function_name(...)",
-      };
-    }
-
-    const functionName = functionMatch[1];
-
-    // Создаем тестовый код
-    const testCode = `
-${userCode}
-
-# Функция сравнения значений
-import json
-def _test_compare(actual, expected):
-    """Сравнивает два значения с учетом разных типов"""
-    try:
-        # Для чисел используем приблизительное сравнение для float
-        if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
-            if isinstance(actual, float) or isinstance(expected, float):
-                return abs(actual - expected) < 0.0001
-            return actual == expected
-        
-        # Для строк сравниваем с учетом пробелов
-        if isinstance(actual, str) and isinstance(expected, str):
-            return actual.strip() == expected.strip()
-        
-        # Для списков и словарей используем JSON сравнение
-        if isinstance(actual, (list, dict)) or isinstance(expected, (list, dict)):
-            actual_json = json.dumps(actual, sort_keys=True, ensure_ascii=False)
-            expected_json = json.dumps(expected, sort_keys=True, ensure_ascii=False)
-            return actual_json == expected_json
-        
-        # Для остальных случаев - прямое сравнение
-        return actual == expected
-    except Exception:
-        return False
-
-# Выполняем тест
-try:
-    _test_result = ${functionName}(${testCase.input ? inputToPythonArgs(testCase.input) : ""})
-    _test_expected = ${valueToPython(testCase.expected_output)}
-    _test_passed = _test_compare(_test_result, _test_expected)
-    _test_error = None
-except Exception as e:
-    _test_result = None
-    _test_passed = False
-    _test_error = str(e)
-`;
-
-    // Выполняем тест
-    await pyodide.runPythonAsync(testCode);
-
-    // Получаем результаты
-    let passed = false;
-    let result: any = undefined;
-    let error: string | undefined = undefined;
-
-    try {
-      passed = Boolean(pyodide.runPython("bool(_test_passed)"));
-    } catch {
-      passed = false;
-    }
-
-    try {
-      const resultValue = pyodide.runPython("_test_result");
-      result = resultValue !== undefined && resultValue !== null && resultValue !== "None"
-        ? resultValue
-        : undefined;
-    } catch {
-      result = undefined;
-    }
-
-    try {
-      const errorValue = pyodide.runPython("_test_error");
-      error = errorValue && errorValue !== "None" && errorValue !== null 
-        ? String(errorValue) 
-        : undefined;
-    } catch {
-      error = undefined;
-    }
-
-    // Очищаем тестовые переменные после получения результатов
-    try {
-      pyodide.runPython(`
-try:
-    del _test_result, _test_passed, _test_error, _test_expected, _test_compare
-except:
-    pass
-`);
-    } catch {
-      // Игнорируем ошибки при очистке
-    }
-
-    const executionTime = Date.now() - startTime;
-
-    return {
-      testCaseId: testCase.id,
-      passed,
-      actualOutput: result,
-      error,
-      executionTime,
-    };
-  } catch (err) {
-    const executionTime = Date.now() - startTime;
-    
-    // Улучшенная обработка ошибок
-    let errorMessage = "";
-    
-    if (err instanceof Error) {
-      errorMessage = err.message;
-      
-      // Извлекаем более понятное сообщение из traceback Python
-      const lines = errorMessage.split('\n');
-      const errorLine = lines[lines.length - 1] || errorMessage;
-      
-      // Упрощаем сообщение для пользователя
-      if (errorLine.includes('UnboundLocalError')) {
-        const match = errorLine.match(/UnboundLocalError: (.+)/);
-        errorMessage = match ? `Ошибка: ${match[1]}` : errorLine;
-      } else if (errorLine.includes('NameError')) {
-        const match = errorLine.match(/NameError: (.+)/);
-        errorMessage = match ? `Ошибка: ${match[1]}` : errorLine;
-      } else {
-        errorMessage = errorLine.trim();
-      }
-    } else {
-      errorMessage = String(err);
-    }
+function formatLimit(ms: number): string {
+  return ms % 1000 === 0 ? `${ms / 1000} с` : `${ms} мс`;
+}
 
-    // Очищаем состояние после ошибки
-    try {
-      pyodide.runPython(`
-try:
-    del _test_result, _test_passed, _test_error, _test_expected, _test_compare
-except:
-    pass
-`);
-    } catch {
-      // Игнорируем ошибки при очистке
-    }
+/**
+ * Собирает итог набора тестов
+ */
+function summarize(
+  results: TestResult[],
+  startTime: number,
+  checksPerformance = false
+): TestSuiteResult {
+  const passedCount = results.filter((r) => r.passed).length;
+  const totalCount = results.length;
+  const timedOut = results.some((r) => r.status === "timeout");
 
-    return {
-      testCaseId: testCase.id,
-      passed: false,
-      error: errorMessage || "Произошла ошибка при выполнении теста",
-      executionTime,
-    };
-  }
+  return {
+    results,
+    passedCount,
+    totalCount,
+    allPassed: passedCount === totalCount,
+    executionTime: Date.now() - startTime,
+    timedOut,
+    tooSlow: checksPerformance && timedOut,
+  };
 }
 
 /**
- * Выполняет набор тестовых случаев
+ * Выполняет набор тестовых случаев.
+ * Код ученика компилируется и выполняется один раз, все случаи прогоняются
+ * резидентным тестовым модулем за один вызов интерпретатора.
+ * Повторная проверка того же кода на тех же тестах возвращает результат из кеша,
+ * синтаксические ошибки находятся компиляцией без выполнения.
  */
 export async function runTestSuite(
   userCode: string,
   testCases: TestCase[],
-  pyodide: any
+  pyodide: PyodideEngine,
+  limits: TaskTimeLimits = {}
 ): Promise<TestSuiteResult> {
   const startTime = Date.now();
-  const results: TestResult[] = [];
+  const caseTimeLimit = limits.caseTimeLimitMs || DEFAULT_CASE_TIME_LIMIT_MS;
+  const suiteTimeLimit = limits.suiteTimeLimitMs || DEFAULT_SUITE_TIME_LIMIT_MS;
+  const checksPerformance = limits.checksPerformance ?? false;
+
+  // Ошибка, общая для всех тестовых случаев (код не запустился или не найдена функция)
+  const failAll = (error: string, status: TestResult["status"] = "error"): TestSuiteResult =>
+    summarize(
+      testCases.map((testCase) => ({ testCaseId: testCase.id, passed: false, status, error })),
+      startTime,
+      checksPerformance
+    );
 
-  // Сбрасываем буфер вывода перед тестами
-  try {
-    pyodide.runPython("_stdout_capture.reset()");
-  } catch {
-    // Игнорируем, если _stdout_capture еще не создан
+  // Извлекаем имя функции из кода пользователя
+  // Ищем определение функции (например, def function_name(...))
+  const functionMatch = userCode.match(/def\s+(\w+)\s*\(/);
+  if (!functionMatch) {
+    return failAll(
+      "Не найдено определение функции. Убедитесь, что функция определена как def function_name(...)"
+    );
   }
 
-  // Выполняем каждый тест
-  for (const testCase of testCases) {
-    const result = await runTestCase(userCode, testCase, pyodide);
-    results.push(result);
+  const testsVersion = await testCasesVersion(testCases);
+  const cacheKey = testsVersion
+    ? await sha256Hex(
+        JSON.stringify([userCode, testsVersion, caseTimeLimit, suiteTimeLimit, checksPerformance])
+      )
+    : null;
+  const cached = cacheKey ? resultCache.get(cacheKey) : undefined;
+  if (cached) {
+    return { ...cached, fromCache: true };
   }
 
-  const executionTime = Date.now() - startTime;
-  const passedCount = results.filter((r) => r.passed).length;
-  const totalCount = results.length;
+  // Синтаксическая ошибка видна без выполнения кода
+  const syntaxError = await pyodide.check(userCode);
+  if (syntaxError) {
+    const result = failAll(formatTestError(syntaxError));
+    if (cacheKey) {
+      resultCache.set(cacheKey, result);
+    }
+    return result;
+  }
 
-  return {
-    results,
-    passedCount,
-    totalCount,
-    allPassed: passedCount === totalCount,
-    executionTime,
-  };
-}
+  const execution = await pyodide.runTests(userCode, functionMatch[1], testCases, {
+    caseTimeLimit,
+    suiteTimeLimit,
+  });
 
+  if (execution.timedOut) {
+    return failAll(`Превышено время выполнения (${formatLimit(suiteTimeLimit)})`, "timeout");
+  }
+
+  if (execution.error !== null) {
+    return failAll(formatTestError(execution.error) || "Произошла ошибка при выполнении теста");
+  }
+
+  const suite = execution.value as HarnessSuiteResult;
+  if (suite.setup_timeout) {
+    return failAll(`Превышено время выполнения (${formatLimit(suiteTimeLimit)})`, "timeout");
+  }
+  if (suite.setup_error) {
+    return failAll(formatTestError(suite.setup_error));
+  }
+
+  const results: TestResult[] = suite.results.map((caseResult) => ({
+    testCaseId: caseResult.id,
+    passed: caseResult.passed,
+    status: caseResult.status,
+    actualOutput: caseResult.actual ?? undefined,
+    error:
+      caseResult.status === "timeout"
+        ? caseResult.time_ms > 0
+          ? `Превышено время выполнения теста (${formatLimit(caseTimeLimit)})`
+          : `Тест не запускался: исчерпано время на проверку (${formatLimit(suiteTimeLimit)})`
+        : (caseResult.error ?? undefined),
+    executionTime: Math.round(caseResult.time_ms * 10) / 10,
+  }));
+
+  const summary = summarize(results, startTime, checksPerformance);
+  // Таймауты зависят от загрузки устройства, поэтому такие результаты не запоминаем
+  if (cacheKey && !summary.timedOut) {
+    resultCache.set(cacheKey, summary);
+  }
+  return summary;
+}
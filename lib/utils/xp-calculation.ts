@@ -1,5 +1,9 @@
 /**
- * Утилиты для расчета XP при выполнении заданий
+ * Утилиты для расчета XP при выполнении заданий.
+ * Источник истины — функция БД calculate_task_xp: ее вызывает award_task_xp, и бонус
+ * за скорость там считается по перцентилю времени из task_stats. Здесь — упрощенная
+ * копия правил (бонус за скорость только по среднему времени); при начислении она
+ * не используется, правила меняются сначала в SQL.
  */
 
 export interface XPCalculationParams {
@@ -1,7 +1,32 @@
 import type { NextConfig } from "next";
+import { existsSync, readFileSync } from "node:fs";
+import path from "node:path";
+
+/**
+ * Адреса собственных копий Pyodide и Monaco (scripts/vendor-assets.mjs).
+ * Если ассеты не подготовлены (например, в dev), клиент грузит их с CDN.
+ */
+function readVendorManifest(): { pyodide?: string; monaco?: string } {
+  const manifestPath = path.join(process.cwd(), "public", "vendor", "manifest.json");
+  if (!existsSync(manifestPath)) {
+    return {};
+  }
+  try {
+    return JSON.parse(readFileSync(manifestPath, "utf8"));
+  } catch {
+    return {};
+  }
+}
+
+const vendorManifest = readVendorManifest();
 
 const nextConfig: NextConfig = {
   turbopack: {},
+  env: {
+    NEXT_PUBLIC_PYODIDE_INDEX_URL:
+      vendorManifest.pyodide ?? process.env.NEXT_PUBLIC_PYODIDE_INDEX_URL ?? "",
+    NEXT_PUBLIC_MONACO_VS_URL: vendorManifest.monaco ?? process.env.NEXT_PUBLIC_MONACO_VS_URL ?? "",
+  },
   // Явно указываем использование старого PostCSS плагина для Tailwind CSS v3
   experimental: {
     optimizePackageImports: [],
@@ -67,6 +92,28 @@ const nextConfig: NextConfig = {
   },
   // Увеличиваем таймаут для загрузки чанков
   staticPageGenerationTimeout: 60,
+  // Все страницы делаем cross-origin isolated, чтобы в воркере Pyodide был доступен
+  // SharedArrayBuffer для прерывания зависшего Python-кода. Заголовки нужны на любом
+  // маршруте, а не только на /modules: при клиентском переходе в /modules документ не
+  // перезагружается и сохраняет изоляцию (или ее отсутствие) страницы, с которой пришли.
+  // credentialless позволяет и дальше грузить Pyodide и Monaco с CDN.
+  async headers() {
+    // Пути ассетов содержат хеш содержимого, поэтому их можно кешировать навсегда
+    const immutable = [{ key: "Cache-Control", value: "public, max-age=31536000, immutable" }];
+
+    return [
+      { source: "/vendor/pyodide/:path*", headers: immutable },
+      { source: "/vendor/monaco/:path*", headers: immutable },
+      { source: "/pyodide/:file(snapshot-.*\\.bin)", headers: immutable },
+      {
+        source: "/:path*",
+        headers: [
+          { key: "Cross-Origin-Opener-Policy", value: "same-origin" },
+          { key: "Cross-Origin-Embedder-Policy", value: "credentialless" },
+        ],
+      },
+    ];
+  },
 };
 
 export default nextConfig;
\ No newline at end of file
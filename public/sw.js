@@ -0,0 +1,123 @@
+/**
+ * Service worker CodeSensei: заранее кеширует Pyodide, Monaco и снимок памяти
+ * интерпретатора, чтобы страница задания после первого входа открывалась без сети.
+ * Список файлов берется из /vendor/manifest.json (scripts/vendor-assets.mjs).
+ */
+
+const CACHE_PREFIX = "codesensei-assets-";
+const VENDOR_MANIFEST_URL = "/vendor/manifest.json";
+const SNAPSHOT_MANIFEST_URL = "/pyodide/snapshot.json";
+
+async function loadPrecacheList() {
+  const response = await fetch(VENDOR_MANIFEST_URL, { cache: "no-store" });
+  if (!response.ok) {
+    return null;
+  }
+  const manifest = await response.json();
+  const urls = [...manifest.precache];
+
+  try {
+    const snapshotResponse = await fetch(SNAPSHOT_MANIFEST_URL, { cache: "no-store" });
+    if (snapshotResponse.ok) {
+      const snapshot = await snapshotResponse.json();
+      urls.push(snapshot.file);
+    }
+  } catch {
+    // Снимок необязателен: без него воркер загрузится обычным способом
+  }
+
+  // Имя кеша зависит от хешей в путях: новая сборка получает новый кеш
+  return { cacheName: `${CACHE_PREFIX}${manifest.pyodide}|${manifest.monaco}`, urls };
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    (async () => {
+      const precache = await loadPrecacheList();
+      if (precache) {
+        const cache = await caches.open(precache.cacheName);
+        await cache.addAll(precache.urls);
+        await caches.open(CACHE_PREFIX + "current").then((meta) =>
+          meta.put("/__cache-name", new Response(precache.cacheName))
+        );
+      }
+      await self.skipWaiting();
+    })()
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    (async () => {
+      const meta = await caches.open(CACHE_PREFIX + "current");
+      const current = await meta.match("/__cache-name");
+      const currentName = current ? await current.text() : null;
+
+      // Удаляем кеши прошлых сборок
+      for (const name of await caches.keys()) {
+        if (name.startsWith(CACHE_PREFIX) && name !== currentName && name !== CACHE_PREFIX + "current") {
+          await caches.delete(name);
+        }
+      }
+      await self.clients.claim();
+    })()
+  );
+});
+
+function isImmutableAsset(url) {
+  return (
+    url.pathname.startsWith("/vendor/pyodide/") ||
+    url.pathname.startsWith("/vendor/monaco/") ||
+    /^\/pyodide\/snapshot-[^/]+\.bin$/.test(url.pathname)
+  );
+}
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request);
+  if (cached) {
+    return cached;
+  }
+
+  const response = await fetch(request);
+  if (response.ok) {
+    const meta = await caches.open(CACHE_PREFIX + "current");
+    const current = await meta.match("/__cache-name");
+    if (current) {
+      const cache = await caches.open(await current.text());
+      await cache.put(request, response.clone());
+    }
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(request) {
+  const cache = await caches.open(CACHE_PREFIX + "current");
+  const cached = await cache.match(request);
+  const network = fetch(request)
+    .then((response) => {
+      if (response.ok) {
+        cache.put(request, response.clone());
+      }
+      return response;
+    })
+    .catch(() => cached);
+  return cached || network;
+}
+
+self.addEventListener("fetch", (event) => {
+  const { request } = event;
+  if (request.method !== "GET") {
+    return;
+  }
+
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (isImmutableAsset(url)) {
+    event.respondWith(cacheFirst(request));
+  } else if (url.pathname === SNAPSHOT_MANIFEST_URL) {
+    event.respondWith(staleWhileRevalidate(request));
+  }
+});
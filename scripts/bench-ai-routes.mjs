@@ -0,0 +1,210 @@
+/**
+ * Нагрузочный прогон AI-маршрутов приложения: параллельные запросы, задержки (p50/p90/p99),
+ * время до первого фрагмента для потоковых ответов, статусы и число вызовов модели.
+ *
+ * Рассчитан на работу с scripts/llm-mock-server.mjs (LLM_BASE_URL приложения указывает на него):
+ * тогда результат не зависит от сети и квоты, а счетчики сервера показывают, сколько запросов
+ * дошло до модели (кеш ответов и объединение одинаковых запросов их уменьшают).
+ *
+ * Маршруты требуют сессию: скопируйте заголовок Cookie запроса к приложению из DevTools
+ * (для generate-* — сессию admin или teacher). Лимиты запросов (rate_limit_rules) действуют
+ * и здесь — для больших прогонов поднимите capacity в локальной БД.
+ *
+ * Запуск:
+ *   BENCH_COOKIE="sb-...=..." node scripts/bench-ai-routes.mjs --route=hint --task-id=<uuid> \
+ *     --requests=100 --concurrency=20 --variants=5 --stream
+ *
+ * Параметры:
+ *   --route        hint | evaluate | generate-task | generate-module (hint)
+ *   --requests     всего запросов (50)
+ *   --concurrency  одновременных запросов (10)
+ *   --variants     сколько разных вариантов кода/темы; 1 — все запросы одинаковые (1)
+ *   --task-id      задание для hint и evaluate
+ *   --stream       запрашивать text/event-stream
+ *   --app          адрес приложения (BENCH_APP_URL, http://localhost:3000)
+ *   --mock         тестовый сервер модели для /stats (BENCH_MOCK_URL, http://127.0.0.1:8787)
+ *   --cookie       заголовок Cookie (BENCH_COOKIE)
+ */
+
+import { parseArgs } from "node:util";
+
+const { values: args } = parseArgs({
+  options: {
+    route: { type: "string", default: "hint" },
+    requests: { type: "string", default: "50" },
+    concurrency: { type: "string", default: "10" },
+    variants: { type: "string", default: "1" },
+    "task-id": { type: "string", default: "" },
+    stream: { type: "boolean", default: false },
+    app: { type: "string", default: process.env.BENCH_APP_URL ?? "http://localhost:3000" },
+    mock: { type: "string", default: process.env.BENCH_MOCK_URL ?? "http://127.0.0.1:8787" },
+    cookie: { type: "string", default: process.env.BENCH_COOKIE ?? "" },
+  },
+});
+
+const ROUTE_PATHS = {
+  hint: "/api/ai/hint",
+  evaluate: "/api/tasks/evaluate",
+  "generate-task": "/api/ai/generate-task",
+  "generate-module": "/api/ai/generate-module",
+};
+
+const route = args.route;
+const total = Number(args.requests);
+const concurrency = Number(args.concurrency);
+const variants = Math.max(1, Number(args.variants));
+
+if (!ROUTE_PATHS[route]) {
+  console.error(`Unknown route "${route}". Expected: ${Object.keys(ROUTE_PATHS).join(", ")}`);
+  process.exit(1);
+}
+if ((route === "hint" || route === "evaluate") && !args["task-id"]) {
+  console.error(`--task-id is required for ${route}`);
+  process.exit(1);
+}
+if (!args.cookie) {
+  console.warn("BENCH_COOKIE is not set: the routes will answer 401");
+}
+
+/**
+ * Тело запроса; variant меняет код (или тему), чтобы управлять долей попаданий в кеш
+ */
+function buildBody(variant) {
+  const code = `def solve(a, b):\n    return a + b + ${variant}\n`;
+  switch (route) {
+    case "hint":
+      return { taskId: args["task-id"], code };
+    case "evaluate":
+      return {
+        taskId: args["task-id"],
+        code,
+        runtimeOutput: String(variant),
+        testSummary: "passed 1 of 2",
+      };
+    case "generate-task":
+      return { topic: `Функции, вариант ${variant}`, difficulty: "easy" };
+    default:
+      return { topic: `Циклы, вариант ${variant}`, level: "1" };
+  }
+}
+
+async function readMockStats() {
+  try {
+    const res = await fetch(`${args.mock}/stats`);
+    return res.ok ? await res.json() : null;
+  } catch {
+    return null;
+  }
+}
+
+/**
+ * Один запрос: полное время и время до первого фрагмента (для JSON — до ответа)
+ */
+async function runOne(index) {
+  const startedAt = performance.now();
+  let firstByteMs = null;
+  try {
+    const res = await fetch(`${args.app}${ROUTE_PATHS[route]}`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: args.stream ? "text/event-stream" : "application/json",
+        Cookie: args.cookie,
+      },
+      body: JSON.stringify(buildBody(index % variants)),
+    });
+
+    let cached = false;
+    let streamError = false;
+    if (res.headers.get("content-type")?.includes("text/event-stream") && res.body) {
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for await (const chunk of res.body) {
+        buffer += decoder.decode(chunk, { stream: true });
+        if (firstByteMs === null && buffer.includes("event: field")) {
+          firstByteMs = performance.now() - startedAt;
+        }
+      }
+      streamError = buffer.includes("event: error");
+    } else {
+      const text = await res.text();
+      try {
+        cached = JSON.parse(text)?.cached === true;
+      } catch {
+        // Не JSON — считаем только статус
+      }
+    }
+
+    const totalMs = performance.now() - startedAt;
+    return {
+      status: streamError ? "stream-error" : String(res.status),
+      totalMs,
+      firstByteMs: firstByteMs ?? totalMs,
+      cached,
+    };
+  } catch (e) {
+    return {
+      status: `network: ${e.cause?.code ?? e.message}`,
+      totalMs: performance.now() - startedAt,
+      firstByteMs: null,
+      cached: false,
+    };
+  }
+}
+
+function percentile(sorted, p) {
+  if (!sorted.length) return null;
+  return sorted[Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1)];
+}
+
+function summarize(label, values) {
+  const sorted = values.filter((v) => v !== null).sort((a, b) => a - b);
+  if (!sorted.length) return `${label}: —`;
+  const fmt = (v) => `${Math.round(v)}`;
+  return (
+    `${label}: p50 ${fmt(percentile(sorted, 50))} ms, p90 ${fmt(percentile(sorted, 90))} ms, ` +
+    `p99 ${fmt(percentile(sorted, 99))} ms, max ${fmt(sorted[sorted.length - 1])} ms`
+  );
+}
+
+const mockBefore = await readMockStats();
+const results = [];
+let next = 0;
+const startedAt = performance.now();
+
+await Promise.all(
+  Array.from({ length: Math.min(concurrency, total) }, async () => {
+    while (next < total) {
+      const index = next++;
+      results.push(await runOne(index));
+    }
+  })
+);
+
+const elapsedMs = performance.now() - startedAt;
+const mockAfter = await readMockStats();
+
+const statuses = {};
+for (const result of results) statuses[result.status] = (statuses[result.status] ?? 0) + 1;
+
+console.log(
+  `${route}: ${total} requests, concurrency ${concurrency}, ${variants} variant(s), ` +
+    `${args.stream ? "stream" : "json"}`
+);
+console.log(
+  `throughput: ${(total / (elapsedMs / 1000)).toFixed(1)} req/s in ${Math.round(elapsedMs)} ms`
+);
+console.log(`statuses: ${JSON.stringify(statuses)}`);
+console.log(summarize("latency", results.map((r) => r.totalMs)));
+console.log(summarize("first fragment", results.map((r) => r.firstByteMs)));
+if (!args.stream) console.log(`cached responses: ${results.filter((r) => r.cached).length}`);
+
+if (mockBefore && mockAfter) {
+  console.log(
+    `upstream calls: ${mockAfter.requests - mockBefore.requests}, ` +
+      `injected errors: ${mockAfter.injectedErrors - mockBefore.injectedErrors}, ` +
+      `max concurrent upstream: ${mockAfter.maxInFlight}`
+  );
+} else {
+  console.log(`mock server stats unavailable at ${args.mock}/stats`);
+}
@@ -0,0 +1,78 @@
+/**
+ * Собирает снимок памяти Pyodide после инициализации (перехват вывода,
+ * вспомогательные функции тестов, import json) и кладет его в public/pyodide/
+ * под именем с хешем содержимого; public/pyodide/snapshot.json указывает на актуальный файл.
+ * Воркер восстанавливает интерпретатор из снимка вместо холодной загрузки.
+ *
+ * Запуск: npm run build:snapshot (выполняется автоматически перед next build)
+ */
+
+import { createHash } from "node:crypto";
+import { mkdir, readdir, readFile, rm, writeFile } from "node:fs/promises";
+import { createRequire } from "node:module";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+import { loadPyodide } from "pyodide";
+import { PYODIDE_VERSION, PYTHON_BOOTSTRAP } from "../lib/pyodide/bootstrap.mjs";
+
+const rootDir = path.resolve(path.dirname(fileURLToPath(import.meta.url)), "..");
+const outputDir = path.join(rootDir, "public", "pyodide");
+const require = createRequire(import.meta.url);
+
+async function main() {
+  const packageJson = JSON.parse(await readFile(require.resolve("pyodide/package.json"), "utf8"));
+  if (packageJson.version !== PYODIDE_VERSION) {
+    throw new Error(
+      `Версия npm-пакета pyodide (${packageJson.version}) не совпадает с PYODIDE_VERSION (${PYODIDE_VERSION}). ` +
+        "Снимок, собранный другой версией, браузер не сможет восстановить."
+    );
+  }
+
+  const coldStart = performance.now();
+  const pyodide = await loadPyodide({ _makeSnapshot: true });
+  pyodide.runPython(PYTHON_BOOTSTRAP);
+  const coldBootMs = Math.round(performance.now() - coldStart);
+
+  const snapshot = pyodide.makeMemorySnapshot();
+
+  // Проверяем, что снимок восстанавливается, и замеряем время восстановления
+  const restoreStart = performance.now();
+  const restored = await loadPyodide({ _loadSnapshot: snapshot });
+  if (!restored.runPython("callable(_test_compare) and '_stdout_capture' in globals()")) {
+    throw new Error("Восстановленный из снимка интерпретатор не содержит кода инициализации");
+  }
+  const restoreMs = Math.round(performance.now() - restoreStart);
+
+  // Имя файла с хешем содержимого: снимок отдается с immutable-кешированием
+  const snapshotHash = createHash("sha256").update(snapshot).digest("hex").slice(0, 12);
+  const fileName = `snapshot-${snapshotHash}.bin`;
+
+  const manifest = {
+    version: PYODIDE_VERSION,
+    bootstrapHash: createHash("sha256").update(PYTHON_BOOTSTRAP).digest("hex"),
+    file: `/pyodide/${fileName}`,
+    size: snapshot.byteLength,
+    coldBootMs,
+    restoreMs,
+    createdAt: new Date().toISOString(),
+  };
+
+  await mkdir(outputDir, { recursive: true });
+  for (const file of await readdir(outputDir)) {
+    if (file.startsWith("snapshot-") && file.endsWith(".bin")) {
+      await rm(path.join(outputDir, file));
+    }
+  }
+  await writeFile(path.join(outputDir, fileName), snapshot);
+  await writeFile(path.join(outputDir, "snapshot.json"), `${JSON.stringify(manifest, null, 2)}\n`);
+
+  console.log(
+    `Pyodide ${PYODIDE_VERSION} snapshot: ${(snapshot.byteLength / 1024 / 1024).toFixed(1)} MB, ` +
+      `cold start ${coldBootMs} ms → restore ${restoreMs} ms`
+  );
+}
+
+main().catch((error) => {
+  console.error("Failed to build Pyodide snapshot:", error);
+  process.exit(1);
+});
@@ -0,0 +1,396 @@
+/**
+ * Локальная замена OpenAI-совместимого API модели для нагрузочных и регрессионных тестов
+ * AI-маршрутов без сети и без расхода квоты Hugging Face.
+ *
+ * Отвечает на POST /v1/chat/completions (обычный ответ и SSE при stream: true, с usage
+ * при stream_options.include_usage). Тип промпта (модуль, задание, подсказка, оценка)
+ * определяется по тексту, ответ детерминирован: одинаковый промпт — одинаковый ответ.
+ * Ответы берутся из записанных файлов (--fixtures) или строятся по шаблонам ниже.
+ * GET /stats — счетчики запросов (их читает scripts/bench-ai-routes.mjs).
+ *
+ * Запуск:
+ *   node scripts/llm-mock-server.mjs --latency=400 --tokens-per-second=60 --error-rate=0.05
+ * и в .env.local приложения:
+ *   LLM_BASE_URL=http://127.0.0.1:8787/v1
+ *   HUGGINGFACE_API_KEY=mock
+ *
+ * Параметры (флаг или переменная окружения):
+ *   --port               LLM_MOCK_PORT               порт, 8787
+ *   --latency            LLM_MOCK_LATENCY_MS         задержка до заголовков ответа, мс, 300
+ *   --jitter             LLM_MOCK_JITTER_MS          случайная добавка к задержке, мс, 0
+ *   --tokens-per-second  LLM_MOCK_TOKENS_PER_SECOND  скорость генерации; 0 — без задержки, 50
+ *   --error-rate         LLM_MOCK_ERROR_RATE         доля ответов с ошибкой, 0..1, 0
+ *   --error-status       LLM_MOCK_ERROR_STATUS       статусы ошибок через запятую, 503
+ *   --seed               LLM_MOCK_SEED               зерно генератора ошибок и задержек, 1
+ *   --fixtures           LLM_MOCK_FIXTURES           каталог с module|task|hint|evaluate.json
+ *
+ * Файл записанных ответов — строка (content ответа модели), объект (будет сериализован
+ * в JSON) или массив таких значений; элемент массива выбирается по хешу промпта.
+ */
+
+import { createHash } from "node:crypto";
+import { readFile } from "node:fs/promises";
+import { createServer } from "node:http";
+import path from "node:path";
+import { parseArgs } from "node:util";
+
+const { values: args } = parseArgs({
+  options: {
+    port: { type: "string", default: process.env.LLM_MOCK_PORT ?? "8787" },
+    latency: { type: "string", default: process.env.LLM_MOCK_LATENCY_MS ?? "300" },
+    jitter: { type: "string", default: process.env.LLM_MOCK_JITTER_MS ?? "0" },
+    "tokens-per-second": {
+      type: "string",
+      default: process.env.LLM_MOCK_TOKENS_PER_SECOND ?? "50",
+    },
+    "error-rate": { type: "string", default: process.env.LLM_MOCK_ERROR_RATE ?? "0" },
+    "error-status": { type: "string", default: process.env.LLM_MOCK_ERROR_STATUS ?? "503" },
+    seed: { type: "string", default: process.env.LLM_MOCK_SEED ?? "1" },
+    fixtures: { type: "string", default: process.env.LLM_MOCK_FIXTURES ?? "" },
+  },
+});
+
+const config = {
+  port: Number(args.port),
+  latencyMs: Number(args.latency),
+  jitterMs: Number(args.jitter),
+  tokensPerSecond: Number(args["tokens-per-second"]),
+  errorRate: Number(args["error-rate"]),
+  errorStatuses: args["error-status"].split(",").map(Number).filter(Boolean),
+  seed: Number(args.seed),
+  fixtures: args.fixtures ? path.resolve(args.fixtures) : null,
+};
+
+const PROMPT_KINDS = ["module", "task", "hint", "evaluate", "other"];
+
+// Символов на токен: грубая оценка для usage и для нарезки потока
+const CHARS_PER_TOKEN = 4;
+// Не чаще одной записи в сокет за этот интервал, даже при высокой скорости генерации
+const MIN_TICK_MS = 20;
+
+/**
+ * Детерминированный генератор (mulberry32): одинаковый --seed дает ту же последовательность
+ * ошибок и задержек
+ */
+function createRandom(seed) {
+  let state = seed >>> 0;
+  return () => {
+    state = (state + 0x6d2b79f5) >>> 0;
+    let t = state;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+const random = createRandom(config.seed);
+
+function hashOf(text) {
+  return createHash("sha256").update(text).digest().readUInt32BE(0);
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * Тип промпта по фразам из промптов маршрутов app/api/ai/* и app/api/tasks/evaluate
+ */
+function classifyPrompt(prompt) {
+  if (prompt.includes("создать учебный модуль")) return "module";
+  if (prompt.includes("создать практическое задание")) return "task";
+  if (prompt.includes("Оцени решение")) return "evaluate";
+  if (prompt.includes("поэтапную подсказку")) return "hint";
+  return "other";
+}
+
+function matchLine(prompt, pattern, fallback) {
+  return prompt.match(pattern)?.[1]?.trim() || fallback;
+}
+
+const templates = {
+  module(prompt) {
+    const topic = matchLine(prompt, /по теме "([^"]+)"/, "Python");
+    return {
+      description: `Модуль знакомит с темой «${topic}» на простых примерах. После него ученик сможет применять ее в небольших программах.`,
+      theory: {
+        introduction: `В этом уроке разберем, что такое «${topic}» и зачем это нужно программисту.`,
+        sections: [
+          {
+            heading: `Что такое «${topic}»`,
+            content: `Представьте, что «${topic}» — это инструмент из набора мастера: у него есть понятное назначение и правила использования.\n\nРазберем их по шагам.`,
+            code_examples: [
+              {
+                description: "Первый пример",
+                code: 'name = "Мир"\nprint(f"Привет, {name}!")',
+                output: "Привет, Мир!",
+                explanation: "Программа сохраняет строку в переменной и выводит приветствие.",
+              },
+            ],
+          },
+          {
+            heading: "Типичные ошибки",
+            content: "- Забытое двоеточие после заголовка блока\n- Неверный отступ внутри блока",
+            code_examples: [],
+          },
+        ],
+        summary: `Мы познакомились с темой «${topic}» и разобрали типичные ошибки.`,
+        key_concepts: [topic, "переменная", "вывод на экран"],
+      },
+    };
+  },
+
+  task(prompt) {
+    const topic = matchLine(prompt, /по теме "([^"]+)"/, "Python");
+    return {
+      title: `Практика: ${topic}`,
+      description: `Напишите функцию \`solve(a, b)\`, которая возвращает сумму двух чисел.\n\n**Пример:** \`solve(2, 3)\` → \`5\``,
+      starter_code: "def solve(a, b):\n    # Напишите здесь ваше решение\n    pass",
+      solution_code: "def solve(a, b):\n    return a + b",
+      test_cases: [
+        {
+          id: "test_1",
+          description: "Базовый случай",
+          input: { a: 2, b: 3 },
+          expected_output: 5,
+          category: "basic",
+          is_visible: true,
+        },
+        {
+          id: "test_2",
+          description: "Граничный случай",
+          input: { a: 0, b: 0 },
+          expected_output: 0,
+          category: "edge",
+          is_visible: false,
+        },
+      ],
+      hints: [
+        "Подсказка 1: вспомните оператор сложения",
+        "Подсказка 2: функция должна вернуть результат через return",
+        "Подсказка 3: проверьте решение на нулях",
+      ],
+      xp_reward: 10,
+      rubric: [
+        { name: "Корректность", weight: 0.6, criteria: "Проходит базовые и граничные тесты" },
+        { name: "Крайние случаи", weight: 0.2, criteria: "Учитывает нули и отрицательные числа" },
+        { name: "Стиль и читаемость", weight: 0.2, criteria: "Понятные имена, простота" },
+      ],
+      eval_prompt:
+        'Ты проверяешь решение ученика. Дай краткий отзыв (3-5 предложений) и числовую оценку 0..1 согласно rubric. Верни JSON {"score": number, "feedback": string}.',
+    };
+  },
+
+  hint(prompt) {
+    const title = matchLine(prompt, /^Задача: (.+)$/m, "задача");
+    const types = ["concept", "edge_case", "debug"];
+    return {
+      type: types[hashOf(prompt) % types.length],
+      hint: `Перечитайте условие задачи «${title}» и определите, что функция получает на вход и что должна вернуть.`,
+      steps: [
+        "Выпишите входные данные и ожидаемый результат из примера.",
+        "Решите пример вручную и запишите шаги по порядку.",
+        "Переведите каждый шаг в строку кода и проверьте на примере.",
+      ],
+    };
+  },
+
+  evaluate(prompt) {
+    const score = Math.round(((hashOf(prompt) % 1000) / 1000) * 100) / 100;
+    return {
+      score,
+      feedback:
+        score >= 0.7
+          ? "Решение работает и читается легко. Имена переменных понятные. Подумайте, как функция поведет себя на пустых входных данных."
+          : "Решение пока проходит не все случаи. Проверьте граничные значения и сравните вывод с ожидаемым в примере. Разбейте решение на небольшие шаги.",
+    };
+  },
+
+  other() {
+    return { text: "Ответ тестового сервера" };
+  },
+};
+
+const fixtures = {};
+
+async function loadFixtures() {
+  if (!config.fixtures) return;
+  for (const kind of PROMPT_KINDS) {
+    try {
+      const file = path.join(config.fixtures, `${kind}.json`);
+      fixtures[kind] = JSON.parse(await readFile(file, "utf8"));
+    } catch (e) {
+      if (e.code !== "ENOENT") throw e;
+    }
+  }
+}
+
+function buildContent(kind, prompt) {
+  let recorded = fixtures[kind];
+  if (Array.isArray(recorded)) {
+    recorded = recorded.length ? recorded[hashOf(prompt) % recorded.length] : undefined;
+  }
+  if (typeof recorded === "string") return recorded;
+  return JSON.stringify(recorded ?? templates[kind](prompt));
+}
+
+function splitTokens(content) {
+  const chars = Array.from(content);
+  const tokens = [];
+  for (let i = 0; i < chars.length; i += CHARS_PER_TOKEN) {
+    tokens.push(chars.slice(i, i + CHARS_PER_TOKEN).join(""));
+  }
+  return tokens;
+}
+
+const stats = {
+  requests: 0,
+  streamed: 0,
+  injectedErrors: 0,
+  clientAborts: 0,
+  inFlight: 0,
+  maxInFlight: 0,
+  completionTokens: 0,
+  byKind: Object.fromEntries(PROMPT_KINDS.map((kind) => [kind, 0])),
+};
+
+function sendJson(res, status, body, headers = {}) {
+  res.writeHead(status, { "Content-Type": "application/json", ...headers });
+  res.end(JSON.stringify(body));
+}
+
+async function readBody(req) {
+  const chunks = [];
+  for await (const chunk of req) chunks.push(chunk);
+  return JSON.parse(Buffer.concat(chunks).toString("utf8") || "{}");
+}
+
+async function handleChatCompletion(req, res) {
+  let body;
+  try {
+    body = await readBody(req);
+  } catch {
+    sendJson(res, 400, { error: { message: "Invalid JSON body" } });
+    return;
+  }
+
+  const prompt = (body.messages ?? []).map((message) => message.content ?? "").join("\n");
+  const kind = classifyPrompt(prompt);
+  stats.requests++;
+  stats.byKind[kind]++;
+
+  let aborted = false;
+  res.on("close", () => {
+    if (!res.writableFinished) {
+      aborted = true;
+      stats.clientAborts++;
+    }
+  });
+
+  await sleep(config.latencyMs + random() * config.jitterMs);
+  if (aborted) return;
+
+  if (config.errorStatuses.length && random() < config.errorRate) {
+    stats.injectedErrors++;
+    const status = config.errorStatuses[Math.floor(random() * config.errorStatuses.length)];
+    sendJson(
+      res,
+      status,
+      { error: { message: `Injected error ${status}` } },
+      status === 429 ? { "Retry-After": "1" } : {}
+    );
+    return;
+  }
+
+  const content = buildContent(kind, prompt);
+  const tokens = splitTokens(content);
+  const usage = {
+    prompt_tokens: Math.ceil(prompt.length / CHARS_PER_TOKEN),
+    completion_tokens: tokens.length,
+    total_tokens: Math.ceil(prompt.length / CHARS_PER_TOKEN) + tokens.length,
+  };
+  stats.completionTokens += tokens.length;
+
+  const id = `chatcmpl-mock-${hashOf(prompt).toString(16)}`;
+  const created = Math.floor(Date.now() / 1000);
+  const model = body.model ?? "mock";
+
+  if (!body.stream) {
+    if (config.tokensPerSecond > 0) await sleep((tokens.length / config.tokensPerSecond) * 1000);
+    if (aborted) return;
+    sendJson(res, 200, {
+      id,
+      object: "chat.completion",
+      created,
+      model,
+      choices: [{ index: 0, message: { role: "assistant", content }, finish_reason: "stop" }],
+      usage,
+    });
+    return;
+  }
+
+  stats.streamed++;
+  res.writeHead(200, { "Content-Type": "text/event-stream", "Cache-Control": "no-cache" });
+  const chunk = (choices, extra = {}) => {
+    const payload = { id, object: "chat.completion.chunk", created, model, choices, ...extra };
+    return `data: ${JSON.stringify(payload)}\n\n`;
+  };
+
+  res.write(chunk([{ index: 0, delta: { role: "assistant", content: "" }, finish_reason: null }]));
+
+  const tickMs =
+    config.tokensPerSecond > 0 ? Math.max(1000 / config.tokensPerSecond, MIN_TICK_MS) : 0;
+  const tokensPerTick =
+    config.tokensPerSecond > 0
+      ? Math.max(1, Math.round((config.tokensPerSecond * tickMs) / 1000))
+      : tokens.length;
+
+  for (let i = 0; i < tokens.length; i += tokensPerTick) {
+    if (tickMs) await sleep(tickMs);
+    if (aborted) return;
+    const delta = tokens.slice(i, i + tokensPerTick).join("");
+    res.write(chunk([{ index: 0, delta: { content: delta }, finish_reason: null }]));
+  }
+
+  res.write(chunk([{ index: 0, delta: {}, finish_reason: "stop" }]));
+  if (body.stream_options?.include_usage) res.write(chunk([], { usage }));
+  res.end("data: [DONE]\n\n");
+}
+
+const server = createServer(async (req, res) => {
+  const { pathname } = new URL(req.url ?? "/", "http://localhost");
+
+  if (req.method === "GET" && pathname === "/stats") {
+    sendJson(res, 200, stats);
+    return;
+  }
+  if (req.method === "GET" && /^(\/v1)?\/models$/.test(pathname)) {
+    sendJson(res, 200, { object: "list", data: [{ id: "mock", object: "model" }] });
+    return;
+  }
+  if (req.method !== "POST" || !/^(\/v1)?\/chat\/completions$/.test(pathname)) {
+    sendJson(res, 404, { error: { message: `Not found: ${req.method} ${pathname}` } });
+    return;
+  }
+
+  stats.inFlight++;
+  stats.maxInFlight = Math.max(stats.maxInFlight, stats.inFlight);
+  try {
+    await handleChatCompletion(req, res);
+  } catch (e) {
+    console.error("Mock server error:", e);
+    if (!res.headersSent) sendJson(res, 500, { error: { message: String(e) } });
+    else res.end();
+  } finally {
+    stats.inFlight--;
+  }
+});
+
+await loadFixtures();
+server.listen(config.port, "127.0.0.1", () => {
+  console.log(`LLM mock server: http://127.0.0.1:${config.port}/v1`);
+  console.log(
+    `  latency ${config.latencyMs}±${config.jitterMs} ms, ` +
+      `${config.tokensPerSecond || "∞"} tokens/s, ` +
+      `errors ${config.errorRate * 100}% (${config.errorStatuses.join(", ")})` +
+      (config.fixtures ? `, fixtures ${config.fixtures}` : "")
+  );
+});
@@ -0,0 +1,128 @@
+/**
+ * Копирует Pyodide и Monaco Editor из node_modules в public/vendor/ по путям
+ * с хешем содержимого, чтобы отдавать их со своего домена с immutable-кешированием
+ * вместо стороннего CDN. Пишет public/vendor/manifest.json: его читает next.config.ts
+ * (адреса ассетов) и service worker (список файлов для предварительного кеширования).
+ *
+ * Запуск: npm run vendor:assets (выполняется автоматически перед next build)
+ */
+
+import { createHash } from "node:crypto";
+import { cp, mkdir, readdir, readFile, rm, writeFile } from "node:fs/promises";
+import { createRequire } from "node:module";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+import { PYODIDE_VERSION } from "../lib/pyodide/bootstrap.mjs";
+
+const rootDir = path.resolve(path.dirname(fileURLToPath(import.meta.url)), "..");
+const vendorDir = path.join(rootDir, "public", "vendor");
+const require = createRequire(import.meta.url);
+
+/**
+ * Файлы Pyodide, нужные в рантайме (без типов, README и т.п.)
+ */
+const PYODIDE_FILES = [
+  "pyodide.js",
+  "pyodide.mjs",
+  "pyodide.asm.js",
+  "pyodide.asm.wasm",
+  "python_stdlib.zip",
+  "pyodide-lock.json",
+];
+
+/**
+ * Для редактора нужен только Python: подсветку и воркеры других языков не кешируем заранее
+ */
+function isMonacoPrecached(relativePath) {
+  const basicLanguage = relativePath.match(/basic-languages\/([^/]+)\//);
+  if (basicLanguage && basicLanguage[1] !== "python") {
+    return false;
+  }
+  if (/language\/(typescript|css|html|json)\//.test(relativePath)) {
+    return false;
+  }
+  return !relativePath.endsWith(".map");
+}
+
+async function listFiles(dir, prefix = "") {
+  const entries = await readdir(dir, { withFileTypes: true });
+  const files = [];
+  for (const entry of entries) {
+    const relativePath = prefix ? `${prefix}/${entry.name}` : entry.name;
+    if (entry.isDirectory()) {
+      files.push(...(await listFiles(path.join(dir, entry.name), relativePath)));
+    } else {
+      files.push(relativePath);
+    }
+  }
+  return files.sort();
+}
+
+async function hashFiles(dir, files) {
+  const hash = createHash("sha256");
+  for (const file of files) {
+    hash.update(file);
+    hash.update(await readFile(path.join(dir, file)));
+  }
+  return hash.digest("hex").slice(0, 12);
+}
+
+async function vendorPyodide() {
+  const sourceDir = path.dirname(require.resolve("pyodide/package.json"));
+  const { version } = JSON.parse(await readFile(path.join(sourceDir, "package.json"), "utf8"));
+  if (version !== PYODIDE_VERSION) {
+    throw new Error(`Версия npm-пакета pyodide (${version}) не совпадает с PYODIDE_VERSION (${PYODIDE_VERSION})`);
+  }
+
+  const hash = await hashFiles(sourceDir, PYODIDE_FILES);
+  const targetDir = path.join(vendorDir, "pyodide", hash);
+  await mkdir(targetDir, { recursive: true });
+  for (const file of PYODIDE_FILES) {
+    await cp(path.join(sourceDir, file), path.join(targetDir, file));
+  }
+
+  const baseUrl = `/vendor/pyodide/${hash}/`;
+  return {
+    baseUrl,
+    // pyodide.mjs воркеру не нужен (он грузит pyodide.js), поэтому заранее не кешируем
+    precache: PYODIDE_FILES.filter((file) => file !== "pyodide.mjs").map((file) => `${baseUrl}${file}`),
+  };
+}
+
+async function vendorMonaco() {
+  const sourceDir = path.join(path.dirname(require.resolve("monaco-editor/package.json")), "min", "vs");
+  const files = await listFiles(sourceDir);
+
+  const hash = await hashFiles(sourceDir, files);
+  const targetDir = path.join(vendorDir, "monaco", hash, "vs");
+  await cp(sourceDir, targetDir, { recursive: true });
+
+  const baseUrl = `/vendor/monaco/${hash}/vs`;
+  return {
+    baseUrl,
+    precache: files.filter(isMonacoPrecached).map((file) => `${baseUrl}/${file}`),
+  };
+}
+
+async function main() {
+  // Старые версии не нужны: service worker держит свою копию в Cache Storage
+  await rm(vendorDir, { recursive: true, force: true });
+
+  const pyodide = await vendorPyodide();
+  const monaco = await vendorMonaco();
+
+  const manifest = {
+    pyodide: pyodide.baseUrl,
+    monaco: monaco.baseUrl,
+    precache: [...pyodide.precache, ...monaco.precache],
+  };
+  await writeFile(path.join(vendorDir, "manifest.json"), `${JSON.stringify(manifest, null, 2)}\n`);
+
+  console.log(`Vendored Pyodide → ${pyodide.baseUrl}, Monaco → ${monaco.baseUrl}`);
+  console.log(`Service worker precache: ${manifest.precache.length} files`);
+}
+
+main().catch((error) => {
+  console.error("Failed to vendor assets:", error);
+  process.exit(1);
+});
@@ -0,0 +1,10 @@
+-- Бюджеты времени для проверки решений
+-- time_limit_ms — на один тестовый случай, suite_time_limit_ms — на весь набор тестов.
+-- NULL означает значение по умолчанию из lib/utils/test-runner.ts.
+-- checks_performance — задание проверяет эффективность: превышение бюджета
+-- показывается ученику как «решение слишком медленное».
+
+ALTER TABLE public.tasks
+  ADD COLUMN IF NOT EXISTS time_limit_ms INTEGER CHECK (time_limit_ms IS NULL OR time_limit_ms > 0),
+  ADD COLUMN IF NOT EXISTS suite_time_limit_ms INTEGER CHECK (suite_time_limit_ms IS NULL OR suite_time_limit_ms > 0),
+  ADD COLUMN IF NOT EXISTS checks_performance BOOLEAN NOT NULL DEFAULT false;
@@ -0,0 +1,338 @@
+/*
+  # Статистика времени выполнения по заданиям
+
+  Для бонуса скорости award_task_xp усреднял execution_time_ms по всем успешным
+  попыткам задания — стоимость росла вместе с числом учеников. Теперь агрегаты
+  хранятся в task_stats и обновляются триггером при каждой успешной попытке:
+
+  - success_count, execution_time_sum — среднее за O(1);
+  - execution_time_histogram — 64 логарифмические корзины (шаг x1.2, погрешность до 20%),
+    по которым считается перцентиль. При 20+ решениях бонус скорости получают
+    решения из 25% самых быстрых, иначе действует прежнее правило (быстрее 70% среднего).
+*/
+
+CREATE TABLE IF NOT EXISTS public.task_stats (
+  task_id UUID PRIMARY KEY REFERENCES public.tasks(id) ON DELETE CASCADE,
+  success_count BIGINT NOT NULL DEFAULT 0,
+  execution_time_sum BIGINT NOT NULL DEFAULT 0,
+  execution_time_histogram INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[64]),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Статистика обезличена, читать ее могут все авторизованные; пишет только триггер
+ALTER TABLE public.task_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Authenticated users can view task stats" ON public.task_stats;
+CREATE POLICY "Authenticated users can view task stats"
+ON public.task_stats FOR SELECT
+TO authenticated
+USING (true);
+
+-- Номер корзины гистограммы (1..64) для времени выполнения в мс
+CREATE OR REPLACE FUNCTION public.execution_time_bucket(p_execution_time INTEGER)
+RETURNS INTEGER AS $$
+  SELECT LEAST(64, GREATEST(1, floor(ln(GREATEST(p_execution_time, 1)) / ln(1.2))::INTEGER + 1));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Приближенный перцентиль: верхняя граница корзины, в которой накопилась доля p_fraction решений
+CREATE OR REPLACE FUNCTION public.execution_time_percentile(
+  p_histogram INTEGER[],
+  p_count BIGINT,
+  p_fraction NUMERIC
+)
+RETURNS NUMERIC AS $$
+DECLARE
+  cumulative BIGINT := 0;
+  bucket INTEGER;
+BEGIN
+  IF p_count IS NULL OR p_count = 0 THEN
+    RETURN NULL;
+  END IF;
+  FOR bucket IN 1..array_length(p_histogram, 1) LOOP
+    cumulative := cumulative + p_histogram[bucket];
+    IF cumulative >= p_fraction * p_count THEN
+      RETURN round(power(1.2, bucket));
+    END IF;
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.update_task_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  bucket INTEGER;
+BEGIN
+  IF NOT NEW.is_successful OR NEW.execution_time_ms IS NULL THEN
+    RETURN NEW;
+  END IF;
+
+  bucket := public.execution_time_bucket(NEW.execution_time_ms);
+
+  INSERT INTO public.task_stats (task_id)
+  VALUES (NEW.task_id)
+  ON CONFLICT (task_id) DO NOTHING;
+
+  -- UPDATE блокирует строку, поэтому параллельные попытки не теряют приращений
+  UPDATE public.task_stats
+  SET
+    success_count = success_count + 1,
+    execution_time_sum = execution_time_sum + NEW.execution_time_ms,
+    execution_time_histogram[bucket] = execution_time_histogram[bucket] + 1,
+    updated_at = NOW()
+  WHERE task_id = NEW.task_id;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS update_task_stats_on_attempt ON public.task_attempts;
+CREATE TRIGGER update_task_stats_on_attempt
+  AFTER INSERT ON public.task_attempts
+  FOR EACH ROW
+  EXECUTE FUNCTION public.update_task_stats();
+
+-- Заполняем статистику по уже существующим попыткам
+WITH buckets AS (
+  SELECT
+    task_id,
+    public.execution_time_bucket(execution_time_ms) AS bucket,
+    count(*) AS attempts,
+    sum(execution_time_ms) AS total_time
+  FROM public.task_attempts
+  WHERE is_successful AND execution_time_ms IS NOT NULL
+  GROUP BY 1, 2
+)
+INSERT INTO public.task_stats (task_id, success_count, execution_time_sum, execution_time_histogram)
+SELECT
+  b.task_id,
+  sum(b.attempts),
+  sum(b.total_time),
+  ARRAY(
+    SELECT COALESCE(
+      (SELECT b2.attempts FROM buckets b2 WHERE b2.task_id = b.task_id AND b2.bucket = g),
+      0
+    )::INTEGER
+    FROM generate_series(1, 64) AS g
+    ORDER BY g
+  )
+FROM buckets b
+GROUP BY b.task_id
+ON CONFLICT (task_id) DO NOTHING;
+
+-- Бонус скорости по перцентилю: добавляется параметр p_fast_execution_time
+DROP FUNCTION IF EXISTS public.calculate_task_xp(INTEGER, TEXT, INTEGER, BOOLEAN, BOOLEAN, INTEGER, NUMERIC);
+
+CREATE OR REPLACE FUNCTION public.calculate_task_xp(
+  p_base_xp INTEGER,
+  p_difficulty TEXT,
+  p_attempt_number INTEGER,
+  p_used_ai_hint BOOLEAN,
+  p_is_first_attempt BOOLEAN,
+  p_execution_time INTEGER,
+  p_average_execution_time NUMERIC,
+  p_fast_execution_time NUMERIC DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+  base_xp INTEGER;
+  attempt_multiplier NUMERIC;
+  base_with_multiplier INTEGER;
+  perfect_bonus INTEGER := 0;
+  no_hints_bonus INTEGER := 0;
+  speed_bonus INTEGER := 0;
+  total_xp INTEGER;
+  breakdown TEXT[] := ARRAY[]::TEXT[];
+BEGIN
+  -- Базовое значение из задания или по умолчанию по сложности
+  base_xp := COALESCE(
+    NULLIF(p_base_xp, 0),
+    CASE p_difficulty WHEN 'easy' THEN 10 WHEN 'medium' THEN 20 ELSE 30 END
+  );
+
+  -- Множитель попытки: 100% / 70% / 50%, с подсказкой всегда 50%
+  attempt_multiplier := CASE p_attempt_number WHEN 1 THEN 1.0 WHEN 2 THEN 0.7 ELSE 0.5 END;
+  IF p_used_ai_hint THEN
+    attempt_multiplier := 0.5;
+  END IF;
+  base_with_multiplier := round(base_xp * attempt_multiplier);
+
+  IF p_is_first_attempt AND p_attempt_number = 1 AND NOT p_used_ai_hint THEN
+    perfect_bonus := 5;
+  END IF;
+  IF NOT p_used_ai_hint THEN
+    no_hints_bonus := 3;
+  END IF;
+  -- Бонус скорости: решение среди 25% самых быстрых (если статистики достаточно),
+  -- иначе быстрее 70% от среднего времени
+  IF p_fast_execution_time IS NOT NULL THEN
+    IF p_execution_time > 0 AND p_execution_time <= p_fast_execution_time THEN
+      speed_bonus := 2;
+    END IF;
+  ELSIF p_execution_time > 0 AND p_average_execution_time > 0
+     AND p_execution_time < p_average_execution_time * 0.7 THEN
+    speed_bonus := 2;
+  END IF;
+
+  total_xp := base_with_multiplier + perfect_bonus + no_hints_bonus + speed_bonus;
+
+  breakdown := breakdown || format('Базовая награда: %s XP', base_xp);
+  breakdown := breakdown || format(
+    'Множитель попытки %s: %s%% = %s XP',
+    p_attempt_number, round(attempt_multiplier * 100), base_with_multiplier
+  );
+  IF p_used_ai_hint THEN
+    breakdown := breakdown || 'Штраф за использование подсказки: 50%'::TEXT;
+  END IF;
+  IF perfect_bonus > 0 THEN
+    breakdown := breakdown || format('Бонус "Идеальное решение": +%s XP', perfect_bonus);
+  END IF;
+  IF no_hints_bonus > 0 THEN
+    breakdown := breakdown || format('Бонус "Без подсказок": +%s XP', no_hints_bonus);
+  END IF;
+  IF speed_bonus > 0 THEN
+    breakdown := breakdown || format('Бонус "Скорость": +%s XP', speed_bonus);
+  END IF;
+  breakdown := breakdown || format('Итого: %s XP', total_xp);
+
+  -- Та же форма, что у XPCalculationResult
+  RETURN jsonb_build_object(
+    'baseXP', base_xp,
+    'attemptMultiplier', attempt_multiplier,
+    'hintPenalty', p_used_ai_hint,
+    'bonuses', jsonb_build_object(
+      'perfectSolution', perfect_bonus,
+      'noHints', no_hints_bonus,
+      'speed', speed_bonus
+    ),
+    'totalXP', total_xp,
+    'breakdown', to_jsonb(breakdown)
+  );
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.award_task_xp(
+  p_task_id UUID,
+  p_attempt_number INTEGER,
+  p_used_ai_hint BOOLEAN DEFAULT false,
+  p_execution_time INTEGER DEFAULT NULL,
+  p_is_first_attempt BOOLEAN DEFAULT false
+)
+RETURNS JSONB AS $$
+DECLARE
+  current_user_id UUID := auth.uid();
+  task_row RECORD;
+  stats_row RECORD;
+  average_execution_time NUMERIC;
+  fast_execution_time NUMERIC;
+  calculation JSONB;
+  xp_awarded INTEGER;
+  new_total_xp INTEGER;
+  new_level INTEGER;
+  module_task_count INTEGER;
+  completed_task_count INTEGER;
+  module_completed BOOLEAN;
+BEGIN
+  IF current_user_id IS NULL THEN
+    RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '28000';
+  END IF;
+
+  SELECT xp_reward, difficulty, module_id INTO task_row
+  FROM public.tasks
+  WHERE id = p_task_id;
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('status', 'task_not_found');
+  END IF;
+
+  -- Блокируем строку пользователя: параллельные начисления выполняются по очереди
+  PERFORM 1 FROM public.users WHERE id = current_user_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('status', 'user_not_found');
+  END IF;
+
+  -- Защита от повторного начисления за уже выполненное задание
+  IF NOT COALESCE(p_is_first_attempt, false) AND EXISTS (
+    SELECT 1 FROM public.task_attempts
+    WHERE user_id = current_user_id AND task_id = p_task_id AND is_successful
+  ) THEN
+    RETURN jsonb_build_object('status', 'already_completed');
+  END IF;
+
+  -- Статистика времени успешных решений (для бонуса скорости) — одна строка вместо агрегата
+  SELECT success_count, execution_time_sum, execution_time_histogram INTO stats_row
+  FROM public.task_stats
+  WHERE task_id = p_task_id;
+  IF FOUND AND stats_row.success_count > 0 THEN
+    average_execution_time := stats_row.execution_time_sum::NUMERIC / stats_row.success_count;
+    IF stats_row.success_count >= 20 THEN
+      fast_execution_time := public.execution_time_percentile(
+        stats_row.execution_time_histogram, stats_row.success_count, 0.25
+      );
+    END IF;
+  END IF;
+
+  calculation := public.calculate_task_xp(
+    task_row.xp_reward,
+    task_row.difficulty,
+    p_attempt_number,
+    COALESCE(p_used_ai_hint, false),
+    COALESCE(p_is_first_attempt, false),
+    p_execution_time,
+    average_execution_time,
+    fast_execution_time
+  );
+  xp_awarded := (calculation->>'totalXP')::INTEGER;
+
+  -- Атомарное увеличение: в SET используется значение total_xp до обновления
+  UPDATE public.users
+  SET
+    total_xp = COALESCE(total_xp, 0) + xp_awarded,
+    current_level = public.calculate_user_level(COALESCE(total_xp, 0) + xp_awarded)
+  WHERE id = current_user_id
+  RETURNING total_xp, current_level INTO new_total_xp, new_level;
+
+  -- Прогресс по модулю: модуль завершен, когда решены все его задания
+  IF task_row.module_id IS NOT NULL THEN
+    SELECT count(*) INTO module_task_count
+    FROM public.tasks
+    WHERE module_id = task_row.module_id;
+
+    SELECT count(DISTINCT ta.task_id) INTO completed_task_count
+    FROM public.task_attempts ta
+    JOIN public.tasks t ON t.id = ta.task_id
+    WHERE ta.user_id = current_user_id AND ta.is_successful AND t.module_id = task_row.module_id;
+
+    module_completed := completed_task_count >= module_task_count;
+
+    INSERT INTO public.user_progress (
+      user_id, module_id, status, xp_earned, last_attempt_at, first_completed_at
+    )
+    VALUES (
+      current_user_id,
+      task_row.module_id,
+      CASE WHEN module_completed THEN 'completed' ELSE 'in_progress' END,
+      xp_awarded,
+      NOW(),
+      CASE WHEN module_completed THEN NOW() END
+    )
+    ON CONFLICT (user_id, module_id) DO UPDATE SET
+      status = CASE
+        WHEN module_completed THEN 'completed'
+        WHEN public.user_progress.status = 'not_started' THEN 'in_progress'
+        ELSE public.user_progress.status
+      END,
+      xp_earned = public.user_progress.xp_earned + EXCLUDED.xp_earned,
+      last_attempt_at = EXCLUDED.last_attempt_at,
+      first_completed_at = COALESCE(public.user_progress.first_completed_at, EXCLUDED.first_completed_at);
+  END IF;
+
+  RETURN jsonb_build_object(
+    'status', 'awarded',
+    'xp_awarded', xp_awarded,
+    'new_total_xp', new_total_xp,
+    'new_level', new_level,
+    'calculation', calculation
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
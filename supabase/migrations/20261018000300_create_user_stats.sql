@@ -0,0 +1,243 @@
+/*
+  # Счетчики пользователя для проверки достижений
+
+  checkAndAwardAchievements выполнял отдельный запрос на каждое неполученное достижение,
+  причем часть условий загружала в Node всю историю task_attempts пользователя.
+  Теперь все, что нужно условиям, хранится в одной строке user_stats и обновляется
+  инкрементально триггерами на task_attempts и user_progress:
+
+  - successful_count, no_hints_count — успешные попытки (всего и без подсказок);
+  - perfect_count — задания, решенные с первой попытки;
+  - first_day_count — успешные попытки в первые сутки после регистрации;
+  - active_days, current/longest_day_streak — дни с успешными решениями (по UTC);
+  - current/longest_task_streak — успешные попытки подряд, без неудачных между ними;
+  - current/longest_perfect_streak — задания подряд, решенные с первой попытки;
+  - hourly_success_counts — успешные попытки по часам суток (UTC), из них считаются
+    «ночные», «утренние» и любые другие диапазоны time_based_tasks;
+  - completed_modules — завершенные модули.
+
+  grant_achievements выдает найденные достижения и начисляет XP за них одним вызовом.
+*/
+
+CREATE TABLE IF NOT EXISTS public.user_stats (
+  user_id UUID PRIMARY KEY REFERENCES public.users(id) ON DELETE CASCADE,
+  successful_count INTEGER NOT NULL DEFAULT 0,
+  no_hints_count INTEGER NOT NULL DEFAULT 0,
+  perfect_count INTEGER NOT NULL DEFAULT 0,
+  first_day_count INTEGER NOT NULL DEFAULT 0,
+  active_days INTEGER NOT NULL DEFAULT 0,
+  last_active_date DATE,
+  current_day_streak INTEGER NOT NULL DEFAULT 0,
+  longest_day_streak INTEGER NOT NULL DEFAULT 0,
+  current_task_streak INTEGER NOT NULL DEFAULT 0,
+  longest_task_streak INTEGER NOT NULL DEFAULT 0,
+  current_perfect_streak INTEGER NOT NULL DEFAULT 0,
+  longest_perfect_streak INTEGER NOT NULL DEFAULT 0,
+  hourly_success_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[24]),
+  completed_modules INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Пользователь видит только свои счетчики; пишут в таблицу только триггеры
+ALTER TABLE public.user_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own stats" ON public.user_stats;
+CREATE POLICY "Users can view own stats"
+ON public.user_stats FOR SELECT
+TO authenticated
+USING (auth.uid() = user_id);
+
+-- Учитывает одну попытку в счетчиках пользователя (используется триггером и при заполнении)
+CREATE OR REPLACE FUNCTION public.apply_attempt_to_user_stats(p_attempt public.task_attempts)
+RETURNS VOID AS $$
+DECLARE
+  stats public.user_stats%ROWTYPE;
+  registered_at TIMESTAMPTZ;
+  attempt_date DATE := (p_attempt.created_at AT TIME ZONE 'UTC')::DATE;
+  attempt_hour INTEGER := extract(hour FROM p_attempt.created_at AT TIME ZONE 'UTC')::INTEGER;
+  is_first_attempt BOOLEAN;
+BEGIN
+  INSERT INTO public.user_stats (user_id)
+  VALUES (p_attempt.user_id)
+  ON CONFLICT (user_id) DO NOTHING;
+
+  -- Блокировка строки: параллельные попытки одного пользователя обновляют счетчики по очереди
+  SELECT * INTO stats FROM public.user_stats WHERE user_id = p_attempt.user_id FOR UPDATE;
+
+  -- Первая попытка по заданию (индекс idx_task_attempts_user_task)
+  is_first_attempt := NOT EXISTS (
+    SELECT 1 FROM public.task_attempts
+    WHERE user_id = p_attempt.user_id
+      AND task_id = p_attempt.task_id
+      AND (created_at, id) < (p_attempt.created_at, p_attempt.id)
+  );
+
+  IF is_first_attempt THEN
+    IF p_attempt.is_successful THEN
+      stats.perfect_count := stats.perfect_count + 1;
+      stats.current_perfect_streak := stats.current_perfect_streak + 1;
+      stats.longest_perfect_streak := GREATEST(
+        stats.longest_perfect_streak, stats.current_perfect_streak
+      );
+    ELSE
+      stats.current_perfect_streak := 0;
+    END IF;
+  END IF;
+
+  IF NOT p_attempt.is_successful THEN
+    stats.current_task_streak := 0;
+  ELSE
+    stats.successful_count := stats.successful_count + 1;
+    IF NOT COALESCE(p_attempt.used_ai_hint, false) THEN
+      stats.no_hints_count := stats.no_hints_count + 1;
+    END IF;
+
+    stats.current_task_streak := stats.current_task_streak + 1;
+    stats.longest_task_streak := GREATEST(stats.longest_task_streak, stats.current_task_streak);
+
+    stats.hourly_success_counts[attempt_hour + 1] := stats.hourly_success_counts[attempt_hour + 1] + 1;
+
+    SELECT created_at INTO registered_at FROM public.users WHERE id = p_attempt.user_id;
+    IF p_attempt.created_at >= registered_at
+       AND p_attempt.created_at < registered_at + INTERVAL '1 day' THEN
+      stats.first_day_count := stats.first_day_count + 1;
+    END IF;
+
+    IF stats.last_active_date IS NULL OR attempt_date > stats.last_active_date THEN
+      stats.active_days := stats.active_days + 1;
+      stats.current_day_streak := CASE
+        WHEN stats.last_active_date = attempt_date - 1 THEN stats.current_day_streak + 1
+        ELSE 1
+      END;
+      stats.longest_day_streak := GREATEST(stats.longest_day_streak, stats.current_day_streak);
+      stats.last_active_date := attempt_date;
+    END IF;
+  END IF;
+
+  UPDATE public.user_stats
+  SET
+    successful_count = stats.successful_count,
+    no_hints_count = stats.no_hints_count,
+    perfect_count = stats.perfect_count,
+    first_day_count = stats.first_day_count,
+    active_days = stats.active_days,
+    last_active_date = stats.last_active_date,
+    current_day_streak = stats.current_day_streak,
+    longest_day_streak = stats.longest_day_streak,
+    current_task_streak = stats.current_task_streak,
+    longest_task_streak = stats.longest_task_streak,
+    current_perfect_streak = stats.current_perfect_streak,
+    longest_perfect_streak = stats.longest_perfect_streak,
+    hourly_success_counts = stats.hourly_success_counts,
+    updated_at = NOW()
+  WHERE user_id = p_attempt.user_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.apply_attempt_to_user_stats(public.task_attempts) FROM PUBLIC;
+
+CREATE OR REPLACE FUNCTION public.update_user_stats_on_attempt()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM public.apply_attempt_to_user_stats(NEW);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.update_user_stats_on_progress()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.status = 'completed'
+     AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM 'completed') THEN
+    INSERT INTO public.user_stats (user_id, completed_modules)
+    VALUES (NEW.user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET
+      completed_modules = public.user_stats.completed_modules + 1,
+      updated_at = NOW();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Заполняем счетчики по существующей истории: попытки применяются в хронологическом порядке
+DELETE FROM public.user_stats;
+
+DO $$
+DECLARE
+  attempt public.task_attempts%ROWTYPE;
+BEGIN
+  FOR attempt IN
+    SELECT * FROM public.task_attempts ORDER BY user_id, created_at, id
+  LOOP
+    PERFORM public.apply_attempt_to_user_stats(attempt);
+  END LOOP;
+END;
+$$;
+
+INSERT INTO public.user_stats (user_id, completed_modules)
+SELECT user_id, count(*)
+FROM public.user_progress
+WHERE status = 'completed'
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET completed_modules = EXCLUDED.completed_modules;
+
+DROP TRIGGER IF EXISTS update_user_stats_on_attempt ON public.task_attempts;
+CREATE TRIGGER update_user_stats_on_attempt
+  AFTER INSERT ON public.task_attempts
+  FOR EACH ROW
+  EXECUTE FUNCTION public.update_user_stats_on_attempt();
+
+DROP TRIGGER IF EXISTS update_user_stats_on_progress ON public.user_progress;
+CREATE TRIGGER update_user_stats_on_progress
+  AFTER INSERT OR UPDATE OF status ON public.user_progress
+  FOR EACH ROW
+  EXECUTE FUNCTION public.update_user_stats_on_progress();
+
+-- Выдает достижения текущему пользователю и начисляет XP за них одной транзакцией.
+-- Уже полученные достижения пропускаются, XP начисляется только за новые.
+CREATE OR REPLACE FUNCTION public.grant_achievements(p_achievement_ids UUID[])
+RETURNS JSONB AS $$
+DECLARE
+  current_user_id UUID := auth.uid();
+  granted_ids UUID[];
+  reward INTEGER;
+  new_total_xp INTEGER;
+  new_level INTEGER;
+BEGIN
+  IF current_user_id IS NULL THEN
+    RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '28000';
+  END IF;
+
+  WITH granted AS (
+    INSERT INTO public.user_achievements (user_id, achievement_id)
+    SELECT current_user_id, a.id
+    FROM public.achievements a
+    WHERE a.id = ANY(p_achievement_ids) AND a.is_active
+    ON CONFLICT (user_id, achievement_id) DO NOTHING
+    RETURNING achievement_id
+  )
+  SELECT COALESCE(array_agg(g.achievement_id), ARRAY[]::UUID[]), COALESCE(sum(a.xp_reward), 0)
+  INTO granted_ids, reward
+  FROM granted g
+  JOIN public.achievements a ON a.id = g.achievement_id;
+
+  IF reward > 0 THEN
+    UPDATE public.users
+    SET
+      total_xp = COALESCE(total_xp, 0) + reward,
+      current_level = public.calculate_user_level(COALESCE(total_xp, 0) + reward)
+    WHERE id = current_user_id
+    RETURNING total_xp, current_level INTO new_total_xp, new_level;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'granted', to_jsonb(granted_ids),
+    'xp_awarded', reward,
+    'new_total_xp', new_total_xp,
+    'new_level', new_level
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.grant_achievements(UUID[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.grant_achievements(UUID[]) TO authenticated;
@@ -0,0 +1,131 @@
+/*
+  # Серии пользователя: точный расчет и быстрое чтение
+
+  - calculate_user_streaks — точный расчет всех серий одним запросом по истории
+    task_attempts методом gaps-and-islands (оконные функции вместо выборки всех попыток в Node):
+    дни подряд с решениями (по UTC), успешные попытки подряд, задания подряд с первой попытки.
+  - refresh_user_streaks — пересчитывает серии в user_stats, если счетчики разошлись
+    с историей (например, после удаления попыток). Доступна только service role.
+  - get_user_streaks — текущие и лучшие серии из user_stats за O(1): время не зависит
+    ни от длины истории, ни от длины серии. Текущая серия дней обнуляется, если
+    последний день с решением был раньше вчерашнего.
+
+  Обе функции возвращают одинаковый JSONB:
+  { "days": { "current", "longest" }, "tasks": {...}, "first_try": {...} }
+*/
+
+CREATE INDEX IF NOT EXISTS idx_task_attempts_user_created
+  ON public.task_attempts(user_id, created_at DESC);
+
+CREATE OR REPLACE FUNCTION public.calculate_user_streaks(p_user_id UUID)
+RETURNS JSONB AS $$
+  WITH attempts AS (
+    SELECT id, task_id, is_successful, created_at
+    FROM public.task_attempts
+    WHERE user_id = p_user_id
+  ),
+  -- Дни подряд: у последовательных дат разность «дата - номер строки» одинакова
+  success_days AS (
+    SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::DATE AS day
+    FROM attempts
+    WHERE is_successful
+  ),
+  day_islands AS (
+    SELECT max(day) AS last_day, count(*) AS length
+    FROM (
+      SELECT day, day - (row_number() OVER (ORDER BY day))::INTEGER AS island
+      FROM success_days
+    ) d
+    GROUP BY island
+  ),
+  -- Попытки подряд: номер острова — число неудачных попыток до текущей включительно
+  task_islands AS (
+    SELECT island, count(*) FILTER (WHERE is_successful) AS length
+    FROM (
+      SELECT
+        is_successful,
+        count(*) FILTER (WHERE NOT is_successful) OVER (ORDER BY created_at, id) AS island
+      FROM attempts
+    ) t
+    GROUP BY island
+  ),
+  -- Первые попытки по каждому заданию в порядке времени, затем те же острова
+  first_attempts AS (
+    SELECT DISTINCT ON (task_id) id, is_successful, created_at
+    FROM attempts
+    ORDER BY task_id, created_at, id
+  ),
+  first_try_islands AS (
+    SELECT island, count(*) FILTER (WHERE is_successful) AS length
+    FROM (
+      SELECT
+        is_successful,
+        count(*) FILTER (WHERE NOT is_successful) OVER (ORDER BY created_at, id) AS island
+      FROM first_attempts
+    ) f
+    GROUP BY island
+  )
+  SELECT jsonb_build_object(
+    'days', jsonb_build_object(
+      'current', COALESCE((
+        SELECT length FROM day_islands
+        WHERE last_day >= (NOW() AT TIME ZONE 'UTC')::DATE - 1
+        ORDER BY last_day DESC
+        LIMIT 1
+      ), 0),
+      'longest', COALESCE((SELECT max(length) FROM day_islands), 0)
+    ),
+    'tasks', jsonb_build_object(
+      'current', COALESCE((SELECT length FROM task_islands ORDER BY island DESC LIMIT 1), 0),
+      'longest', COALESCE((SELECT max(length) FROM task_islands), 0)
+    ),
+    'first_try', jsonb_build_object(
+      'current', COALESCE((SELECT length FROM first_try_islands ORDER BY island DESC LIMIT 1), 0),
+      'longest', COALESCE((SELECT max(length) FROM first_try_islands), 0)
+    )
+  );
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION public.refresh_user_streaks(p_user_id UUID)
+RETURNS VOID AS $$
+DECLARE
+  streaks JSONB := public.calculate_user_streaks(p_user_id);
+BEGIN
+  UPDATE public.user_stats
+  SET
+    current_day_streak = (streaks #>> '{days,current}')::INTEGER,
+    longest_day_streak = (streaks #>> '{days,longest}')::INTEGER,
+    current_task_streak = (streaks #>> '{tasks,current}')::INTEGER,
+    longest_task_streak = (streaks #>> '{tasks,longest}')::INTEGER,
+    current_perfect_streak = (streaks #>> '{first_try,current}')::INTEGER,
+    longest_perfect_streak = (streaks #>> '{first_try,longest}')::INTEGER,
+    updated_at = NOW()
+  WHERE user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.refresh_user_streaks(UUID) FROM PUBLIC;
+
+-- Читает user_stats с правами вызывающего: RLS оставляет пользователю только его строку
+CREATE OR REPLACE FUNCTION public.get_user_streaks(p_user_id UUID)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'days', jsonb_build_object(
+      'current', CASE
+        WHEN s.last_active_date >= (NOW() AT TIME ZONE 'UTC')::DATE - 1 THEN s.current_day_streak
+        ELSE 0
+      END,
+      'longest', s.longest_day_streak
+    ),
+    'tasks', jsonb_build_object(
+      'current', s.current_task_streak,
+      'longest', s.longest_task_streak
+    ),
+    'first_try', jsonb_build_object(
+      'current', s.current_perfect_streak,
+      'longest', s.longest_perfect_streak
+    )
+  )
+  FROM public.user_stats s
+  WHERE s.user_id = p_user_id;
+$$ LANGUAGE sql STABLE;
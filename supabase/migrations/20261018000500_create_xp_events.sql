@@ -0,0 +1,261 @@
+/*
+  # Журнал начислений XP и рейтинги за период
+
+  XP хранился только суммой в users.total_xp, поэтому рейтинг «за неделю» и «за месяц»
+  совпадал с общим. Теперь каждое начисление дописывается в xp_events (только вставка),
+  а триггер сразу прибавляет его к итогам текущей недели и месяца в xp_period_totals.
+  Рейтинг за период — чтение первых N строк по индексу (period, period_start, xp DESC)
+  без агрегирования журнала.
+
+  - Периоды календарные, по UTC: неделя с понедельника, месяц с первого числа.
+  - Журнал пишут award_task_xp (source = 'task') и grant_achievements (source = 'achievement').
+  - XP, начисленный до этой миграции, в журнале отсутствует: история начислений не хранилась.
+*/
+
+CREATE TABLE IF NOT EXISTS public.xp_events (
+  id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  amount INTEGER NOT NULL CHECK (amount > 0),
+  source TEXT NOT NULL CHECK (source IN ('task', 'achievement')),
+  task_id UUID REFERENCES public.tasks(id) ON DELETE SET NULL,
+  achievement_id UUID REFERENCES public.achievements(id) ON DELETE SET NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_xp_events_user_created
+  ON public.xp_events(user_id, created_at DESC);
+
+-- Пользователь видит свои начисления; пишут в журнал только функции начисления
+ALTER TABLE public.xp_events ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own xp events" ON public.xp_events;
+CREATE POLICY "Users can view own xp events"
+ON public.xp_events FOR SELECT
+TO authenticated
+USING (auth.uid() = user_id);
+
+CREATE TABLE IF NOT EXISTS public.xp_period_totals (
+  period TEXT NOT NULL CHECK (period IN ('week', 'month')),
+  period_start DATE NOT NULL,
+  user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  xp INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (period, period_start, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_xp_period_totals_rank
+  ON public.xp_period_totals(period, period_start, xp DESC);
+
+-- Итоги за период нужны таблице лидеров, как и users.total_xp
+ALTER TABLE public.xp_period_totals ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Authenticated users can view xp period totals" ON public.xp_period_totals;
+CREATE POLICY "Authenticated users can view xp period totals"
+ON public.xp_period_totals FOR SELECT
+TO authenticated
+USING (true);
+
+-- Начало периода, в который попадает момент времени (UTC)
+CREATE OR REPLACE FUNCTION public.xp_period_start(p_period TEXT, p_at TIMESTAMPTZ)
+RETURNS DATE AS $$
+  SELECT date_trunc(p_period, p_at AT TIME ZONE 'UTC')::DATE;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.apply_xp_event_to_period_totals()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.xp_period_totals (period, period_start, user_id, xp)
+  VALUES
+    ('week', public.xp_period_start('week', NEW.created_at), NEW.user_id, NEW.amount),
+    ('month', public.xp_period_start('month', NEW.created_at), NEW.user_id, NEW.amount)
+  ON CONFLICT (period, period_start, user_id) DO UPDATE SET
+    xp = public.xp_period_totals.xp + EXCLUDED.xp;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS apply_xp_event_to_period_totals ON public.xp_events;
+CREATE TRIGGER apply_xp_event_to_period_totals
+  AFTER INSERT ON public.xp_events
+  FOR EACH ROW
+  EXECUTE FUNCTION public.apply_xp_event_to_period_totals();
+
+-- Начисление XP за задание дополнительно пишет событие в журнал
+CREATE OR REPLACE FUNCTION public.award_task_xp(
+  p_task_id UUID,
+  p_attempt_number INTEGER,
+  p_used_ai_hint BOOLEAN DEFAULT false,
+  p_execution_time INTEGER DEFAULT NULL,
+  p_is_first_attempt BOOLEAN DEFAULT false
+)
+RETURNS JSONB AS $$
+DECLARE
+  current_user_id UUID := auth.uid();
+  task_row RECORD;
+  stats_row RECORD;
+  average_execution_time NUMERIC;
+  fast_execution_time NUMERIC;
+  calculation JSONB;
+  xp_awarded INTEGER;
+  new_total_xp INTEGER;
+  new_level INTEGER;
+  module_task_count INTEGER;
+  completed_task_count INTEGER;
+  module_completed BOOLEAN;
+BEGIN
+  IF current_user_id IS NULL THEN
+    RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '28000';
+  END IF;
+
+  SELECT xp_reward, difficulty, module_id INTO task_row
+  FROM public.tasks
+  WHERE id = p_task_id;
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('status', 'task_not_found');
+  END IF;
+
+  -- Блокируем строку пользователя: параллельные начисления выполняются по очереди
+  PERFORM 1 FROM public.users WHERE id = current_user_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('status', 'user_not_found');
+  END IF;
+
+  -- Защита от повторного начисления за уже выполненное задание
+  IF NOT COALESCE(p_is_first_attempt, false) AND EXISTS (
+    SELECT 1 FROM public.task_attempts
+    WHERE user_id = current_user_id AND task_id = p_task_id AND is_successful
+  ) THEN
+    RETURN jsonb_build_object('status', 'already_completed');
+  END IF;
+
+  -- Статистика времени успешных решений (для бонуса скорости) — одна строка вместо агрегата
+  SELECT success_count, execution_time_sum, execution_time_histogram INTO stats_row
+  FROM public.task_stats
+  WHERE task_id = p_task_id;
+  IF FOUND AND stats_row.success_count > 0 THEN
+    average_execution_time := stats_row.execution_time_sum::NUMERIC / stats_row.success_count;
+    IF stats_row.success_count >= 20 THEN
+      fast_execution_time := public.execution_time_percentile(
+        stats_row.execution_time_histogram, stats_row.success_count, 0.25
+      );
+    END IF;
+  END IF;
+
+  calculation := public.calculate_task_xp(
+    task_row.xp_reward,
+    task_row.difficulty,
+    p_attempt_number,
+    COALESCE(p_used_ai_hint, false),
+    COALESCE(p_is_first_attempt, false),
+    p_execution_time,
+    average_execution_time,
+    fast_execution_time
+  );
+  xp_awarded := (calculation->>'totalXP')::INTEGER;
+
+  -- Атомарное увеличение: в SET используется значение total_xp до обновления
+  UPDATE public.users
+  SET
+    total_xp = COALESCE(total_xp, 0) + xp_awarded,
+    current_level = public.calculate_user_level(COALESCE(total_xp, 0) + xp_awarded)
+  WHERE id = current_user_id
+  RETURNING total_xp, current_level INTO new_total_xp, new_level;
+
+  IF xp_awarded > 0 THEN
+    INSERT INTO public.xp_events (user_id, amount, source, task_id)
+    VALUES (current_user_id, xp_awarded, 'task', p_task_id);
+  END IF;
+
+  -- Прогресс по модулю: модуль завершен, когда решены все его задания
+  IF task_row.module_id IS NOT NULL THEN
+    SELECT count(*) INTO module_task_count
+    FROM public.tasks
+    WHERE module_id = task_row.module_id;
+
+    SELECT count(DISTINCT ta.task_id) INTO completed_task_count
+    FROM public.task_attempts ta
+    JOIN public.tasks t ON t.id = ta.task_id
+    WHERE ta.user_id = current_user_id AND ta.is_successful AND t.module_id = task_row.module_id;
+
+    module_completed := completed_task_count >= module_task_count;
+
+    INSERT INTO public.user_progress (
+      user_id, module_id, status, xp_earned, last_attempt_at, first_completed_at
+    )
+    VALUES (
+      current_user_id,
+      task_row.module_id,
+      CASE WHEN module_completed THEN 'completed' ELSE 'in_progress' END,
+      xp_awarded,
+      NOW(),
+      CASE WHEN module_completed THEN NOW() END
+    )
+    ON CONFLICT (user_id, module_id) DO UPDATE SET
+      status = CASE
+        WHEN module_completed THEN 'completed'
+        WHEN public.user_progress.status = 'not_started' THEN 'in_progress'
+        ELSE public.user_progress.status
+      END,
+      xp_earned = public.user_progress.xp_earned + EXCLUDED.xp_earned,
+      last_attempt_at = EXCLUDED.last_attempt_at,
+      first_completed_at = COALESCE(public.user_progress.first_completed_at, EXCLUDED.first_completed_at);
+  END IF;
+
+  RETURN jsonb_build_object(
+    'status', 'awarded',
+    'xp_awarded', xp_awarded,
+    'new_total_xp', new_total_xp,
+    'new_level', new_level,
+    'calculation', calculation
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Выдача достижений пишет по событию на каждое достижение с наградой
+CREATE OR REPLACE FUNCTION public.grant_achievements(p_achievement_ids UUID[])
+RETURNS JSONB AS $$
+DECLARE
+  current_user_id UUID := auth.uid();
+  granted_ids UUID[];
+  reward INTEGER;
+  new_total_xp INTEGER;
+  new_level INTEGER;
+BEGIN
+  IF current_user_id IS NULL THEN
+    RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '28000';
+  END IF;
+
+  WITH granted AS (
+    INSERT INTO public.user_achievements (user_id, achievement_id)
+    SELECT current_user_id, a.id
+    FROM public.achievements a
+    WHERE a.id = ANY(p_achievement_ids) AND a.is_active
+    ON CONFLICT (user_id, achievement_id) DO NOTHING
+    RETURNING achievement_id
+  )
+  SELECT COALESCE(array_agg(g.achievement_id), ARRAY[]::UUID[]), COALESCE(sum(a.xp_reward), 0)
+  INTO granted_ids, reward
+  FROM granted g
+  JOIN public.achievements a ON a.id = g.achievement_id;
+
+  IF reward > 0 THEN
+    UPDATE public.users
+    SET
+      total_xp = COALESCE(total_xp, 0) + reward,
+      current_level = public.calculate_user_level(COALESCE(total_xp, 0) + reward)
+    WHERE id = current_user_id
+    RETURNING total_xp, current_level INTO new_total_xp, new_level;
+
+    INSERT INTO public.xp_events (user_id, amount, source, achievement_id)
+    SELECT current_user_id, a.xp_reward, 'achievement', a.id
+    FROM public.achievements a
+    WHERE a.id = ANY(granted_ids) AND a.xp_reward > 0;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'granted', to_jsonb(granted_ids),
+    'xp_awarded', reward,
+    'new_total_xp', new_total_xp,
+    'new_level', new_level
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
@@ -0,0 +1,159 @@
+/*
+  # Снимок общего рейтинга с готовыми местами
+
+  Чтобы узнать место пользователя вне топ-100, страница рейтинга считала всех,
+  у кого XP больше (count(*) по users), и отдельно загружала пользователей с таким же XP.
+  Теперь место хранится в leaderboard_snapshot и читается по первичному ключу.
+
+  - Место считается как прежде на странице: пользователи с одинаковым XP делят место,
+    следующее место пропускается (1, 1, 3). Так при изменении XP пользователя с a до b
+    сдвигаются только места пользователей с XP в диапазоне [min(a, b), max(a, b)).
+    При плотной нумерации (1, 1, 2) исчезновение или появление значения XP меняло бы
+    место всем, кто ниже, то есть почти всей таблице.
+  - Снимок обновляет триггер на users (total_xp, role, появление и удаление пользователя).
+    Обновления снимка выполняются по очереди (advisory lock), чтобы параллельные
+    начисления не читали устаревшие места соседей.
+  - rebuild_leaderboard_snapshot пересчитывает снимок целиком (заполнение и восстановление).
+  - get_leaderboard_achievements — последние достижения пользователей рейтинга,
+    не больше p_limit на пользователя.
+*/
+
+CREATE TABLE IF NOT EXISTS public.leaderboard_snapshot (
+  user_id UUID PRIMARY KEY REFERENCES public.users(id) ON DELETE CASCADE,
+  total_xp INTEGER NOT NULL,
+  rank INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_snapshot_xp
+  ON public.leaderboard_snapshot(total_xp DESC);
+
+ALTER TABLE public.leaderboard_snapshot ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Authenticated users can view leaderboard snapshot" ON public.leaderboard_snapshot;
+CREATE POLICY "Authenticated users can view leaderboard snapshot"
+ON public.leaderboard_snapshot FOR SELECT
+TO authenticated
+USING (true);
+
+CREATE OR REPLACE FUNCTION public.rebuild_leaderboard_snapshot()
+RETURNS VOID AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('leaderboard_snapshot'));
+
+  DELETE FROM public.leaderboard_snapshot;
+
+  INSERT INTO public.leaderboard_snapshot (user_id, total_xp, rank)
+  SELECT id, total_xp, rank() OVER (ORDER BY total_xp DESC)
+  FROM public.users
+  WHERE role IN ('student', 'admin');
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.rebuild_leaderboard_snapshot() FROM PUBLIC;
+
+-- Место пользователя с XP p_xp среди остальных строк снимка (места соседей уже обновлены)
+CREATE OR REPLACE FUNCTION public.leaderboard_rank_for(p_xp INTEGER, p_user_id UUID)
+RETURNS INTEGER AS $$
+DECLARE
+  neighbour_rank INTEGER;
+BEGIN
+  -- Такой же XP — то же место
+  SELECT rank INTO neighbour_rank
+  FROM public.leaderboard_snapshot
+  WHERE total_xp = p_xp AND user_id <> p_user_id
+  LIMIT 1;
+  IF FOUND THEN
+    RETURN neighbour_rank;
+  END IF;
+
+  -- Ближайший сосед ниже уже учитывает пользователя над собой: место на единицу выше
+  SELECT rank INTO neighbour_rank
+  FROM public.leaderboard_snapshot
+  WHERE total_xp < p_xp AND user_id <> p_user_id
+  ORDER BY total_xp DESC
+  LIMIT 1;
+  IF FOUND THEN
+    RETURN neighbour_rank - 1;
+  END IF;
+
+  -- Ниже никого нет: последнее место
+  RETURN (
+    SELECT count(*) + 1 FROM public.leaderboard_snapshot WHERE user_id <> p_user_id
+  )::INTEGER;
+END;
+$$ LANGUAGE plpgsql STABLE SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.update_leaderboard_snapshot()
+RETURNS TRIGGER AS $$
+DECLARE
+  was_ranked BOOLEAN := TG_OP <> 'INSERT' AND OLD.role IN ('student', 'admin');
+  is_ranked BOOLEAN := TG_OP <> 'DELETE' AND NEW.role IN ('student', 'admin');
+BEGIN
+  IF was_ranked AND is_ranked AND OLD.total_xp = NEW.total_xp THEN
+    RETURN NULL;
+  END IF;
+  IF NOT was_ranked AND NOT is_ranked THEN
+    RETURN NULL;
+  END IF;
+
+  PERFORM pg_advisory_xact_lock(hashtext('leaderboard_snapshot'));
+
+  IF was_ranked AND is_ranked THEN
+    -- Пользователь обогнал (или пропустил вперед) всех с XP в [min, max)
+    IF NEW.total_xp > OLD.total_xp THEN
+      UPDATE public.leaderboard_snapshot
+      SET rank = rank + 1
+      WHERE total_xp >= OLD.total_xp AND total_xp < NEW.total_xp AND user_id <> NEW.id;
+    ELSE
+      UPDATE public.leaderboard_snapshot
+      SET rank = rank - 1
+      WHERE total_xp >= NEW.total_xp AND total_xp < OLD.total_xp AND user_id <> NEW.id;
+    END IF;
+
+    UPDATE public.leaderboard_snapshot
+    SET total_xp = NEW.total_xp, rank = public.leaderboard_rank_for(NEW.total_xp, NEW.id)
+    WHERE user_id = NEW.id;
+  ELSIF was_ranked THEN
+    -- Пользователь покинул рейтинг: все, кто ниже, поднимаются на место
+    DELETE FROM public.leaderboard_snapshot WHERE user_id = OLD.id;
+    UPDATE public.leaderboard_snapshot SET rank = rank - 1 WHERE total_xp < OLD.total_xp;
+  ELSE
+    UPDATE public.leaderboard_snapshot SET rank = rank + 1 WHERE total_xp < NEW.total_xp;
+    INSERT INTO public.leaderboard_snapshot (user_id, total_xp, rank)
+    VALUES (NEW.id, NEW.total_xp, public.leaderboard_rank_for(NEW.total_xp, NEW.id));
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS update_leaderboard_snapshot ON public.users;
+CREATE TRIGGER update_leaderboard_snapshot
+  AFTER INSERT OR DELETE OR UPDATE OF total_xp, role ON public.users
+  FOR EACH ROW
+  EXECUTE FUNCTION public.update_leaderboard_snapshot();
+
+SELECT public.rebuild_leaderboard_snapshot();
+
+-- Последние достижения пользователей рейтинга, не больше p_limit на каждого.
+-- Выполняется с правами вызывающего: видимость достижений определяют политики user_achievements.
+CREATE OR REPLACE FUNCTION public.get_leaderboard_achievements(p_user_ids UUID[], p_limit INTEGER)
+RETURNS TABLE (
+  user_id UUID,
+  id UUID,
+  title TEXT,
+  description TEXT,
+  icon_name TEXT
+) AS $$
+  SELECT u.user_id, a.id, a.title, a.description, a.icon_name
+  FROM unnest(p_user_ids) AS u(user_id)
+  CROSS JOIN LATERAL (
+    SELECT ua.achievement_id, ua.earned_at
+    FROM public.user_achievements ua
+    WHERE ua.user_id = u.user_id
+    ORDER BY ua.earned_at DESC
+    LIMIT p_limit
+  ) recent
+  JOIN public.achievements a ON a.id = recent.achievement_id
+  ORDER BY u.user_id, recent.earned_at DESC;
+$$ LANGUAGE sql STABLE;
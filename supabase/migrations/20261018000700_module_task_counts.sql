@@ -0,0 +1,75 @@
+/*
+  # Количество заданий в модулях и прогресс пользователя по модулям
+
+  Страница /modules загружала module_id всех заданий всех опубликованных модулей
+  и считала их в JS, а страница модуля загружала попытки пользователя, чтобы собрать
+  множество решенных заданий. Объем этих данных рос вместе с библиотекой заданий.
+
+  - modules.tasks_count — количество заданий, поддерживается триггером на tasks.
+  - get_module_progress — для каждого опубликованного модуля (или только для p_module_ids)
+    возвращает task_count, completed_count, completed_task_ids и status текущего пользователя
+    одним запросом.
+*/
+
+ALTER TABLE public.modules ADD COLUMN IF NOT EXISTS tasks_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE public.modules m
+SET tasks_count = (SELECT count(*) FROM public.tasks t WHERE t.module_id = m.id);
+
+CREATE OR REPLACE FUNCTION public.update_module_tasks_count()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    UPDATE public.modules SET tasks_count = tasks_count - 1 WHERE id = OLD.module_id;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE public.modules SET tasks_count = tasks_count + 1 WHERE id = NEW.module_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS update_module_tasks_count ON public.tasks;
+CREATE TRIGGER update_module_tasks_count
+  AFTER INSERT OR DELETE ON public.tasks
+  FOR EACH ROW
+  EXECUTE FUNCTION public.update_module_tasks_count();
+
+DROP TRIGGER IF EXISTS update_module_tasks_count_on_move ON public.tasks;
+CREATE TRIGGER update_module_tasks_count_on_move
+  AFTER UPDATE OF module_id ON public.tasks
+  FOR EACH ROW
+  WHEN (OLD.module_id IS DISTINCT FROM NEW.module_id)
+  EXECUTE FUNCTION public.update_module_tasks_count();
+
+-- Выполняется с правами вызывающего: RLS оставляет только опубликованные модули
+-- и попытки самого пользователя
+CREATE OR REPLACE FUNCTION public.get_module_progress(p_module_ids UUID[] DEFAULT NULL)
+RETURNS TABLE (
+  module_id UUID,
+  task_count INTEGER,
+  completed_count INTEGER,
+  completed_task_ids UUID[],
+  status TEXT
+) AS $$
+  SELECT
+    m.id,
+    m.tasks_count,
+    COALESCE(cardinality(done.task_ids), 0),
+    COALESCE(done.task_ids, ARRAY[]::UUID[]),
+    COALESCE(
+      up.status,
+      CASE WHEN cardinality(done.task_ids) > 0 THEN 'in_progress' ELSE 'not_started' END
+    )
+  FROM public.modules m
+  LEFT JOIN LATERAL (
+    SELECT array_agg(DISTINCT ta.task_id) AS task_ids
+    FROM public.tasks t
+    JOIN public.task_attempts ta ON ta.task_id = t.id
+    WHERE t.module_id = m.id AND ta.user_id = auth.uid() AND ta.is_successful
+  ) done ON true
+  LEFT JOIN public.user_progress up ON up.module_id = m.id AND up.user_id = auth.uid()
+  WHERE m.is_published
+    AND (p_module_ids IS NULL OR m.id = ANY(p_module_ids))
+  ORDER BY m.order_index;
+$$ LANGUAGE sql STABLE;
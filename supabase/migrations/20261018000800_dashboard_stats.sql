@@ -0,0 +1,180 @@
+/*
+  # Статистика для личного кабинета одним запросом
+
+  Страница /dashboard загружала все попытки пользователя и все строки user_progress,
+  чтобы посчитать в JS количество решений и средние времена. Теперь эти числа берутся
+  из user_stats (добавлены счетчики попыток и суммы времен), а get_dashboard_stats
+  возвращает их вместе с сериями и активностью за последние 14 дней одним небольшим JSONB.
+
+  Активность читается по индексу (user_id, created_at) только за последние 14 дней,
+  поэтому время ответа не зависит от длины истории.
+*/
+
+ALTER TABLE public.user_stats
+  ADD COLUMN IF NOT EXISTS total_attempts INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS execution_time_sum BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS solving_time_sum BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS solving_time_count INTEGER NOT NULL DEFAULT 0;
+
+-- Триггер на task_attempts дополнительно ведет счетчики попыток и времен
+CREATE OR REPLACE FUNCTION public.apply_attempt_to_user_stats(p_attempt public.task_attempts)
+RETURNS VOID AS $$
+DECLARE
+  stats public.user_stats%ROWTYPE;
+  registered_at TIMESTAMPTZ;
+  attempt_date DATE := (p_attempt.created_at AT TIME ZONE 'UTC')::DATE;
+  attempt_hour INTEGER := extract(hour FROM p_attempt.created_at AT TIME ZONE 'UTC')::INTEGER;
+  is_first_attempt BOOLEAN;
+BEGIN
+  INSERT INTO public.user_stats (user_id)
+  VALUES (p_attempt.user_id)
+  ON CONFLICT (user_id) DO NOTHING;
+
+  -- Блокировка строки: параллельные попытки одного пользователя обновляют счетчики по очереди
+  SELECT * INTO stats FROM public.user_stats WHERE user_id = p_attempt.user_id FOR UPDATE;
+
+  -- Первая попытка по заданию (индекс idx_task_attempts_user_task)
+  is_first_attempt := NOT EXISTS (
+    SELECT 1 FROM public.task_attempts
+    WHERE user_id = p_attempt.user_id
+      AND task_id = p_attempt.task_id
+      AND (created_at, id) < (p_attempt.created_at, p_attempt.id)
+  );
+
+  IF is_first_attempt THEN
+    IF p_attempt.is_successful THEN
+      stats.perfect_count := stats.perfect_count + 1;
+      stats.current_perfect_streak := stats.current_perfect_streak + 1;
+      stats.longest_perfect_streak := GREATEST(
+        stats.longest_perfect_streak, stats.current_perfect_streak
+      );
+    ELSE
+      stats.current_perfect_streak := 0;
+    END IF;
+  END IF;
+
+  stats.total_attempts := stats.total_attempts + 1;
+  stats.execution_time_sum := stats.execution_time_sum + COALESCE(p_attempt.execution_time_ms, 0);
+  IF p_attempt.solving_time_ms IS NOT NULL THEN
+    stats.solving_time_sum := stats.solving_time_sum + p_attempt.solving_time_ms;
+    stats.solving_time_count := stats.solving_time_count + 1;
+  END IF;
+
+  IF NOT p_attempt.is_successful THEN
+    stats.current_task_streak := 0;
+  ELSE
+    stats.successful_count := stats.successful_count + 1;
+    IF NOT COALESCE(p_attempt.used_ai_hint, false) THEN
+      stats.no_hints_count := stats.no_hints_count + 1;
+    END IF;
+
+    stats.current_task_streak := stats.current_task_streak + 1;
+    stats.longest_task_streak := GREATEST(stats.longest_task_streak, stats.current_task_streak);
+
+    stats.hourly_success_counts[attempt_hour + 1] := stats.hourly_success_counts[attempt_hour + 1] + 1;
+
+    SELECT created_at INTO registered_at FROM public.users WHERE id = p_attempt.user_id;
+    IF p_attempt.created_at >= registered_at
+       AND p_attempt.created_at < registered_at + INTERVAL '1 day' THEN
+      stats.first_day_count := stats.first_day_count + 1;
+    END IF;
+
+    IF stats.last_active_date IS NULL OR attempt_date > stats.last_active_date THEN
+      stats.active_days := stats.active_days + 1;
+      stats.current_day_streak := CASE
+        WHEN stats.last_active_date = attempt_date - 1 THEN stats.current_day_streak + 1
+        ELSE 1
+      END;
+      stats.longest_day_streak := GREATEST(stats.longest_day_streak, stats.current_day_streak);
+      stats.last_active_date := attempt_date;
+    END IF;
+  END IF;
+
+  UPDATE public.user_stats
+  SET
+    total_attempts = stats.total_attempts,
+    execution_time_sum = stats.execution_time_sum,
+    solving_time_sum = stats.solving_time_sum,
+    solving_time_count = stats.solving_time_count,
+    successful_count = stats.successful_count,
+    no_hints_count = stats.no_hints_count,
+    perfect_count = stats.perfect_count,
+    first_day_count = stats.first_day_count,
+    active_days = stats.active_days,
+    last_active_date = stats.last_active_date,
+    current_day_streak = stats.current_day_streak,
+    longest_day_streak = stats.longest_day_streak,
+    current_task_streak = stats.current_task_streak,
+    longest_task_streak = stats.longest_task_streak,
+    current_perfect_streak = stats.current_perfect_streak,
+    longest_perfect_streak = stats.longest_perfect_streak,
+    hourly_success_counts = stats.hourly_success_counts,
+    updated_at = NOW()
+  WHERE user_id = p_attempt.user_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Заполняем новые счетчики по существующей истории
+UPDATE public.user_stats s
+SET
+  total_attempts = a.total_attempts,
+  execution_time_sum = a.execution_time_sum,
+  solving_time_sum = a.solving_time_sum,
+  solving_time_count = a.solving_time_count
+FROM (
+  SELECT
+    user_id,
+    count(*) AS total_attempts,
+    COALESCE(sum(execution_time_ms), 0) AS execution_time_sum,
+    COALESCE(sum(solving_time_ms), 0) AS solving_time_sum,
+    count(solving_time_ms) AS solving_time_count
+  FROM public.task_attempts
+  GROUP BY user_id
+) a
+WHERE s.user_id = a.user_id;
+
+-- Выполняется с правами вызывающего: RLS оставляет пользователю только его данные
+CREATE OR REPLACE FUNCTION public.get_dashboard_stats(p_user_id UUID)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'completed_modules', COALESCE(s.completed_modules, 0),
+    'successful_attempts', COALESCE(s.successful_count, 0),
+    'total_attempts', COALESCE(s.total_attempts, 0),
+    'avg_execution_time', CASE
+      WHEN s.total_attempts > 0 THEN round(s.execution_time_sum::NUMERIC / s.total_attempts)
+      ELSE 0
+    END,
+    'avg_solving_time', CASE
+      WHEN s.solving_time_count > 0 THEN round(s.solving_time_sum::NUMERIC / s.solving_time_count)
+      ELSE 0
+    END,
+    'streaks', public.get_user_streaks(p_user_id),
+    -- Попытки по дням (UTC) за последние 14 дней, включая дни без попыток
+    'recent_activity', (
+      SELECT jsonb_agg(
+        jsonb_build_object(
+          'date', d.day,
+          'attempts', COALESCE(a.attempts, 0),
+          'successful', COALESCE(a.successful, 0)
+        )
+        ORDER BY d.day
+      )
+      FROM (
+        SELECT (NOW() AT TIME ZONE 'UTC')::DATE - n AS day
+        FROM generate_series(0, 13) AS n
+      ) d
+      LEFT JOIN (
+        SELECT
+          (created_at AT TIME ZONE 'UTC')::DATE AS day,
+          count(*) AS attempts,
+          count(*) FILTER (WHERE is_successful) AS successful
+        FROM public.task_attempts
+        WHERE user_id = p_user_id
+          AND created_at >= ((NOW() AT TIME ZONE 'UTC')::DATE - 13)::TIMESTAMP AT TIME ZONE 'UTC'
+        GROUP BY 1
+      ) a ON a.day = d.day
+    )
+  )
+  FROM (SELECT p_user_id AS user_id) u
+  LEFT JOIN public.user_stats s ON s.user_id = u.user_id;
+$$ LANGUAGE sql STABLE;
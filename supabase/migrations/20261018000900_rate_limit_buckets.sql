@@ -0,0 +1,114 @@
+/*
+  # Ограничение частоты запросов к AI (token bucket)
+
+  Раньше лимит считался по строкам ai_generation_logs за день, но logGeneration
+  записывал не больше одной строки в день, поэтому лимит 50 генераций в день
+  не срабатывал. Подсказки и оценка решений не ограничивались вовсе.
+
+  rate_limit_buckets хранит корзину токенов на пару (пользователь, маршрут).
+  consume_rate_limit_token одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+  пополняет корзину за прошедшее время и списывает токен, если он есть, — проверка
+  и списание атомарны, параллельные запросы не могут потратить один токен дважды.
+  Параметры корзин хранятся в rate_limit_rules, а не передаются вызывающим: иначе
+  пользователь мог бы вызвать функцию напрямую с большой емкостью и пополнить свою корзину.
+  lib/utils/rate-limit.ts повторяет эти параметры для быстрой проверки в памяти процесса —
+  при изменении нужно менять оба места.
+
+  ai_generation_logs остается историей генераций: одна строка на каждую генерацию.
+*/
+
+-- В документации схемы у лога был UNIQUE(user_id, generation_type, created_date);
+-- если он есть в базе, он не дает записать вторую генерацию за день
+ALTER TABLE public.ai_generation_logs
+  DROP CONSTRAINT IF EXISTS ai_generation_logs_user_id_generation_type_created_date_key;
+
+CREATE TABLE IF NOT EXISTS public.rate_limit_rules (
+  endpoint TEXT PRIMARY KEY,
+  capacity INTEGER NOT NULL CHECK (capacity > 0),
+  refill_per_second DOUBLE PRECISION NOT NULL CHECK (refill_per_second > 0)
+);
+
+ALTER TABLE public.rate_limit_rules ENABLE ROW LEVEL SECURITY;
+
+INSERT INTO public.rate_limit_rules (endpoint, capacity, refill_per_second) VALUES
+  -- 50 генераций в сутки, как прежний дневной лимит
+  ('generate-module', 50, 50.0 / 86400),
+  ('generate-task', 50, 50.0 / 86400),
+  -- до 10 запросов подряд, затем 1 в 30 секунд
+  ('hint', 10, 1.0 / 30),
+  ('evaluate', 10, 1.0 / 30)
+ON CONFLICT (endpoint) DO UPDATE SET
+  capacity = EXCLUDED.capacity,
+  refill_per_second = EXCLUDED.refill_per_second;
+
+CREATE TABLE IF NOT EXISTS public.rate_limit_buckets (
+  user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  endpoint TEXT NOT NULL,
+  tokens DOUBLE PRECISION NOT NULL,
+  allowed BOOLEAN NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (user_id, endpoint)
+);
+
+-- Доступ только через consume_rate_limit_token
+ALTER TABLE public.rate_limit_buckets ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.consume_rate_limit_token(p_endpoint TEXT)
+RETURNS JSONB AS $$
+DECLARE
+  current_user_id UUID := auth.uid();
+  rule_capacity INTEGER;
+  rule_refill_per_second DOUBLE PRECISION;
+  bucket RECORD;
+BEGIN
+  IF current_user_id IS NULL THEN
+    RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '28000';
+  END IF;
+
+  SELECT capacity, refill_per_second INTO rule_capacity, rule_refill_per_second
+  FROM public.rate_limit_rules
+  WHERE endpoint = p_endpoint;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Unknown rate limit endpoint: %', p_endpoint USING ERRCODE = '22023';
+  END IF;
+
+  -- Пополнение считается от сохраненного состояния корзины и ограничено емкостью,
+  -- поэтому токены нельзя накопить впрок
+  INSERT INTO public.rate_limit_buckets AS b (user_id, endpoint, tokens, allowed, updated_at)
+  VALUES (current_user_id, p_endpoint, rule_capacity - 1, rule_capacity >= 1, NOW())
+  ON CONFLICT (user_id, endpoint) DO UPDATE SET
+    tokens = CASE
+      WHEN LEAST(
+        rule_capacity,
+        b.tokens + extract(epoch FROM NOW() - b.updated_at) * rule_refill_per_second
+      ) >= 1
+      THEN LEAST(
+        rule_capacity,
+        b.tokens + extract(epoch FROM NOW() - b.updated_at) * rule_refill_per_second
+      ) - 1
+      ELSE LEAST(
+        rule_capacity,
+        b.tokens + extract(epoch FROM NOW() - b.updated_at) * rule_refill_per_second
+      )
+    END,
+    allowed = LEAST(
+      rule_capacity,
+      b.tokens + extract(epoch FROM NOW() - b.updated_at) * rule_refill_per_second
+    ) >= 1,
+    updated_at = NOW()
+  RETURNING b.tokens, b.allowed INTO bucket;
+
+  RETURN jsonb_build_object(
+    'allowed', bucket.allowed,
+    'remaining', floor(GREATEST(bucket.tokens, 0)),
+    -- Через сколько появится следующий токен
+    'retry_after_ms', CASE
+      WHEN bucket.tokens >= 1 THEN 0
+      ELSE ceil((1 - bucket.tokens) / rule_refill_per_second * 1000)
+    END
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.consume_rate_limit_token(TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.consume_rate_limit_token(TEXT) TO authenticated;
@@ -0,0 +1,49 @@
+/*
+  # Кеш ответов AI для подсказок и оценки решений
+
+  /api/ai/hint и /api/tasks/evaluate обращались к модели при каждом нажатии, хотя многие
+  ученики отправляют одинаковый (пустой или стартовый) код к одному и тому же заданию.
+
+  ai_response_cache хранит готовый ответ по ключу (route, task_id, prompt_version, code_hash):
+  - code_hash — SHA-256 кода без комментариев, пустых строк и хвостовых пробелов вместе
+    с остальным содержимым промпта (текст задания, вывод, сводка тестов);
+  - prompt_version увеличивается в маршруте при изменении промпта, старые записи
+    перестают находиться и удаляются по сроку;
+  - total_tokens — расход токенов на исходный ответ, из него считается экономия.
+
+  Таблица общая для всех учеников, поэтому клиентам она недоступна (RLS без политик):
+  читает и пишет ее только сервер через service role, иначе ученик мог бы подменить
+  подсказку, которую увидят другие.
+*/
+
+CREATE TABLE IF NOT EXISTS public.ai_response_cache (
+  route TEXT NOT NULL CHECK (route IN ('hint', 'evaluate')),
+  task_id UUID NOT NULL REFERENCES public.tasks(id) ON DELETE CASCADE,
+  prompt_version INTEGER NOT NULL,
+  code_hash TEXT NOT NULL,
+  response JSONB NOT NULL,
+  total_tokens INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  expires_at TIMESTAMPTZ NOT NULL,
+  PRIMARY KEY (route, task_id, prompt_version, code_hash)
+);
+
+ALTER TABLE public.ai_response_cache ENABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_ai_response_cache_expires_at
+  ON public.ai_response_cache(expires_at);
+
+-- Удаление устаревших записей (по расписанию или вручную)
+CREATE OR REPLACE FUNCTION public.purge_expired_ai_responses()
+RETURNS INTEGER AS $$
+DECLARE
+  deleted INTEGER;
+BEGIN
+  DELETE FROM public.ai_response_cache WHERE expires_at <= NOW();
+  GET DIAGNOSTICS deleted = ROW_COUNT;
+  RETURN deleted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.purge_expired_ai_responses() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.purge_expired_ai_responses() TO service_role;
@@ -0,0 +1,87 @@
+/*
+  # Снимок рейтинга: периодическая перестройка вместо триггера на каждое начисление XP
+
+  Триггер update_leaderboard_snapshot брал глобальную advisory-блокировку при каждом
+  изменении users.total_xp и держал ее до конца транзакции. Все award_task_xp и
+  grant_achievements в системе выстраивались в одну очередь: пропускная способность
+  начислений XP ограничивалась одной транзакцией за раз.
+
+  Теперь запись XP снимок не трогает:
+  - триггер и leaderboard_rank_for удалены;
+  - refresh_leaderboard_snapshot() перестраивает снимок при чтении, если он старше
+    60 секунд (как и кеш рейтинга на сервере). Блокировка берется без ожидания
+    (pg_try_advisory_xact_lock): если снимок уже перестраивает другой запрос, функция
+    сразу возвращает false и читается предыдущий снимок;
+  - rebuild_leaderboard_snapshot обновляет только строки, у которых изменились XP или место,
+    и удаляет выбывших из рейтинга, а не переписывает всю таблицу.
+
+  Место пользователя вне топ-100 может отставать от XP на время жизни снимка (до 60 секунд).
+*/
+
+DROP TRIGGER IF EXISTS update_leaderboard_snapshot ON public.users;
+DROP FUNCTION IF EXISTS public.update_leaderboard_snapshot();
+DROP FUNCTION IF EXISTS public.leaderboard_rank_for(INTEGER, UUID);
+
+CREATE TABLE IF NOT EXISTS public.leaderboard_snapshot_state (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  rebuilt_at TIMESTAMPTZ NOT NULL DEFAULT '-infinity'
+);
+
+INSERT INTO public.leaderboard_snapshot_state (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- Только для функций ниже (SECURITY DEFINER)
+ALTER TABLE public.leaderboard_snapshot_state ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.rebuild_leaderboard_snapshot()
+RETURNS VOID AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('leaderboard_snapshot'));
+
+  INSERT INTO public.leaderboard_snapshot (user_id, total_xp, rank)
+  SELECT id, total_xp, rank() OVER (ORDER BY total_xp DESC)
+  FROM public.users
+  WHERE role IN ('student', 'admin')
+  ON CONFLICT (user_id) DO UPDATE
+  SET total_xp = EXCLUDED.total_xp, rank = EXCLUDED.rank
+  WHERE (leaderboard_snapshot.total_xp, leaderboard_snapshot.rank)
+    IS DISTINCT FROM (EXCLUDED.total_xp, EXCLUDED.rank);
+
+  DELETE FROM public.leaderboard_snapshot s
+  WHERE NOT EXISTS (
+    SELECT 1 FROM public.users u
+    WHERE u.id = s.user_id AND u.role IN ('student', 'admin')
+  );
+
+  UPDATE public.leaderboard_snapshot_state SET rebuilt_at = now();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.rebuild_leaderboard_snapshot() FROM PUBLIC;
+
+-- Перестраивает снимок, если он старше 60 секунд. Возвращает true, если перестроил.
+-- Не ждет блокировку: параллельные вызовы читают предыдущий снимок.
+CREATE OR REPLACE FUNCTION public.refresh_leaderboard_snapshot()
+RETURNS BOOLEAN AS $$
+BEGIN
+  IF (SELECT rebuilt_at FROM public.leaderboard_snapshot_state) > now() - INTERVAL '60 seconds' THEN
+    RETURN FALSE;
+  END IF;
+
+  IF NOT pg_try_advisory_xact_lock(hashtext('leaderboard_snapshot')) THEN
+    RETURN FALSE;
+  END IF;
+
+  -- Между проверкой и блокировкой снимок мог перестроить другой запрос
+  IF (SELECT rebuilt_at FROM public.leaderboard_snapshot_state) > now() - INTERVAL '60 seconds' THEN
+    RETURN FALSE;
+  END IF;
+
+  PERFORM public.rebuild_leaderboard_snapshot();
+  RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.refresh_leaderboard_snapshot() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.refresh_leaderboard_snapshot() TO authenticated;
+
+SELECT public.rebuild_leaderboard_snapshot();
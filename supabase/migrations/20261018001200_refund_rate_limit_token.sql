@@ -0,0 +1,24 @@
+/*
+  # Возврат токена лимита при неудачном вызове модели
+
+  Маршруты генерации списывают токен до вызова модели. Если вызов не удался
+  (5xx, таймаут, открытый предохранитель), генерации не было, и токен возвращается
+  в корзину: неудачные попытки не должны расходовать 50 генераций в сутки.
+
+  refund_rate_limit_token доступна только service role: будь она доступна пользователю,
+  он мог бы вернуть себе токен и после успешной генерации.
+*/
+
+CREATE OR REPLACE FUNCTION public.refund_rate_limit_token(p_user_id UUID, p_endpoint TEXT)
+RETURNS VOID AS $$
+  -- Не больше емкости корзины: возврат не дает накопить токены впрок
+  UPDATE public.rate_limit_buckets b
+  SET tokens = LEAST(r.capacity, b.tokens + 1)
+  FROM public.rate_limit_rules r
+  WHERE b.user_id = p_user_id
+    AND b.endpoint = p_endpoint
+    AND r.endpoint = p_endpoint;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.refund_rate_limit_token(UUID, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.refund_rate_limit_token(UUID, TEXT) TO service_role;
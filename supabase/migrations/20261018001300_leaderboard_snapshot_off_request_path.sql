@@ -0,0 +1,32 @@
+/*
+  # Снимок рейтинга: перестройка вне запросов пользователей
+
+  refresh_leaderboard_snapshot() вызывалась со страницы рейтинга: раз в 60 секунд
+  просмотр страницы пользователем вне топ-100 выполнял внутри своего запроса полную
+  перестройку снимка (rank() по всем ученикам, upsert и удаление выбывших).
+
+  Теперь страница снимок только читает, а перестраивают его:
+  - задание pg_cron refresh-leaderboard-snapshot каждую минуту (если расширение доступно);
+  - /api/tasks/award-xp после начисления XP, уже после ответа клиенту (service role).
+
+  refresh_leaderboard_snapshot отозвана у authenticated и доступна только service role.
+*/
+
+REVOKE EXECUTE ON FUNCTION public.refresh_leaderboard_snapshot() FROM authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_leaderboard_snapshot() TO service_role;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_cron') THEN
+    CREATE EXTENSION IF NOT EXISTS pg_cron;
+    -- Задание с тем же именем заменяется, поэтому миграция повторяема
+    PERFORM cron.schedule(
+      'refresh-leaderboard-snapshot',
+      '* * * * *',
+      'SELECT public.refresh_leaderboard_snapshot()'
+    );
+  ELSE
+    RAISE NOTICE 'pg_cron is not available: leaderboard_snapshot is refreshed only after XP awards';
+  END IF;
+END;
+$$;
@@ -73,6 +73,7 @@ export interface Database {
           level: number;
           order_index: number;
           is_published: boolean;
+          tasks_count: number;
           created_by: string;
           created_at: string;
           updated_at: string;
@@ -85,6 +86,7 @@ export interface Database {
           level: number;
           order_index: number;
           is_published?: boolean;
+          tasks_count?: number;
           created_by: string;
           created_at?: string;
           updated_at?: string;
@@ -97,6 +99,7 @@ export interface Database {
           level?: number;
           order_index?: number;
           is_published?: boolean;
+          tasks_count?: number;
           created_by?: string;
           created_at?: string;
           updated_at?: string;
@@ -116,6 +119,9 @@ export interface Database {
           hints: Json | null;
           order_index: number;
           variant_number: number | null;
+          time_limit_ms: number | null;
+          suite_time_limit_ms: number | null;
+          checks_performance: boolean;
           created_at: string;
           updated_at: string;
         };
@@ -132,6 +138,9 @@ export interface Database {
           hints?: Json | null;
           order_index: number;
           variant_number?: number | null;
+          time_limit_ms?: number | null;
+          suite_time_limit_ms?: number | null;
+          checks_performance?: boolean;
           created_at?: string;
           updated_at?: string;
         };
@@ -148,6 +157,9 @@ export interface Database {
           hints?: Json | null;
           order_index?: number;
           variant_number?: number | null;
+          time_limit_ms?: number | null;
+          suite_time_limit_ms?: number | null;
+          checks_performance?: boolean;
           created_at?: string;
           updated_at?: string;
         };
@@ -263,6 +275,151 @@ export interface Database {
           updated_at?: string;
         };
       };
+      task_stats: {
+        Row: {
+          task_id: string;
+          success_count: number;
+          execution_time_sum: number;
+          execution_time_histogram: number[];
+          updated_at: string;
+        };
+        Insert: {
+          task_id: string;
+          success_count?: number;
+          execution_time_sum?: number;
+          execution_time_histogram?: number[];
+          updated_at?: string;
+        };
+        Update: {
+          task_id?: string;
+          success_count?: number;
+          execution_time_sum?: number;
+          execution_time_histogram?: number[];
+          updated_at?: string;
+        };
+      };
+      user_stats: {
+        Row: {
+          user_id: string;
+          successful_count: number;
+          no_hints_count: number;
+          perfect_count: number;
+          first_day_count: number;
+          active_days: number;
+          last_active_date: string | null;
+          current_day_streak: number;
+          longest_day_streak: number;
+          current_task_streak: number;
+          longest_task_streak: number;
+          current_perfect_streak: number;
+          longest_perfect_streak: number;
+          hourly_success_counts: number[];
+          completed_modules: number;
+          updated_at: string;
+        };
+        Insert: {
+          user_id: string;
+          successful_count?: number;
+          no_hints_count?: number;
+          perfect_count?: number;
+          first_day_count?: number;
+          active_days?: number;
+          last_active_date?: string | null;
+          current_day_streak?: number;
+          longest_day_streak?: number;
+          current_task_streak?: number;
+          longest_task_streak?: number;
+          current_perfect_streak?: number;
+          longest_perfect_streak?: number;
+          hourly_success_counts?: number[];
+          completed_modules?: number;
+          updated_at?: string;
+        };
+        Update: {
+          user_id?: string;
+          successful_count?: number;
+          no_hints_count?: number;
+          perfect_count?: number;
+          first_day_count?: number;
+          active_days?: number;
+          last_active_date?: string | null;
+          current_day_streak?: number;
+          longest_day_streak?: number;
+          current_task_streak?: number;
+          longest_task_streak?: number;
+          current_perfect_streak?: number;
+          longest_perfect_streak?: number;
+          hourly_success_counts?: number[];
+          completed_modules?: number;
+          updated_at?: string;
+        };
+      };
+      xp_events: {
+        Row: {
+          id: number;
+          user_id: string;
+          amount: number;
+          source: 'task' | 'achievement';
+          task_id: string | null;
+          achievement_id: string | null;
+          created_at: string;
+        };
+        Insert: {
+          id?: number;
+          user_id: string;
+          amount: number;
+          source: 'task' | 'achievement';
+          task_id?: string | null;
+          achievement_id?: string | null;
+          created_at?: string;
+        };
+        Update: {
+          id?: number;
+          user_id?: string;
+          amount?: number;
+          source?: 'task' | 'achievement';
+          task_id?: string | null;
+          achievement_id?: string | null;
+          created_at?: string;
+        };
+      };
+      xp_period_totals: {
+        Row: {
+          period: 'week' | 'month';
+          period_start: string;
+          user_id: string;
+          xp: number;
+        };
+        Insert: {
+          period: 'week' | 'month';
+          period_start: string;
+          user_id: string;
+          xp?: number;
+        };
+        Update: {
+          period?: 'week' | 'month';
+          period_start?: string;
+          user_id?: string;
+          xp?: number;
+        };
+      };
+      leaderboard_snapshot: {
+        Row: {
+          user_id: string;
+          total_xp: number;
+          rank: number;
+        };
+        Insert: {
+          user_id: string;
+          total_xp: number;
+          rank: number;
+        };
+        Update: {
+          user_id?: string;
+          total_xp?: number;
+          rank?: number;
+        };
+      };
     };
     Views: { [_ in never]: never };
     Functions: { [_ in never]: never };
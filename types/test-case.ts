@@ -13,9 +13,15 @@ export interface TestCase {
   is_visible: boolean;
 }
 
+export type TestResultStatus = "passed" | "failed" | "error" | "timeout";
+
 export interface TestResult {
   testCaseId: string;
   passed: boolean;
+  /**
+   * timeout — тест прерван, потому что превысил бюджет времени
+   */
+  status?: TestResultStatus;
   actualOutput?: unknown;
   error?: string;
   executionTime?: number;
@@ -27,5 +33,27 @@ export interface TestSuiteResult {
   totalCount: number;
   allPassed: boolean;
   executionTime: number;
+  /**
+   * Хотя бы один тест превысил бюджет времени
+   */
+  timedOut?: boolean;
+  /**
+   * Задание проверяет скорость, и решение не уложилось в бюджет
+   */
+  tooSlow?: boolean;
+  /**
+   * Результат взят из кеша: код и тесты не менялись с прошлой проверки
+   */
+  fromCache?: boolean;
+}
+
+/**
+ * Бюджеты времени задания (колонки tasks.time_limit_ms, tasks.suite_time_limit_ms,
+ * tasks.checks_performance). null — значение по умолчанию.
+ */
+export interface TaskTimeLimits {
+  caseTimeLimitMs?: number | null;
+  suiteTimeLimitMs?: number | null;
+  checksPerformance?: boolean | null;
 }
 